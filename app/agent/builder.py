@@ -17,7 +17,11 @@ from app.agent.filters import conversation_filters
 from app.agent.hooks import lifecycle_hooks
 from app.agent.enrichers import context_enrichers
 from app.agent.workflow import workflow_handler
-from app.utils.logger import setup_logger, log_perf, record_perf_sample, get_trace_ids
+from app.agent.tool_call_repair import ToolCallRepairMiddleware
+from app.agent.semantic_cache import SemanticCacheMiddleware, semantic_cache
+from app.agent.context_version import context_version, register_version_source
+from app.utils.logger import setup_logger, log_perf, get_trace_ids
+from app.utils.metrics import observe_latency
 import app.agent.db as agent_db
 from app.config import (
     LLM_MAX_PROMPT_CHARS,
@@ -60,6 +64,9 @@ kb_config = {
     "model": LLM_CONFIG.get(LLM_PROVIDER, {}).get("model", "gemma-3n"),
 }
 knowledge_base = LocalVanna(config=kb_config)
+semantic_cache.bind(knowledge_base.chroma_client, knowledge_base.embedding_function)
+register_version_source("catalog", agent_db.schema_fingerprint)
+register_version_source("training", lambda: knowledge_base.training_revision)
 dbt_provider = DbtMetadataProvider(
     manifest_path=Path("dbt/target/manifest.json"),
     catalog_path=Path("dbt/target/catalog.json"),
@@ -75,35 +82,83 @@ except Exception as e:
 
 def _collect_schema_text(limit_chars: int = 12000) -> str:
     try:
-        df = knowledge_base.get_training_data()
-        if df is None or df.empty:
-            return ""
-        if "type" in df.columns and "text" in df.columns:
-            ddls = df[df["type"] == "ddl"]["text"].dropna().tolist()
-        elif "sql" in df.columns:
-            ddls = df["sql"].dropna().tolist()
-        else:
-            ddls = df.to_string().splitlines()
-        schema = "\n\n".join(ddls)
-        if len(schema) > limit_chars:
-            schema = schema[:limit_chars]
-        return schema
+        parts, used = [], 0
+        for ddl in knowledge_base.ddl_documents():
+            parts.append(ddl)
+            used += len(ddl) + 2
+            if used >= limit_chars:
+                break
+        return "\n\n".join(parts)[:limit_chars]
     except Exception as e:
         log_perf(perf_logger, "schema.load.error", {"error": str(e)})
         return ""
 
+_QUESTION_MARK = "Question: "
+
+
+def _shorten(text: str, excess: int, keep_tail: bool = False) -> str:
+    """Drop about `excess` chars from one end of text, leaving a marker; never grows it."""
+    marker = "[... truncated ...]"
+    keep = len(text) - excess - len(marker)
+    if keep <= 0:
+        return marker if len(marker) < len(text) else text
+    return marker + text[-keep:] if keep_tail else text[:keep] + marker
+
+
+def _trim_current_turn(turn: list, excess: int) -> int:
+    """
+    Shrink the current turn by `excess` chars: tool results first (largest first), then
+    the context injected ahead of the question. The question goes last and is only
+    shortened if it alone is over budget. Returns the chars still over.
+    """
+    tool_results = [m for m in turn if getattr(m, "role", "") == "tool"]
+    for m in sorted(tool_results, key=lambda m: -len(m.content or "")):
+        if excess <= 0:
+            return excess
+        content = m.content or ""
+        m.content = _shorten(content, excess)
+        excess -= len(content) - len(m.content)
+
+    question_msg = turn[0] if turn and getattr(turn[0], "role", "") == "user" else None
+    if excess > 0 and question_msg is not None:
+        content = question_msg.content or ""
+        split = content.rfind(_QUESTION_MARK)
+        context, question = (content[:split], content[split:]) if split >= 0 else ("", content)
+        if context:
+            # The tail of the context (schema, guardrails) is nearest the question; keep it
+            trimmed = _shorten(context, excess, keep_tail=True)
+            excess -= len(context) - len(trimmed)
+            context = trimmed
+        if excess > 0 and len(question) > len(_QUESTION_MARK):
+            body = question[len(_QUESTION_MARK) :] if split >= 0 else question
+            shortened = _shorten(body, excess)
+            excess -= len(body) - len(shortened)
+            question = (_QUESTION_MARK if split >= 0 else "") + shortened
+        question_msg.content = context + question
+    return excess
+
+
 class LLMLog(LlmMiddleware):
     async def before_llm_request(self,r):
         if not llm_circuit._can_pass():
             raise RuntimeError("CircuitBreaker[llm] is OPEN")
         r.metadata = r.metadata or {}
         r.metadata["perf_start"] = time.time()
+        # Guardrail tables and the context version read the catalog; load it off the event loop
+        await agent_db.schema_catalog.aget()
 
         # Schema injection
         messages = getattr(r, "messages", []) or []
-        if messages:
-            user_msg = messages[-1]
+        # Cache keys need the question as asked and the context it is answered against
+        last_user = next((m for m in reversed(messages) if getattr(m, "role", "") == "user"), None)
+        if last_user is not None and "question" not in r.metadata:
+            r.metadata["question"] = getattr(last_user, "content", "") or ""
+        r.metadata["context_version"] = context_version()
+        if last_user is not None:
+            # The current question, not the tool result that ends the messages mid tool loop
+            user_msg = last_user
             content = getattr(user_msg, "content", "") or ""
+            context_start = time.perf_counter()
             schema_text = _collect_schema_text()
             semantic_text = semantic_loader.build_context()
             dbt_text = ""
@@ -131,10 +186,14 @@ class LLMLog(LlmMiddleware):
                     "- Use SELECT/DESCRIBE/EXPLAIN; avoid invented table names."
                 )
             if content:
-                blocks.append(f"Question: {content}")
+                blocks.append(f"{_QUESTION_MARK}{content}")
             user_msg.content = "\n\n".join(blocks)
+            observe_latency("context", (time.perf_counter() - context_start) * 1000)
 
-        # Prompt size logging / limiting (protect system messages; trim oldest history first)
+        # Prompt size logging / limiting. Older turns are normally compacted into a summary
+        # already (ConversationCompactor); anything still over budget loses whole earlier
+        # turns, oldest first, so tool calls stay paired with their results. If the current
+        # turn alone is too big, its contents are shortened instead (_trim_current_turn).
         system_msgs = [m for m in messages if getattr(m, "role", "") == "system"]
         history_msgs = [m for m in messages if getattr(m, "role", "") != "system"]
 
@@ -143,50 +202,23 @@ class LLMLog(LlmMiddleware):
 
         truncated = False
         if total_chars > LLM_MAX_PROMPT_CHARS and history_msgs:
-            truncated = True
             budget = max(LLM_MAX_PROMPT_CHARS - system_chars, 0)
-            kept = []
-            # keep most recent history first, trimming from the oldest
-            for m in reversed(history_msgs):
-                content = getattr(m, "content", "") or ""
-                if not content:
-                    kept.append(m)
-                    continue
-                if len(content) <= budget:
-                    budget -= len(content)
-                    kept.append(m)
-                else:
-                    m.content = content[-budget:] if budget > 0 else ""
-                    budget = 0
-                    kept.append(m)
+            turn_starts = [i for i, m in enumerate(history_msgs) if getattr(m, "role", "") == "user"]
+            keep_from = turn_starts[-1] if turn_starts else 0
+            used = sum(len(m.content or "") for m in history_msgs[keep_from:])
+            for start in reversed(turn_starts[:-1]):
+                turn_chars = sum(len(m.content or "") for m in history_msgs[start:keep_from])
+                if used + turn_chars > budget:
                     break
-            history_msgs = list(reversed(kept))
-            r.messages = system_msgs + history_msgs
+                used += turn_chars
+                keep_from = start
+            if used > budget:
+                _trim_current_turn(history_msgs[keep_from:], used - budget)
+            if keep_from > 0 or used > budget:
+                truncated = True
+                history_msgs = history_msgs[keep_from:]
+                r.messages = system_msgs + history_msgs
 
-        if truncated:
-            # Hard fallback: drop old history to guarantee valid tool JSON
-            last_user_msg = next(
-                (m for m in reversed(messages) if getattr(m, "role", "") == "user"),
-                None,
-            )
-            fallback_msgs = list(system_msgs)
-            if last_user_msg:
-                question = getattr(last_user_msg, "content", "") or ""
-                schema_text = _collect_schema_text()
-                semantic_text = semantic_loader.build_context()
-                parts = []
-                if semantic_text:
-                    parts.append(semantic_text)
-                if schema_text:
-                    parts.append(f"Use this schema:\n{schema_text}")
-                if question:
-                    parts.append(f"Question: {question}")
-                parts.append(
-                    "Respond with a single JSON tool call only. Do not include prose or multiple calls."
-                )
-                last_user_msg.content = "\n\n".join(parts)
-                fallback_msgs.append(last_user_msg)
-            r.messages = fallback_msgs
         log_perf(
             perf_logger,
             "llm.prompt_size",
@@ -217,7 +249,6 @@ class LLMLog(LlmMiddleware):
                     "trace_id": get_trace_ids()[0],
                 },
             )
-            record_perf_sample("llm_ms", duration_ms)
         return res
 
     async def on_llm_error(self, r, exc):
@@ -265,7 +296,7 @@ agent=Agent(
  user_resolver=user_resolver,
  agent_memory=agent_memory,
  workflow_handler=workflow_handler,
- llm_middlewares=[LLMLog()],
+ llm_middlewares=[LLMLog(), ToolCallRepairMiddleware(), SemanticCacheMiddleware()],
  lifecycle_hooks=lifecycle_hooks,
  context_enrichers=context_enrichers,
  conversation_filters=conversation_filters,
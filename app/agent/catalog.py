@@ -0,0 +1,342 @@
+"""
+Schema catalog service.
+Loads tables, views and their columns in one bulk round trip, indexes them by
+(schema, name) for O(1) lookups and refreshes in the background on a TTL (or
+on demand). Each content change bumps a monotonically increasing version so
+downstream caches can key on it.
+"""
+
+import asyncio
+import hashlib
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+# Objects that exist in every session but never appear in the dictionary views
+BUILTIN_TABLES = {
+    "oracle": {"dual"},
+    "sqlite": {"sqlite_master", "sqlite_schema"},
+    "mssql": set(),
+}
+
+
+@dataclass(frozen=True)
+class CatalogObject:
+    schema: str
+    name: str
+    kind: str
+    columns: Tuple[str, ...] = ()
+    column_set: frozenset = field(default=frozenset(), compare=False, repr=False)
+
+
+class CatalogSnapshot:
+    """Immutable, indexed view of the schema at one catalog version."""
+
+    def __init__(self, version: int, fingerprint: str, objects: Iterable[CatalogObject], default_schema: str = ""):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.default_schema = default_schema
+        self.loaded_at = time.time()
+        self.objects: Dict[Tuple[str, str], CatalogObject] = {}
+        self.by_name: Dict[str, Tuple[CatalogObject, ...]] = {}
+        grouped: Dict[str, List[CatalogObject]] = {}
+        for obj in objects:
+            self.objects[(obj.schema, obj.name)] = obj
+            grouped.setdefault(obj.name, []).append(obj)
+        self.by_name = {name: tuple(objs) for name, objs in grouped.items()}
+
+    def lookup(self, name: str, schema: Optional[str] = None) -> Optional[CatalogObject]:
+        name = name.lower()
+        if schema:
+            return self.objects.get((schema.lower(), name))
+        if self.default_schema:
+            obj = self.objects.get((self.default_schema, name))
+            if obj is not None:
+                return obj
+        candidates = self.by_name.get(name)
+        return candidates[0] if candidates else None
+
+    def table_names(self) -> set:
+        return set(self.by_name)
+
+    def __len__(self) -> int:
+        return len(self.objects)
+
+
+def build_objects(rows: Iterable[Sequence]) -> List[CatalogObject]:
+    """Group (schema, name, kind, column) rows into catalog objects, preserving column order."""
+    grouped: Dict[Tuple[str, str], Tuple[str, List[str]]] = {}
+    for schema, name, kind, column in rows:
+        key = ((schema or "").lower(), (name or "").lower())
+        entry = grouped.setdefault(key, ((kind or "").lower(), []))
+        if column:
+            entry[1].append(column.lower())
+    return [
+        CatalogObject(schema=schema, name=name, kind=kind, columns=tuple(cols), column_set=frozenset(cols))
+        for (schema, name), (kind, cols) in grouped.items()
+    ]
+
+
+def _fingerprint(objects: Iterable[CatalogObject]) -> str:
+    digest = hashlib.sha256()
+    for obj in sorted(objects, key=lambda o: (o.schema, o.name)):
+        digest.update(f"{obj.schema}.{obj.name}:{obj.kind}:{','.join(obj.columns)}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def normalize_object_types(values: Iterable[str]) -> List[str]:
+    types = []
+    for value in values:
+        if value in {"TABLES", "TABLE"}:
+            types.append("TABLE")
+        elif value in {"VIEWS", "VIEW"}:
+            types.append("VIEW")
+        elif value:
+            types.append(value)
+    return types or ["TABLE", "VIEW"]
+
+
+def load_sqlite_catalog(path: str) -> List[CatalogObject]:
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    try:
+        cur = conn.execute(
+            "SELECT 'main', m.name, m.type, p.name "
+            "FROM sqlite_master m LEFT JOIN pragma_table_info(m.name) p "
+            "WHERE m.type IN ('table', 'view') AND m.name NOT LIKE 'sqlite_%' "
+            "ORDER BY m.name, p.cid"
+        )
+        return build_objects(cur.fetchall())
+    finally:
+        conn.close()
+
+
+def load_oracle_catalog(
+    connection_factory: Callable,
+    owner: str,
+    object_types: Sequence[str],
+    object_names: Optional[Sequence[str]] = None,
+) -> List[CatalogObject]:
+    binds = {"owner": owner.upper()}
+    type_placeholders = []
+    for idx, obj_type in enumerate(object_types):
+        binds[f"type{idx}"] = obj_type
+        type_placeholders.append(f":type{idx}")
+    query = (
+        "SELECT o.owner, o.object_name, o.object_type, c.column_name "
+        "FROM all_objects o "
+        "LEFT JOIN all_tab_columns c ON c.owner = o.owner AND c.table_name = o.object_name "
+        f"WHERE o.owner = :owner AND o.object_type IN ({', '.join(type_placeholders)}) "
+        "AND o.object_name NOT LIKE 'BIN$%'"
+    )
+    if object_names:
+        name_placeholders = []
+        for idx, name in enumerate(object_names):
+            binds[f"name{idx}"] = name.upper()
+            name_placeholders.append(f":name{idx}")
+        query += f" AND o.object_name IN ({', '.join(name_placeholders)})"
+    query += " ORDER BY o.object_name, c.column_id"
+
+    conn = connection_factory()
+    try:
+        cur = conn.cursor()
+        try:
+            cur.arraysize = 5000
+            cur.execute(query, binds)
+            return build_objects(cur.fetchall())
+        finally:
+            cur.close()
+    finally:
+        conn.close()
+
+
+def load_mssql_catalog(conn_str: str) -> List[CatalogObject]:
+    import pyodbc
+
+    conn = pyodbc.connect(conn_str)
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT t.TABLE_SCHEMA, t.TABLE_NAME, "
+            "CASE t.TABLE_TYPE WHEN 'VIEW' THEN 'view' ELSE 'table' END, c.COLUMN_NAME "
+            "FROM INFORMATION_SCHEMA.TABLES t "
+            "LEFT JOIN INFORMATION_SCHEMA.COLUMNS c "
+            "ON c.TABLE_SCHEMA = t.TABLE_SCHEMA AND c.TABLE_NAME = t.TABLE_NAME "
+            "ORDER BY t.TABLE_NAME, c.ORDINAL_POSITION"
+        )
+        return build_objects(cur.fetchall())
+    finally:
+        conn.close()
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+class SchemaCatalog:
+    """
+    Refreshable catalog. `loader` returns catalog objects, or None when the
+    provider has no catalog support. A failed load keeps the previous snapshot
+    and is retried after `retry_seconds`; it never caches an empty catalog.
+    The loader never runs on the event loop: async callers await aget(), and
+    get() called from a coroutine starts the load in the background instead.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Optional[List[CatalogObject]]],
+        ttl_seconds: int = 300,
+        retry_seconds: int = 30,
+        default_schema: str = "",
+    ):
+        self._loader = loader
+        self.ttl_seconds = ttl_seconds
+        self.retry_seconds = retry_seconds
+        self.default_schema = (default_schema or "").lower()
+        self.supported = True
+        self.last_error: Optional[str] = None
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._version = 0
+        self._next_retry = 0.0
+        self._refresh_lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._load_thread: Optional[threading.Thread] = None
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def on_change(self, listener: Callable[[CatalogSnapshot], None]) -> None:
+        """Register a callback invoked with the new snapshot whenever the version changes."""
+        self._listeners.append(listener)
+
+    def refresh(self) -> Optional[CatalogSnapshot]:
+        """Reload synchronously; returns the current snapshot (new or previous)."""
+        with self._refresh_lock:
+            start = time.perf_counter()
+            try:
+                objects = self._loader()
+            except Exception as exc:
+                self.last_error = str(exc)
+                self._next_retry = time.time() + self.retry_seconds
+                log_perf(logger, "schema_catalog.error", {"error": str(exc), "version": self._version})
+                return self._snapshot
+            if objects is None:
+                self.supported = False
+                return None
+            self.supported = True
+            self.last_error = None
+            fingerprint = _fingerprint(objects)
+            previous = self._snapshot
+            if previous is not None and previous.fingerprint == fingerprint:
+                previous.loaded_at = time.time()
+                return previous
+            self._version += 1
+            snapshot = CatalogSnapshot(self._version, fingerprint, objects, self.default_schema)
+            self._snapshot = snapshot
+            log_perf(
+                logger,
+                "schema_catalog.refresh",
+                {
+                    "version": snapshot.version,
+                    "objects": len(snapshot),
+                    "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                },
+            )
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot)
+            except Exception as exc:
+                log_perf(logger, "schema_catalog.listener_error", {"error": str(exc)})
+        return snapshot
+
+    def get(self) -> Optional[CatalogSnapshot]:
+        """
+        Current snapshot. A missing one (first use, or after a failed load) is loaded
+        synchronously, except on an event loop thread: there the load starts in the
+        background and None is served until it lands.
+        """
+        snapshot = self._snapshot
+        if snapshot is None and self._load_due():
+            if _on_event_loop():
+                self._load_in_background()
+            else:
+                snapshot = self._load_missing()
+        self._ensure_background_refresh()
+        return snapshot
+
+    async def aget(self) -> Optional[CatalogSnapshot]:
+        """Like get(), but waits for a missing snapshot in a worker thread."""
+        if self._snapshot is None and self._load_due():
+            await asyncio.to_thread(self._load_missing)
+        return self.get()
+
+    def _load_due(self) -> bool:
+        return self.supported and time.time() >= self._next_retry
+
+    def _load_missing(self) -> Optional[CatalogSnapshot]:
+        # Concurrent first callers share one load instead of queueing up behind each other's
+        with self._load_lock:
+            if self._snapshot is None and self._load_due():
+                return self.refresh()
+            return self._snapshot
+
+    def _load_in_background(self) -> None:
+        with self._start_lock:
+            if self._load_thread is not None and self._load_thread.is_alive():
+                return
+            self._load_thread = threading.Thread(target=self._load_missing, name="schema-catalog-load", daemon=True)
+            self._load_thread.start()
+
+    @property
+    def available(self) -> bool:
+        return self.get() is not None
+
+    def lookup(self, name: str, schema: Optional[str] = None) -> Optional[CatalogObject]:
+        snapshot = self.get()
+        return snapshot.lookup(name, schema) if snapshot else None
+
+    def table_names(self) -> set:
+        snapshot = self.get()
+        return snapshot.table_names() if snapshot else set()
+
+    def status(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "supported": self.supported,
+            "version": self._version,
+            "objects": len(snapshot) if snapshot else 0,
+            "loaded_at": snapshot.loaded_at if snapshot else None,
+            "last_error": self.last_error,
+        }
+
+    def _ensure_background_refresh(self) -> None:
+        if self._thread is not None or self.ttl_seconds <= 0 or not self.supported:
+            return
+        # Not _refresh_lock: a load in progress holds it for the whole round trip
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="schema-catalog", daemon=True)
+            self._thread.start()
+
+    def _refresh_loop(self) -> None:
+        while not self._stop.wait(self.ttl_seconds):
+            self.refresh()
+
+    def close(self) -> None:
+        self._stop.set()
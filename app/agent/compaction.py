@@ -0,0 +1,211 @@
+"""
+Conversation compaction.
+Once a conversation's history passes COMPACTION_TRIGGER_CHARS, every turn
+except the last COMPACTION_KEEP_TURNS is replaced by one summary message that
+keeps the user intents, the SQL that ran and the shape of each result.
+
+The summary served on the request path is cheap: the cached summary for the
+already-covered prefix plus an extractive digest of newer turns. A fuller
+LLM summary is produced in a background task at BACKGROUND priority and
+cached per conversation for the following turns.
+"""
+
+import asyncio
+import hashlib
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from cachetools import LRUCache
+from vanna.core.filter import ConversationFilter
+from vanna.core.storage.models import Message
+
+from app.config import (
+    COMPACTION_CACHE_SIZE,
+    COMPACTION_ENABLED,
+    COMPACTION_KEEP_TURNS,
+    COMPACTION_LLM_SUMMARY,
+    COMPACTION_SUMMARY_CHARS,
+    COMPACTION_TRIGGER_CHARS,
+    LLM_MAX_PROMPT_CHARS,
+)
+from app.agent.llm_scheduler import Priority, llm_priority
+from app.agent.streaming import reset_delta_sink, set_delta_sink
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+SUMMARY_HEADER = "Summary of the earlier conversation:"
+SUMMARY_INSTRUCTIONS = (
+    "Summarize the earlier part of a data-analysis conversation for the assistant that continues it. "
+    "Keep every executed SQL statement verbatim, what each result looked like (columns, row counts, errors) "
+    "and what the user wanted. Use terse bullet points; no preamble. "
+    f"Stay under {COMPACTION_SUMMARY_CHARS} characters."
+)
+
+Summarizer = Callable[[str], Awaitable[str]]
+
+
+def _first_line(text: str, limit: int) -> str:
+    line = (text or "").strip().splitlines()[0] if (text or "").strip() else ""
+    return line if len(line) <= limit else line[: limit - 3] + "..."
+
+
+def digest(messages: List[Message]) -> List[str]:
+    """Extractive, deterministic summary lines: intents, executed SQL, result shapes."""
+    lines = []
+    for m in messages:
+        if m.role == "user":
+            lines.append(f"- User asked: {_first_line(m.content, 200)}")
+        elif m.role == "assistant":
+            for tc in m.tool_calls or []:
+                sql = (tc.arguments or {}).get("sql")
+                lines.append(f"- Ran SQL: {' '.join(sql.split())}" if sql else f"- Called {tc.name}")
+            if m.content and not m.tool_calls:
+                lines.append(f"- Answered: {_first_line(m.content, 150)}")
+        elif m.role == "tool":
+            rows = len((m.content or "").strip().splitlines())
+            lines.append(f"- Result ({rows} lines): {_first_line(m.content, 120)}")
+        elif m.role == "system" and (m.content or "").startswith(SUMMARY_HEADER):
+            lines.extend(m.content.splitlines()[1:])
+    return lines
+
+
+def _fit(lines: List[str], limit: int) -> str:
+    """Keep the most recent lines that fit in the limit."""
+    kept, used = [], 0
+    for line in reversed(lines):
+        if used + len(line) + 1 > limit:
+            break
+        kept.append(line)
+        used += len(line) + 1
+    return "\n".join(reversed(kept))
+
+
+def _render(messages: List[Message], limit: int) -> str:
+    parts = []
+    for m in messages:
+        text = m.content or ""
+        for tc in m.tool_calls or []:
+            text += f"\n[tool call {tc.name}: {tc.arguments}]"
+        parts.append(f"{m.role.upper()}: {text[:1000]}")
+    return "\n\n".join(parts)[-limit:]
+
+
+async def _llm_summarize(transcript: str) -> str:
+    from vanna.core.llm import LlmMessage, LlmRequest
+    from vanna.core.user import User
+
+    from app.agent.llm import llm
+
+    request = LlmRequest(
+        messages=[LlmMessage(role="user", content=transcript)],
+        system_prompt=SUMMARY_INSTRUCTIONS,
+        user=User(id="conversation-compaction"),
+        max_tokens=max(COMPACTION_SUMMARY_CHARS // 3, 128),
+    )
+    response = await llm.send_request(request)
+    return (response.content or "").strip()
+
+
+class ConversationCompactor(ConversationFilter):
+    def __init__(
+        self,
+        trigger_chars: int = COMPACTION_TRIGGER_CHARS,
+        keep_turns: int = COMPACTION_KEEP_TURNS,
+        summary_chars: int = COMPACTION_SUMMARY_CHARS,
+        summarizer: Optional[Summarizer] = _llm_summarize if COMPACTION_LLM_SUMMARY else None,
+        enabled: bool = COMPACTION_ENABLED,
+    ):
+        self.trigger_chars = trigger_chars
+        self.keep_turns = max(keep_turns, 1)
+        self.summary_chars = summary_chars
+        self.summarizer = summarizer
+        self.enabled = enabled
+        # conversation key -> (number of messages covered, summary text)
+        self._summaries: LRUCache = LRUCache(maxsize=max(COMPACTION_CACHE_SIZE, 1))
+        self._pending: Dict[str, asyncio.Task] = {}
+        self.counters = {"compactions": 0, "cached_summaries": 0, "llm_summaries": 0, "llm_failures": 0}
+
+    @staticmethod
+    def conversation_key(messages: List[Message]) -> str:
+        # Stored history is append-only, so its first message identifies the conversation
+        first = messages[0]
+        seed = f"{first.timestamp.isoformat()}|{first.role}|{(first.content or '')[:200]}"
+        return hashlib.sha256(seed.encode("utf-8")).hexdigest()[:24]
+
+    def _split(self, msgs: List[Message]) -> int:
+        """Index where the kept turns start; always at a user message so tool calls stay paired."""
+        starts = [i for i, m in enumerate(msgs) if m.role == "user"]
+        if len(starts) <= self.keep_turns:
+            return 0
+        return starts[-self.keep_turns]
+
+    async def filter_messages(self, msgs: List[Message]) -> List[Message]:
+        if not self.enabled or not msgs:
+            return msgs
+        if sum(len(m.content or "") for m in msgs) <= self.trigger_chars:
+            return msgs
+        split = self._split(msgs)
+        if split == 0:
+            return msgs
+
+        older, recent = msgs[:split], msgs[split:]
+        key = self.conversation_key(msgs)
+        summary = self._summary_for(key, older)
+        self.counters["compactions"] += 1
+        log_perf(
+            logger,
+            "conversation.compacted",
+            {"older_messages": len(older), "kept_messages": len(recent), "summary_chars": len(summary)},
+        )
+        return [Message(role="system", content=f"{SUMMARY_HEADER}\n{summary}")] + recent
+
+    def _summary_for(self, key: str, older: List[Message]) -> str:
+        covered, cached = self._summaries.get(key, (0, ""))
+        if covered > len(older):
+            covered, cached = 0, ""
+        if covered == len(older):
+            self.counters["cached_summaries"] += 1
+            return cached
+
+        lines = (cached.splitlines() if cached else []) + digest(older[covered:])
+        summary = _fit(lines, self.summary_chars)
+        self._summaries[key] = (len(older), summary)
+        self._schedule(key, older)
+        return summary
+
+    def _schedule(self, key: str, older: List[Message]) -> None:
+        if self.summarizer is None or key in self._pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._refresh(key, list(older)))
+        self._pending[key] = task
+        task.add_done_callback(lambda _t, key=key: self._pending.pop(key, None))
+
+    async def _refresh(self, key: str, older: List[Message]) -> None:
+        # Runs in a copy of the request context: never stream into the user's reply
+        token = set_delta_sink(None)
+        try:
+            with llm_priority(Priority.BACKGROUND):
+                text = await self.summarizer(_render(older, LLM_MAX_PROMPT_CHARS))
+        except Exception as exc:
+            self.counters["llm_failures"] += 1
+            log_perf(logger, "conversation.summary_failed", {"error": str(exc)})
+            return
+        finally:
+            reset_delta_sink(token)
+        if not text:
+            return
+        covered, _ = self._summaries.get(key, (0, ""))
+        if covered <= len(older):
+            # Only replace a summary covering the same prefix or less
+            self._summaries[key] = (len(older), text[: self.summary_chars])
+            self.counters["llm_summaries"] += 1
+
+    def stats(self) -> dict:
+        return {**self.counters, "conversations": len(self._summaries), "pending": len(self._pending)}
+
+
+compactor = ConversationCompactor()
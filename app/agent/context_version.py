@@ -0,0 +1,37 @@
+"""
+Context version fingerprint.
+Cached LLM answers and semantic-cache entries depend on the schema and the
+training corpus the prompt was built from. Each source reports a cheap
+version string; the combined fingerprint is part of every cache key, so a
+change makes old entries unreachable (they age out via TTL) without a scan.
+"""
+
+import hashlib
+from typing import Callable, Dict
+
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+_sources: Dict[str, Callable[[], object]] = {}
+
+
+def register_version_source(name: str, source: Callable[[], object]) -> None:
+    """Register a callable whose return value changes whenever its part of the context changes."""
+    _sources[name] = source
+
+
+def version_components() -> Dict[str, str]:
+    components = {}
+    for name, source in sorted(_sources.items()):
+        try:
+            components[name] = str(source())
+        except Exception as exc:
+            log_perf(logger, "context_version.error", {"source": name, "error": str(exc)})
+            components[name] = "error"
+    return components
+
+
+def context_version() -> str:
+    raw = "|".join(f"{name}={value}" for name, value in version_components().items())
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
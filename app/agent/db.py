@@ -1,6 +1,6 @@
 import asyncio
-import re
 import time
+from difflib import get_close_matches
 from uuid import uuid4
 
 import pandas as pd
@@ -38,12 +38,33 @@ from app.config import (
     ORACLE_TRAIN_OBJECTS,
     ORACLE_TRAIN_TABLES,
 )
-from app.agent.sql_validation import validate_sql, SQLValidationError
-from app.utils.logger import setup_logger, log_perf, record_perf_sample
+from app.agent.sql_validation import (
+    ColumnValidationError,
+    SQLValidationError,
+    validate_columns,
+    validate_sql,
+)
+from app.agent.sql_analysis import analyze_sql
+from app.agent.catalog import (
+    BUILTIN_TABLES,
+    SchemaCatalog,
+    load_mssql_catalog,
+    load_oracle_catalog,
+    load_sqlite_catalog,
+    normalize_object_types,
+)
+from app.agent.sql_transpile import rewrite_pagination, transpile
+from app.agent.semantic_cache import semantic_cache
+from app.utils.logger import setup_logger, log_perf
+from app.utils.metrics import observe_latency
 from app.config import (
     DB_QUERY_TIMEOUT_MS,
     DB_MAX_RETRIES,
     DB_RETRY_BACKOFF_MS,
+    SQL_TRANSPILE_ENABLED,
+    SCHEMA_CATALOG_TTL_SECONDS,
+    SCHEMA_CATALOG_RETRY_SECONDS,
+    SQL_COLUMN_CHECK_ENABLED,
 )
 
 
@@ -102,10 +123,12 @@ def _build_oracle_runner():
         async def run_sql(self, args: RunSqlToolArgs, context: ToolContext) -> pd.DataFrame:
             if not db_circuit._can_pass():
                 raise RuntimeError("CircuitBreaker[db] is OPEN")
+            # Dialect rewrites (LIMIT -> FETCH FIRST, etc.) happen in SafeRunSqlTool via sql_transpile;
+            # with that stage off, LIMIT still has to become FETCH FIRST here
             sql = args.sql.strip()
-            sql = re.sub(r";\s*$", "", sql, flags=re.IGNORECASE)
-            # Normalize common non-Oracle syntax (LIMIT) to Oracle FETCH FIRST
-            sql = re.sub(r"\s+LIMIT\s+(\d+)\s*$", r" FETCH FIRST \1 ROWS ONLY", sql, flags=re.IGNORECASE)
+            if not SQL_TRANSPILE_ENABLED:
+                sql = rewrite_pagination(sql, "oracle")
+            sql = sql.rstrip(";").rstrip()
             for attempt in range(DB_MAX_RETRIES + 1):
                 try:
                     async def _do_query():
@@ -114,9 +137,14 @@ def _build_oracle_runner():
                             cur = conn.cursor()
                             try:
                                 cur.execute(sql)
+                                fetch_start = time.perf_counter()
                                 rows = cur.fetchall()
                                 cols = [d[0] for d in cur.description] if cur.description else []
-                                return pd.DataFrame(rows, columns=cols)
+                                frame = pd.DataFrame(rows, columns=cols)
+                                observe_latency(
+                                    "fetch", (time.perf_counter() - fetch_start) * 1000, provider="oracle"
+                                )
+                                return frame
                             finally:
                                 cur.close()
                         finally:
@@ -152,73 +180,111 @@ def get_sql_runner():
 
 sql_runner = get_sql_runner()
 perf_logger = setup_logger(__name__)
-_allowed_tables_cache = None
 
 
-def _extract_tables(sql: str):
-    import re
+def _catalog_loader():
+    if DB_PROVIDER == "sqlite" and DB_SQLITE:
+        return load_sqlite_catalog(DB_SQLITE)
+    if DB_PROVIDER == "oracle":
+        if not _oracle_connection_factory:
+            raise RuntimeError("Oracle connection factory is not initialized")
+        train_tables = ORACLE_TRAIN_TABLES if ORACLE_TRAIN_TABLES != ["ALL"] else None
+        return load_oracle_catalog(
+            _oracle_connection_factory,
+            owner=(ORACLE_SCHEMA or ORACLE_USER or ""),
+            object_types=normalize_object_types(ORACLE_TRAIN_OBJECTS),
+            object_names=train_tables,
+        )
+    if DB_PROVIDER == "mssql" and DB_MSSQL_CONN:
+        return load_mssql_catalog(DB_MSSQL_CONN)
+    return None
 
-    candidates = re.findall(
-        r"\bfrom\s+([\w\.\"]+)|\bjoin\s+([\w\.\"]+)", sql, flags=re.IGNORECASE
-    )
-    tables = []
-    for a, b in candidates:
-        name = a or b
-        name = name.replace('"', "").split(".")[-1]
-        if name:
-            tables.append(name.lower())
-    return set(tables)
+
+schema_catalog = SchemaCatalog(
+    _catalog_loader,
+    ttl_seconds=SCHEMA_CATALOG_TTL_SECONDS,
+    retry_seconds=SCHEMA_CATALOG_RETRY_SECONDS,
+    default_schema="main" if DB_PROVIDER == "sqlite" else (ORACLE_SCHEMA or ORACLE_USER or ""),
+)
+
+
+def schema_fingerprint() -> str:
+    """Stable identifier of the current schema, for scoping cached answers."""
+    snapshot = schema_catalog.get()
+    return snapshot.fingerprint[:16] if snapshot else "none"
+
+
+def _extract_tables(sql: str):
+    """Physical tables referenced anywhere in the statement (CTE names excluded)."""
+    return set(analyze_sql(sql).tables)
 
 
 def _load_allowed_tables():
-    global _allowed_tables_cache
-    if _allowed_tables_cache is not None:
-        return _allowed_tables_cache
-    tables = set()
-    try:
-        if DB_PROVIDER == "sqlite" and DB_SQLITE:
-            import sqlite3
+    """Lowercased table/view names from the current schema catalog snapshot."""
+    return schema_catalog.table_names()
+
+
+def _blocked_result(error_message: str, metadata: dict) -> ToolResult:
+    return ToolResult(
+        success=False,
+        result_for_llm=error_message,
+        ui_component=UiComponent(
+            rich_component=NotificationComponent(
+                type=ComponentType.NOTIFICATION,
+                level="error",
+                message=error_message,
+            ),
+            simple_component=SimpleTextComponent(text=error_message),
+        ),
+        error=error_message,
+        metadata={"error_type": "sql_validation", **metadata},
+    )
 
-            conn = sqlite3.connect(DB_SQLITE)
-            try:
-                cur = conn.execute(
-                    "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
-                )
-                tables = {row[0].lower() for row in cur.fetchall()}
-            finally:
-                conn.close()
-        if DB_PROVIDER == "oracle" and _oracle_connection_factory:
-            conn = _oracle_connection_factory()
-            try:
-                cur = conn.cursor()
-                normalized_obj_types = []
-                for o in ORACLE_TRAIN_OBJECTS:
-                    if o in {"TABLES", "TABLE"}:
-                        normalized_obj_types.append("TABLE")
-                    elif o in {"VIEWS", "VIEW"}:
-                        normalized_obj_types.append("VIEW")
-                    elif o:
-                        normalized_obj_types.append(o)
-                if not normalized_obj_types:
-                    normalized_obj_types = ["TABLE", "VIEW"]
-                type_list = ", ".join(f"'{t}'" for t in normalized_obj_types)
-                schema = (ORACLE_SCHEMA or ORACLE_USER or "").upper()
-                query = (
-                    "SELECT object_name FROM all_objects "
-                    f"WHERE owner = '{schema}' AND object_type IN ({type_list})"
-                )
-                train_tables = ORACLE_TRAIN_TABLES
-                if train_tables and train_tables != ["ALL"]:
-                    table_list = ", ".join(f"'{t}'" for t in train_tables)
-                    query += f" AND object_name IN ({table_list})"
-                cur.execute(query)
-                tables = {row[0].lower() for row in cur.fetchall()}
-            finally:
-                conn.close()
-    except Exception as e:
-        log_perf(perf_logger, "schema_guard.error", {"error": str(e)})
-    _allowed_tables_cache = tables
-    return tables
+
+def _check_schema(sql: str):
+    """Return a blocking ToolResult when the statement references unknown tables or columns, else None."""
+    refs = analyze_sql(sql).table_refs
+    if not refs:
+        return None
+    snapshot = schema_catalog.get()
+    if snapshot is None:
+        if not schema_catalog.supported:
+            return None
+        return _blocked_result(
+            "SQL blocked: schema catalog is unavailable; retry shortly",
+            {"catalog_error": schema_catalog.last_error},
+        )
+    builtins = BUILTIN_TABLES.get(DB_PROVIDER, set())
+    invalid = sorted(
+        {
+            ref.name
+            for ref in refs
+            if ref.name not in builtins and snapshot.lookup(ref.name, ref.schema) is None
+        }
+    )
+    if invalid:
+        known = sorted(snapshot.table_names())
+        suggestions = {name: get_close_matches(name, known, n=3, cutoff=0.6) for name in invalid}
+        hints = [f"{name} -> {', '.join(s)}" for name, s in suggestions.items() if s]
+        hint_text = f"; closest tables: {'; '.join(hints)}" if hints else ""
+        return _blocked_result(
+            f"SQL blocked: referenced tables not allowed ({', '.join(invalid)}){hint_text}",
+            {"invalid_tables": invalid, "suggestions": suggestions, "catalog_version": snapshot.version},
+        )
+    if SQL_COLUMN_CHECK_ENABLED:
+        # Reject invented columns locally instead of paying for an ORA-00904 round trip
+        try:
+            validate_columns(sql, snapshot, DB_PROVIDER)
+        except ColumnValidationError as exc:
+            return _blocked_result(
+                f"SQL blocked: {exc}",
+                {
+                    "invalid_columns": [reference for reference, _ in exc.unknown],
+                    "suggestions": exc.suggestions,
+                    "catalog_version": snapshot.version,
+                },
+            )
+    return None
 
 
 class SafeRunSqlTool(RunSqlTool):
@@ -229,6 +295,7 @@ class SafeRunSqlTool(RunSqlTool):
         try:
             safe_sql = validate_sql(args.sql)
         except SQLValidationError as exc:
+            semantic_cache.record_failure()
             error_message = f"SQL blocked: {exc}"
             return ToolResult(
                 success=False,
@@ -244,28 +311,26 @@ class SafeRunSqlTool(RunSqlTool):
             )
 
         safe_args = RunSqlToolArgs(sql=safe_sql)
-        tables = _extract_tables(safe_sql)
-        allowed = _load_allowed_tables()
-        if tables and allowed:
-            invalid = [t for t in tables if t not in allowed]
-            if invalid:
-                error_message = (
-                    f"SQL blocked: referenced tables not allowed ({', '.join(invalid)})"
-                )
-                return ToolResult(
-                    success=False,
-                    result_for_llm=error_message,
-                    ui_component=UiComponent(
-                        rich_component=NotificationComponent(
-                            type=ComponentType.NOTIFICATION,
-                            level="error",
-                            message=error_message,
-                        ),
-                        simple_component=SimpleTextComponent(text=error_message),
-                    ),
-                    error=error_message,
-                    metadata={"error_type": "sql_validation", "invalid_tables": invalid},
+        # A cold or failed catalog loads in a worker thread, not on the event loop
+        await schema_catalog.aget()
+        blocked = _check_schema(safe_sql)
+        if blocked is not None:
+            semantic_cache.record_failure()
+            return blocked
+        if SQL_TRANSPILE_ENABLED:
+            # Rewrite cross-dialect idioms before they cost a failed DB call and an LLM retry
+            transpiled = transpile(safe_sql, DB_PROVIDER)
+            if transpiled.changed:
+                log_perf(
+                    perf_logger,
+                    "sql.transpile",
+                    {
+                        "provider": DB_PROVIDER,
+                        "rules": list(transpiled.rules),
+                        "request_id": getattr(context, "request_id", None),
+                    },
                 )
+                safe_args = RunSqlToolArgs(sql=transpiled.sql)
         result = await super().execute(context, safe_args)
         duration_ms = round((time.time() - start_time) * 1000, 2)
         log_perf(
@@ -279,7 +344,12 @@ class SafeRunSqlTool(RunSqlTool):
                 "trace_id": getattr(context, "trace_id", None),
             },
         )
-        record_perf_sample("sql_ms", duration_ms)
+        observe_latency("sql", duration_ms, provider=DB_PROVIDER)
+        if result.success:
+            # The transpiled text is what actually ran and what a replay must run
+            semantic_cache.record_success(safe_args.sql)
+        else:
+            semantic_cache.record_failure()
         return result
 
 
@@ -287,6 +357,7 @@ class SafeVisualizeDataTool(VisualizeDataTool):
     """Gracefully handle missing/invalid files during visualization."""
 
     async def execute(self, context: ToolContext, args):
+        start = time.perf_counter()
         try:
             return await super().execute(context, args)
         except FileNotFoundError as exc:
@@ -315,6 +386,8 @@ class SafeVisualizeDataTool(VisualizeDataTool):
                 ),
                 error=str(exc),
             )
+        finally:
+            observe_latency("visualization", (time.perf_counter() - start) * 1000)
 
 
 # Phase 1.B: Use guarded RunSql tool to enforce SQL Safety Layer pre-checks.
@@ -374,6 +447,7 @@ async def test_connections() -> dict:
 
 
 def close_db():
+    schema_catalog.close()
     try:
         if _oracle_pool:
             _oracle_pool.close()
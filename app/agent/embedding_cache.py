@@ -0,0 +1,154 @@
+"""
+Persistent embedding cache.
+Vectors are stored in SQLite as float16 blobs keyed by (model id, SHA-256 of
+the text), outside chroma_db so purges, restores and retrains reuse them.
+The table is LRU-bounded: hits refresh a last-used stamp and the oldest rows
+are pruned once it grows past max_entries.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+
+from app.config import EMBEDDING_CACHE_MAX_ENTRIES, EMBEDDING_CACHE_PATH
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+# SQLite's default limit on bound parameters is 999
+_CHUNK = 500
+
+
+def text_key(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def to_stored(vector) -> np.ndarray:
+    """The float32 value a vector has after a round trip through the cache."""
+    return np.asarray(vector, dtype=np.float16).astype(np.float32)
+
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max(max_entries, 1)
+        self._conn = None
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.counters = {"hits": 0, "misses": 0, "stored": 0, "pruned": 0, "errors": 0}
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            # Training scripts and the API server may share the file
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, key TEXT NOT NULL, dim INTEGER NOT NULL, "
+                "vector BLOB NOT NULL, used REAL NOT NULL, PRIMARY KEY (model, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """Cached vectors by text; texts not in the cache are simply absent."""
+        by_key = {text_key(t): t for t in texts}
+        keys = list(by_key)
+        found: Dict[str, np.ndarray] = {}
+        try:
+            with self._lock:
+                conn = self._connection()
+                for start in range(0, len(keys), _CHUNK):
+                    chunk = keys[start : start + _CHUNK]
+                    marks = ",".join("?" * len(chunk))
+                    rows = conn.execute(
+                        f"SELECT key, dim, vector FROM embeddings WHERE model = ? AND key IN ({marks})",
+                        [model, *chunk],
+                    ).fetchall()
+                    for key, dim, blob in rows:
+                        found[by_key[key]] = np.frombuffer(blob, dtype=np.float16, count=dim).astype(np.float32)
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embeddings SET used = ? WHERE model = ? AND key = ?",
+                        [(now, model, text_key(t)) for t in found],
+                    )
+                    conn.commit()
+        except sqlite3.Error as exc:
+            self._error("get", exc)
+            return {}
+        hits = sum(1 for t in texts if t in found)
+        self.counters["hits"] += hits
+        self.counters["misses"] += len(texts) - hits
+        return found
+
+    def put_many(self, model: str, texts: Sequence[str], vectors: Sequence) -> None:
+        now = time.time()
+        rows = []
+        for text, vector in zip(texts, vectors):
+            stored = np.asarray(vector, dtype=np.float16)
+            rows.append((model, text_key(text), int(stored.size), stored.tobytes(), now))
+        if not rows:
+            return
+        try:
+            with self._lock:
+                conn = self._connection()
+                conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?, ?)", rows)
+                conn.commit()
+                self.counters["stored"] += len(rows)
+                self._writes_since_prune += len(rows)
+                # Counting rows is a scan; only check once enough new rows could have overflowed
+                if self._writes_since_prune >= max(self.max_entries // 10, 1):
+                    self._prune(conn)
+        except sqlite3.Error as exc:
+            self._error("put", exc)
+
+    def _prune(self, conn: sqlite3.Connection) -> None:
+        self._writes_since_prune = 0
+        excess = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY used LIMIT ?)",
+            (excess,),
+        )
+        conn.commit()
+        self.counters["pruned"] += excess
+        log_perf(logger, "embedding_cache.pruned", {"rows": excess})
+
+    def _error(self, op: str, exc: Exception) -> None:
+        # The cache is an optimization; a broken file must never break embedding
+        self.counters["errors"] += 1
+        log_perf(logger, "embedding_cache.error", {"op": op, "error": str(exc)})
+
+    def size(self) -> int:
+        try:
+            with self._lock:
+                return self._connection().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        lookups = self.counters["hits"] + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": round(self.counters["hits"] / lookups, 4) if lookups else None,
+            "max_entries": self.max_entries,
+        }
+
+
+embedding_cache = EmbeddingCache()
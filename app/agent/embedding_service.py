@@ -0,0 +1,276 @@
+"""
+Out-of-process embedding service.
+With EMBEDDING_WORKERS > 0 the model runs in a pool of worker processes that
+each load it once, so tokenization and inference never hold the web
+worker's GIL. Concurrent callers are micro-batched: texts submitted within
+EMBEDDING_BATCH_WINDOW_MS (up to EMBEDDING_BATCH_SIZE of them) travel to a
+worker as one batch, and each caller gets its own slice back.
+
+`python -m app.agent.embedding_service` serves such a pool over HTTP, so
+several uvicorn workers can share one set of model processes by pointing
+EMBEDDING_SERVICE_URL at it.
+"""
+
+import asyncio
+import base64
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ProcessPoolExecutor
+from typing import Callable, List, Optional, Sequence
+
+import numpy as np
+
+from app.config import (
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_BATCH_WINDOW_MS,
+    EMBEDDING_SERVICE_HOST,
+    EMBEDDING_SERVICE_PORT,
+    EMBEDDING_WORKERS,
+)
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+# Set once per worker process by _init_worker
+_worker_encoder = None
+
+
+def _init_worker(factory: Callable, args: tuple) -> None:
+    global _worker_encoder
+    _worker_encoder = factory(*args)
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return np.asarray(_worker_encoder.encode(texts), dtype=np.float32)
+
+
+def _ping_worker() -> bool:
+    _worker_encoder.encode(["warm up"])
+    return True
+
+
+def _settle(future: Future, setter: Callable, value) -> None:
+    try:
+        setter(value)
+    except InvalidStateError:
+        # The caller gave up (a cancelled await); nobody wants this slice
+        pass
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent submit() calls into batches. dispatch(texts) must
+    return a Future of a (len(texts), dim) array; batches are not awaited by
+    the batching thread, so several can be in flight at once.
+    """
+
+    def __init__(
+        self,
+        dispatch: Callable[[List[str]], Future],
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_batch: int = EMBEDDING_BATCH_SIZE,
+    ):
+        self._dispatch = dispatch
+        self.window = max(window_ms, 0) / 1000.0
+        self.max_batch = max(max_batch, 1)
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "batches": 0, "texts": 0, "errors": 0}
+
+    def submit(self, texts: Sequence[str]) -> Future:
+        future: Future = Future()
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                    self._thread.start()
+        self.counters["requests"] += 1
+        self._queue.put((list(texts), future))
+        return future
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, size = [item], len(item[0])
+            deadline = time.monotonic() + self.window
+            while size < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+                size += len(item[0])
+            self._flush(batch)
+
+    def _flush(self, batch) -> None:
+        texts = [text for texts, _ in batch for text in texts]
+        self.counters["batches"] += 1
+        self.counters["texts"] += len(texts)
+        try:
+            result = self._dispatch(texts)
+        except Exception as exc:
+            self._fail(batch, exc)
+            return
+        result.add_done_callback(lambda done: self._split(done, batch))
+
+    def _split(self, done: Future, batch) -> None:
+        exc = done.exception()
+        if exc is not None:
+            self._fail(batch, exc)
+            return
+        vectors, offset = done.result(), 0
+        for texts, future in batch:
+            _settle(future, future.set_result, vectors[offset : offset + len(texts)])
+            offset += len(texts)
+
+    def _fail(self, batch, exc: BaseException) -> None:
+        self.counters["errors"] += 1
+        for _, future in batch:
+            _settle(future, future.set_exception, exc)
+
+    def close(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def stats(self) -> dict:
+        batches = self.counters["batches"]
+        return {**self.counters, "avg_batch": round(self.counters["texts"] / batches, 2) if batches else None}
+
+
+class PoolEncoder:
+    """Encoder backed by worker processes; sync encode() and async aencode() share one batcher."""
+
+    def __init__(self, factory: Callable, args: tuple, workers: int = EMBEDDING_WORKERS):
+        self.workers = max(workers, 1)
+        # spawn: workers must not inherit the web worker's threads, sockets or event loop
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(factory, args),
+        )
+        self._batcher = MicroBatcher(lambda texts: self._pool.submit(_encode_in_worker, texts))
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self._batcher.submit(texts).result()
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        return await asyncio.wrap_future(self._batcher.submit(texts))
+
+    def warm_up(self) -> None:
+        """Start every worker so each has its model loaded before real traffic."""
+        for future in [self._pool.submit(_ping_worker) for _ in range(self.workers)]:
+            future.result()
+
+    def close(self) -> None:
+        self._batcher.close()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {"mode": "process_pool", "workers": self.workers, **self._batcher.stats()}
+
+
+def encode_vectors(vectors: np.ndarray) -> dict:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return {"shape": list(vectors.shape), "data": base64.b64encode(vectors.tobytes()).decode("ascii")}
+
+
+def decode_vectors(payload: dict) -> np.ndarray:
+    raw = base64.b64decode(payload["data"])
+    return np.frombuffer(raw, dtype=np.float32).reshape(payload["shape"])
+
+
+class RemoteEncoder:
+    """Client for a shared embedding service started with `python -m app.agent.embedding_service`."""
+
+    def __init__(self, url: str):
+        self.url = url.rstrip("/") + "/embed"
+        self.counters = {"requests": 0, "texts": 0}
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        from app.utils.http_client import get_sync_http_client
+
+        self._count(texts)
+        response = get_sync_http_client().post(self.url, json={"texts": list(texts)})
+        response.raise_for_status()
+        return decode_vectors(response.json())
+
+    async def aencode(self, texts: List[str]) -> np.ndarray:
+        from app.utils.http_client import get_async_http_client
+
+        self._count(texts)
+        response = await get_async_http_client().post(self.url, json={"texts": list(texts)})
+        response.raise_for_status()
+        return decode_vectors(response.json())
+
+    def _count(self, texts) -> None:
+        self.counters["requests"] += 1
+        self.counters["texts"] += len(texts)
+
+    def stats(self) -> dict:
+        return {"mode": "remote", "url": self.url, **self.counters}
+
+
+def create_app(encoder):
+    from fastapi import FastAPI
+    from pydantic import BaseModel
+
+    class EmbedRequest(BaseModel):
+        texts: List[str]
+
+    app = FastAPI(title="embedding-service")
+
+    @app.post("/embed")
+    async def embed(body: EmbedRequest):
+        start = time.perf_counter()
+        vectors = await encoder.aencode(body.texts) if body.texts else np.zeros((0, 0), dtype=np.float32)
+        log_perf(
+            logger,
+            "embedding_service.embed",
+            {"texts": len(body.texts), "duration_ms": round((time.perf_counter() - start) * 1000, 2)},
+        )
+        return encode_vectors(vectors)
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", **encoder.stats()}
+
+    return app
+
+
+def main() -> None:
+    import argparse
+
+    import uvicorn
+
+    from app.agent.embeddings import embedding_function, local_encoder_spec
+
+    parser = argparse.ArgumentParser(description="Shared embedding service (model in a process pool)")
+    parser.add_argument("--host", default=EMBEDDING_SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=EMBEDDING_SERVICE_PORT)
+    parser.add_argument("--workers", type=int, default=max(EMBEDDING_WORKERS, 1))
+    args = parser.parse_args()
+
+    encoder = PoolEncoder(*local_encoder_spec(embedding_function), workers=args.workers)
+    encoder.warm_up()
+    try:
+        uvicorn.run(create_app(encoder), host=args.host, port=args.port)
+    finally:
+        encoder.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+"""
+Embedding provider.
+The sentence-transformer model is loaded on first use (or by warm_up) rather
+than at import, so importing the agent no longer pulls in torch and the
+model weights. EMBEDDING_BACKEND=onnx runs the same model on ONNX Runtime,
+using the int8-quantized export when EMBEDDING_ONNX_QUANTIZED is set.
+
+EMBEDDING_WORKERS > 0 moves the model into a process pool with
+micro-batching, and EMBEDDING_SERVICE_URL uses a shared embedding service
+instead (see embedding_service); callers in async code use aembed().
+
+With a cache attached, vectors for text seen before (by this model) come
+from the persistent embedding cache and only new text reaches the model.
+
+The function keeps Chroma's "sentence_transformer" name and config so
+existing collections open unchanged.
+"""
+
+import asyncio
+import json
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
+
+from app.agent.embedding_cache import EmbeddingCache, embedding_cache, to_stored
+from app.config import (
+    EMBEDDING_BACKEND,
+    EMBEDDING_BATCH_SIZE,
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_MODEL,
+    EMBEDDING_ONNX_FILE,
+    EMBEDDING_ONNX_QUANTIZED,
+    EMBEDDING_SERVICE_URL,
+    EMBEDDING_WORKERS,
+)
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+# Pre-quantized exports published with the sentence-transformers models
+ONNX_FULL_FILE = "onnx/model.onnx"
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+
+def _repo_id(model_name: str) -> str:
+    return model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+
+
+class TorchEncoder:
+    def __init__(self, model_name: str, device: str, normalize: bool):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name_or_path=model_name, device=device)
+        self.normalize = normalize
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=EMBEDDING_BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=self.normalize,
+        )
+
+
+class OnnxEncoder:
+    """Transformer on ONNX Runtime plus the model's own mean pooling and normalization."""
+
+    def __init__(self, tokenizer: Any, session: Any, normalize: bool, batch_size: int = EMBEDDING_BATCH_SIZE):
+        self.tokenizer = tokenizer
+        self.session = session
+        self.normalize = normalize
+        self.batch_size = max(batch_size, 1)
+        self.input_names = {i.name for i in session.get_inputs()}
+
+    @classmethod
+    def from_pretrained(cls, model_name: str, quantized: bool, normalize: bool) -> "OnnxEncoder":
+        import onnxruntime as ort
+        from huggingface_hub import hf_hub_download
+        from tokenizers import Tokenizer
+
+        repo = _repo_id(model_name)
+        onnx_file = EMBEDDING_ONNX_FILE or (ONNX_INT8_FILE if quantized else ONNX_FULL_FILE)
+        tokenizer = Tokenizer.from_file(hf_hub_download(repo, "tokenizer.json"))
+        with open(hf_hub_download(repo, "sentence_bert_config.json"), encoding="utf-8") as f:
+            max_length = json.load(f).get("max_seq_length", 256)
+        with open(hf_hub_download(repo, "modules.json"), encoding="utf-8") as f:
+            # The model's own pipeline decides whether its output is L2-normalized
+            normalize = normalize or any(m.get("type", "").endswith("Normalize") for m in json.load(f))
+        tokenizer.enable_truncation(max_length=max_length)
+        tokenizer.enable_padding()
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        session = ort.InferenceSession(
+            hf_hub_download(repo, onnx_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        return cls(tokenizer, session, normalize)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        out = []
+        for start in range(0, len(texts), self.batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start : start + self.batch_size])
+            mask = np.array([e.attention_mask for e in encodings], dtype=np.int64)
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": mask,
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64),
+            }
+            hidden = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            out.append(pooled.astype(np.float32))
+        return np.concatenate(out) if out else np.zeros((0, 0), dtype=np.float32)
+
+
+def load_local_encoder(model_name: str, backend: str, quantized: bool, device: str, normalize: bool):
+    if backend == "onnx":
+        return OnnxEncoder.from_pretrained(model_name, quantized, normalize)
+    return TorchEncoder(model_name, device, normalize)
+
+
+def local_encoder_spec(ef: "LazyEmbeddingFunction") -> Tuple[Callable, tuple]:
+    """Picklable (factory, args) that builds ef's model in another process."""
+    return load_local_encoder, (ef.model_name, ef.backend, ef.quantized, ef.device, ef.normalize_embeddings)
+
+
+class LazyEmbeddingFunction(SentenceTransformerEmbeddingFunction):
+    def __init__(
+        self,
+        model_name: str = EMBEDDING_MODEL,
+        backend: str = EMBEDDING_BACKEND,
+        quantized: bool = EMBEDDING_ONNX_QUANTIZED,
+        device: str = "cpu",
+        normalize_embeddings: bool = False,
+        loader: Optional[Callable[[], Any]] = None,
+        cache: Optional[EmbeddingCache] = None,
+        workers: int = 0,
+        service_url: str = "",
+    ):
+        # Deliberately skips the parent __init__, which loads the model
+        self.model_name = model_name
+        self.device = device
+        self.normalize_embeddings = normalize_embeddings
+        self.kwargs = {}
+        self.backend = backend
+        self.quantized = quantized
+        self._loader = loader or self._load_encoder
+        self._encoder = None
+        self._lock = threading.Lock()
+        self.cache = cache
+        self.workers = workers
+        self.service_url = service_url
+
+    @staticmethod
+    def build_from_config(config: dict) -> "LazyEmbeddingFunction":
+        # Chroma rebuilds the function from its config (even just to inspect it); stay lazy
+        ef = LazyEmbeddingFunction(
+            model_name=config.get("model_name", EMBEDDING_MODEL),
+            device=config.get("device", "cpu"),
+            normalize_embeddings=bool(config.get("normalize_embeddings", False)),
+            cache=embedding_cache if EMBEDDING_CACHE_ENABLED else None,
+        )
+        # Same model as the process-wide function: share it rather than load (or spawn) a second copy
+        shared = globals().get("embedding_function")
+        return shared if shared is not None and shared.model_id == ef.model_id else ef
+
+    @property
+    def model_id(self) -> str:
+        """Cache namespace: anything that changes the vectors for the same text."""
+        variant = "torch"
+        if self.backend == "onnx":
+            variant = f"onnx:{EMBEDDING_ONNX_FILE or ('int8' if self.quantized else 'fp32')}"
+        return f"{self.model_name}|{variant}|norm={int(self.normalize_embeddings)}"
+
+    @property
+    def loaded(self) -> bool:
+        return self._encoder is not None
+
+    def _load_encoder(self):
+        if self.service_url:
+            from app.agent.embedding_service import RemoteEncoder
+
+            return RemoteEncoder(self.service_url)
+        if self.workers > 0:
+            from app.agent.embedding_service import PoolEncoder
+
+            return PoolEncoder(*local_encoder_spec(self), workers=self.workers)
+        factory, args = local_encoder_spec(self)
+        return factory(*args)
+
+    def _get_encoder(self):
+        if self._encoder is None:
+            with self._lock:
+                if self._encoder is None:
+                    start = time.perf_counter()
+                    self._encoder = self._loader()
+                    log_perf(
+                        logger,
+                        "embeddings.loaded",
+                        {
+                            "model": self.model_name,
+                            "backend": self.backend,
+                            "quantized": self.backend == "onnx" and self.quantized,
+                            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+                        },
+                    )
+        return self._encoder
+
+    def _from_cache(self, texts: List[str]) -> Tuple[Dict[str, np.ndarray], List[str]]:
+        found = self.cache.get_many(self.model_id, texts)
+        return found, [t for t in dict.fromkeys(texts) if t not in found]
+
+    def _store(self, found: Dict[str, np.ndarray], missing: List[str], vectors) -> None:
+        self.cache.put_many(self.model_id, missing, vectors)
+        # Fresh vectors get the cache's precision too, so a text embeds the same either way
+        found.update((t, to_stored(v)) for t, v in zip(missing, vectors))
+
+    def __call__(self, input):
+        texts = list(input)
+        if not texts:
+            return []
+        if self.cache is None:
+            return [np.asarray(v, dtype=np.float32) for v in self._get_encoder().encode(texts)]
+
+        found, missing = self._from_cache(texts)
+        if missing:
+            self._store(found, missing, self._get_encoder().encode(missing))
+        return [found[t] for t in texts]
+
+    async def aembed(self, input) -> List[np.ndarray]:
+        """Async variant of __call__: waits on the worker pool or service without blocking the loop."""
+        texts = list(input)
+        if not texts:
+            return []
+        encoder = self._get_encoder() if self.loaded else await asyncio.to_thread(self._get_encoder)
+        if not hasattr(encoder, "aencode"):
+            # In-process model: cache lookup, encode and store all block, so one thread runs them
+            return await asyncio.to_thread(self, texts)
+        if self.cache is None:
+            return [np.asarray(v, dtype=np.float32) for v in await encoder.aencode(texts)]
+
+        # The SQLite cache stays off the loop too
+        found, missing = await asyncio.to_thread(self._from_cache, texts)
+        if missing:
+            await asyncio.to_thread(self._store, found, missing, await encoder.aencode(missing))
+        return [found[t] for t in texts]
+
+    def warm_up(self) -> None:
+        """Load the model and run one tiny batch so the first real query pays no setup cost."""
+        try:
+            # Straight to the encoder: a cache hit would skip loading the model
+            encoder = self._get_encoder()
+            if hasattr(encoder, "warm_up"):
+                encoder.warm_up()
+            else:
+                encoder.encode(["warm up"])
+        except Exception as exc:
+            log_perf(logger, "embeddings.warmup_failed", {"error": str(exc)})
+
+    def close(self) -> None:
+        encoder = self._encoder
+        if encoder is not None and hasattr(encoder, "close"):
+            encoder.close()
+
+    def stats(self) -> dict:
+        encoder = self._encoder
+        details = encoder.stats() if encoder is not None and hasattr(encoder, "stats") else {}
+        return {"loaded": encoder is not None, "model": self.model_id, **details}
+
+
+embedding_function = LazyEmbeddingFunction(
+    cache=embedding_cache if EMBEDDING_CACHE_ENABLED else None,
+    workers=EMBEDDING_WORKERS,
+    service_url=EMBEDDING_SERVICE_URL,
+)
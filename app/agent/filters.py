@@ -4,6 +4,8 @@ from typing import List
 from vanna.core.filter import ConversationFilter
 from vanna.core.storage.models import Message
 
+from app.agent.compaction import compactor
+
 
 class SensitiveDataFilter(ConversationFilter):
     async def filter_messages(self, msgs: List[Message]) -> List[Message]:
@@ -52,4 +54,5 @@ class PromptSafetyFilter(ConversationFilter):
 
 
 # Conversation filters are loaded by the agent in builder.py; PromptSafetyFilter enforces Phase 1.C guardrails.
-conversation_filters = [SensitiveDataFilter(), PromptSafetyFilter()]
+# The compactor runs last so it summarizes already-redacted history.
+conversation_filters = [SensitiveDataFilter(), PromptSafetyFilter(), compactor]
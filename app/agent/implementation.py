@@ -1,27 +1,327 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import chromadb
+from chromadb.config import Settings
 from vanna.legacy.chromadb.chromadb_vector import ChromaDB_VectorStore
 from vanna.legacy.openai.openai_chat import OpenAI_Chat
+from vanna.legacy.utils import deterministic_uuid
 from openai import OpenAI
-from chromadb.utils import embedding_functions
 
-# Pin a stable embedding function to ensure training and runtime use the same space
-EMBED_FN = embedding_functions.SentenceTransformerEmbeddingFunction(
-    model_name="all-MiniLM-L6-v2"
+from app.agent.embeddings import embedding_function
+from app.config import (
+    TRAIN_BATCH_SIZE,
+    VECTOR_HNSW_CONSTRUCTION_EF,
+    VECTOR_HNSW_M,
+    VECTOR_HNSW_SEARCH_EF,
+    VECTOR_STATS_TTL_SECONDS,
 )
+from app.utils.http_client import get_sync_http_client
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+# Pin a stable embedding function to ensure training and runtime use the same space.
+# It loads the model on first use, not at import.
+EMBED_FN = embedding_function
+TRAINING_COLLECTIONS = ("documentation", "ddl", "sql")
+
+
+def ddl_fingerprint(ddl: str) -> str:
+    """Hash of the DDL with whitespace and the statement terminator normalized away."""
+    normalized = " ".join(ddl.split()).rstrip(" ;/")
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+def hnsw_configuration(m: int, construction_ef: int, search_ef: int) -> dict:
+    """Chroma collection configuration; the space stays the embedding function's default."""
+    return {"hnsw": {"max_neighbors": m, "ef_construction": construction_ef, "ef_search": search_ef}}
 
 
 class LocalVanna(ChromaDB_VectorStore, OpenAI_Chat):
     """
     Local Vanna implementation using ChromaDB for vectors and LM Studio (OpenAI-compatible) for LLM.
+    Every training write bumps a revision counter persisted next to the vector
+    store, so other processes (the API server) can detect changes cheaply.
+    Collection counts and the DDL list are cached per revision for the same reason.
     """
 
+    REVISION_FILE = "training_revision"
+    REVISION_CHECK_SECONDS = 1.0
+
     def __init__(self, config: dict):
         # Expect config to have: path, api_key, api_base, model
+        self.revision_path = Path(config.get("path", "./chroma_db")) / self.REVISION_FILE
+        self._revision = None
+        self._revision_checked = 0.0
+        self._views = {}
         ChromaDB_VectorStore.__init__(
             self,
             config={
                 "path": config.get("path", "./chroma_db"),
                 "embedding_function": EMBED_FN,
+                "client": self._create_client(config.get("path", "./chroma_db")),
             },
         )
-        client = OpenAI(api_key=config.get("api_key"), base_url=config.get("api_base"))
+        self._apply_search_ef(VECTOR_HNSW_SEARCH_EF)
+        client = OpenAI(
+            api_key=config.get("api_key"),
+            base_url=config.get("api_base"),
+            http_client=get_sync_http_client(),
+        )
         OpenAI_Chat.__init__(self, client=client, config={"model": config.get("model")})
+
+    @staticmethod
+    def _create_client(path: str):
+        """
+        Create the training collections with the configured HNSW parameters before
+        ChromaDB_VectorStore opens them; it only knows legacy metadata, which Chroma
+        ignores when an embedding function is attached.
+        """
+        client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+        for name in TRAINING_COLLECTIONS:
+            LocalVanna._configured_collection(client, name)
+        return client
+
+    @staticmethod
+    def _configured_collection(client, name: str):
+        configuration = hnsw_configuration(VECTOR_HNSW_M, VECTOR_HNSW_CONSTRUCTION_EF, VECTOR_HNSW_SEARCH_EF)
+        return client.get_or_create_collection(name=name, embedding_function=EMBED_FN, configuration=configuration)
+
+    def _apply_search_ef(self, search_ef: int) -> None:
+        """Search ef can change on existing collections; M and construction ef need a rebuild."""
+        for collection in (self.ddl_collection, self.documentation_collection, self.sql_collection):
+            hnsw = (collection.configuration or {}).get("hnsw") or {}
+            if hnsw.get("ef_search") != search_ef:
+                collection.modify(configuration={"hnsw": {"ef_search": search_ef}})
+            built = (hnsw.get("max_neighbors"), hnsw.get("ef_construction"))
+            if built != (VECTOR_HNSW_M, VECTOR_HNSW_CONSTRUCTION_EF):
+                log_perf(
+                    logger,
+                    "vector_store.hnsw_mismatch",
+                    {
+                        "collection": collection.name,
+                        "built": {"M": built[0], "construction_ef": built[1]},
+                        "configured": {"M": VECTOR_HNSW_M, "construction_ef": VECTOR_HNSW_CONSTRUCTION_EF},
+                    },
+                )
+
+    @property
+    def training_revision(self) -> int:
+        """Persisted write counter; re-read at most once per REVISION_CHECK_SECONDS."""
+        now = time.monotonic()
+        if self._revision is None or now - self._revision_checked >= self.REVISION_CHECK_SECONDS:
+            try:
+                self._revision = int(self.revision_path.read_text(encoding="utf-8").strip() or 0)
+            except (OSError, ValueError):
+                self._revision = 0
+            self._revision_checked = now
+        return self._revision
+
+    def _bump_revision(self) -> None:
+        self._revision_checked = 0.0
+        revision = self.training_revision + 1
+        self.revision_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.revision_path.with_suffix(".tmp")
+        tmp.write_text(str(revision), encoding="utf-8")
+        os.replace(tmp, self.revision_path)
+        self._revision = revision
+        self._revision_checked = time.monotonic()
+
+    def _per_revision(self, name: str, build: Callable[[], object]):
+        # The TTL catches changes made without a revision bump (e.g. a reset from another process)
+        revision = self.training_revision
+        now = time.monotonic()
+        entry = self._views.get(name)
+        if entry is None or entry[0] != revision or now - entry[1] >= VECTOR_STATS_TTL_SECONDS:
+            entry = (revision, now, build())
+            self._views[name] = entry
+        return entry[2]
+
+    def vector_stats(self) -> dict:
+        """Per-collection document counts and the training revision, without reading any documents."""
+
+        def build():
+            counts = {
+                "ddl": self.ddl_collection.count(),
+                "documentation": self.documentation_collection.count(),
+                "sql": self.sql_collection.count(),
+            }
+            return {"revision": self.training_revision, "collections": counts, "total": sum(counts.values())}
+
+        return dict(self._per_revision("stats", build))
+
+    def ddl_documents(self) -> Tuple[str, ...]:
+        """All trained DDL statements; re-read only after a training write."""
+        return self._per_revision(
+            "ddl", lambda: tuple(doc for doc in self.ddl_collection.get(include=["documents"])["documents"] if doc)
+        )
+
+    def add_question_sql(self, question: str, sql: str, **kwargs) -> str:
+        result = super().add_question_sql(question, sql, **kwargs)
+        self._bump_revision()
+        return result
+
+    def add_ddl(self, ddl: str, **kwargs) -> str:
+        result = super().add_ddl(ddl, **kwargs)
+        self._bump_revision()
+        return result
+
+    def add_documentation(self, documentation: str, **kwargs) -> str:
+        result = super().add_documentation(documentation, **kwargs)
+        self._bump_revision()
+        return result
+
+    def _bulk_records(self, ddl, documentation, question_sql) -> List[Tuple[object, str, str]]:
+        """(collection, id, document) triples using the same ids as add_ddl/add_documentation/add_question_sql."""
+        records = []
+        for text in ddl:
+            records.append((self.ddl_collection, deterministic_uuid(text) + "-ddl", text))
+        for text in documentation:
+            records.append((self.documentation_collection, deterministic_uuid(text) + "-doc", text))
+        for question, sql in question_sql:
+            doc = json.dumps({"question": question, "sql": sql}, ensure_ascii=False)
+            records.append((self.sql_collection, deterministic_uuid(doc) + "-sql", doc))
+        return records
+
+    def train_bulk(
+        self,
+        ddl: Iterable[str] = (),
+        documentation: Iterable[str] = (),
+        question_sql: Iterable[Tuple[str, str]] = (),
+        batch_size: int = TRAIN_BATCH_SIZE,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> dict:
+        """
+        Train many items at once: embed per batch and upsert per batch.
+        Ids are content-derived, so a rerun after an interruption skips
+        everything already stored and only embeds what is missing.
+        """
+        records = self._bulk_records(ddl, documentation, question_sql)
+        total = len(records)
+        batch_size = max(1, min(batch_size, self.chroma_client.get_max_batch_size()))
+        stats = {"total": total, "added": 0, "skipped": 0}
+        for collection in (self.ddl_collection, self.documentation_collection, self.sql_collection):
+            # De-duplicate within the run; identical content maps to one id
+            items = list({rid: doc for coll, rid, doc in records if coll is collection}.items())
+            stats["skipped"] += sum(1 for coll, _, _ in records if coll is collection) - len(items)
+            for start in range(0, len(items), batch_size):
+                batch = items[start : start + batch_size]
+                existing = set(collection.get(ids=[rid for rid, _ in batch], include=[])["ids"])
+                todo = [(rid, doc) for rid, doc in batch if rid not in existing]
+                stats["skipped"] += len(batch) - len(todo)
+                if todo:
+                    docs = [doc for _, doc in todo]
+                    collection.upsert(
+                        ids=[rid for rid, _ in todo],
+                        documents=docs,
+                        embeddings=self.embedding_function(docs),
+                    )
+                    stats["added"] += len(todo)
+                    self._bump_revision()
+                if progress is not None:
+                    progress(stats["added"] + stats["skipped"], total)
+        return stats
+
+    def _upsert_batched(self, collection, rows, batch_size: int, progress=None) -> None:
+        """rows: (id, document, metadata); embeds and upserts one batch at a time."""
+        batch_size = max(1, min(batch_size, self.chroma_client.get_max_batch_size()))
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            docs = [doc for _, doc, _ in batch]
+            collection.upsert(
+                ids=[rid for rid, _, _ in batch],
+                documents=docs,
+                embeddings=self.embedding_function(docs),
+                metadatas=[meta for _, _, meta in batch],
+            )
+            self._bump_revision()
+            if progress is not None:
+                progress(start + len(batch), len(rows))
+
+    def sync_ddl(
+        self,
+        objects: Mapping[str, str],
+        prune_untracked: bool = False,
+        batch_size: int = TRAIN_BATCH_SIZE,
+        progress: Optional[Callable[[int, int], None]] = None,
+    ) -> dict:
+        """
+        Bring the DDL collection in line with objects ({object name: DDL}).
+        Each synced entry keeps its object name and DDL fingerprint in
+        metadata, so only added or changed objects are embedded and dropped
+        objects are deleted. Entries trained before sync existed are adopted
+        when their DDL is unchanged; with prune_untracked, the rest are removed.
+        """
+        stored = self.ddl_collection.get(include=["metadatas"])
+        tracked: Dict[str, Tuple[List[str], Optional[str]]] = {}
+        untracked = set()
+        for rid, meta in zip(stored["ids"], stored["metadatas"] or [None] * len(stored["ids"])):
+            name = (meta or {}).get("object")
+            if name:
+                tracked.setdefault(name, ([], meta.get("fingerprint")))[0].append(rid)
+            else:
+                untracked.add(rid)
+
+        diff = {"added": [], "updated": [], "deleted": [], "unchanged": 0, "pruned": 0}
+        writes, adopted, stale = [], [], set()
+        for name, ddl in objects.items():
+            meta = {"object": name, "fingerprint": ddl_fingerprint(ddl)}
+            rid = deterministic_uuid(ddl) + "-ddl"
+            if name in tracked:
+                ids, fingerprint = tracked[name]
+                if fingerprint == meta["fingerprint"]:
+                    diff["unchanged"] += 1
+                    continue
+                diff["updated"].append(name)
+                stale.update(ids)
+            elif rid in untracked:
+                # Same text as a legacy entry: record the metadata, keep the embedding
+                adopted.append((rid, meta))
+                untracked.discard(rid)
+                diff["unchanged"] += 1
+                continue
+            else:
+                diff["added"].append(name)
+            untracked.discard(rid)
+            writes.append((rid, ddl, meta))
+
+        for name, (ids, _) in tracked.items():
+            if name not in objects:
+                diff["deleted"].append(name)
+                stale.update(ids)
+        if prune_untracked:
+            diff["pruned"] = len(untracked)
+            stale.update(untracked)
+        # An updated object may have changed back to text stored under a still-valid id
+        stale.difference_update(rid for rid, _, _ in writes)
+
+        if stale:
+            self.ddl_collection.delete(ids=sorted(stale))
+            self._bump_revision()
+        if adopted:
+            self.ddl_collection.update(ids=[rid for rid, _ in adopted], metadatas=[m for _, m in adopted])
+        self._upsert_batched(self.ddl_collection, writes, batch_size, progress)
+        for key in ("added", "updated", "deleted"):
+            diff[key].sort()
+        return diff
+
+    def remove_training_data(self, id: str, **kwargs) -> bool:
+        removed = super().remove_training_data(id, **kwargs)
+        if removed:
+            self._bump_revision()
+        return removed
+
+    def remove_collection(self, collection_name: str) -> bool:
+        removed = super().remove_collection(collection_name)
+        if removed:
+            # The base class recreates it with Chroma's defaults; it is empty, so rebuild it configured
+            self.chroma_client.delete_collection(collection_name)
+            attr = f"{collection_name}_collection"
+            setattr(self, attr, self._configured_collection(self.chroma_client, collection_name))
+            self._bump_revision()
+        return removed
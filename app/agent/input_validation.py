@@ -1,3 +1,4 @@
+import asyncio
 import json
 import re
 import uuid
@@ -7,9 +8,12 @@ from fastapi.responses import JSONResponse
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
 
+from vanna.components import RichTextComponent
 from vanna.servers.base.chat_handler import ChatHandler
 from vanna.servers.base.models import ChatRequest, ChatStreamChunk
 
+from app.agent.streaming import reset_delta_sink, set_delta_sink
+
 
 class InputValidationError(ValueError):
     """Raised when chat input fails basic validation."""
@@ -148,9 +152,60 @@ class SafeChatHandler(ChatHandler):
         conversation_id = request.conversation_id or self._generate_conversation_id()
         request_id = request.request_id or str(uuid.uuid4())
 
-        async for component in self.agent.send_message(
-            request_context=request.request_context,
-            message=request.message,
-            conversation_id=conversation_id,
-        ):
-            yield ChatStreamChunk.from_component(component, conversation_id, request_id)
+        # The agent runs in its own task so LLM text deltas (published through the
+        # delta sink while the agent is still waiting on the stream) reach the client live
+        queue: asyncio.Queue = asyncio.Queue()
+
+        async def pump():
+            token = set_delta_sink(lambda kind, text: queue.put_nowait((kind, text)))
+            try:
+                async for component in self.agent.send_message(
+                    request_context=request.request_context,
+                    message=request.message,
+                    conversation_id=conversation_id,
+                ):
+                    queue.put_nowait(("component", component))
+            except BaseException as exc:
+                queue.put_nowait(("error", exc))
+                if isinstance(exc, asyncio.CancelledError):
+                    raise
+            finally:
+                reset_delta_sink(token)
+                queue.put_nowait(("done", None))
+
+        task = asyncio.create_task(pump())
+        preview = None
+        preview_text = ""
+        try:
+            while True:
+                items = [await queue.get()]
+                while not queue.empty():
+                    items.append(queue.get_nowait())
+                pending_text = ""
+                for kind, payload in items + [("flush", None)]:
+                    if kind == "delta":
+                        pending_text += payload
+                        continue
+                    if pending_text:
+                        # One update per drained batch keeps the payload count bounded
+                        preview_text += pending_text
+                        pending_text = ""
+                        if preview is None:
+                            preview = RichTextComponent(content=preview_text, markdown=True)
+                        else:
+                            preview = preview.update(content=preview_text)
+                        yield ChatStreamChunk.from_component(preview, conversation_id, request_id)
+                    if kind == "end" and preview is not None:
+                        # The agent renders the final text itself; drop the live preview
+                        yield ChatStreamChunk.from_component(preview.hide(), conversation_id, request_id)
+                        preview = None
+                        preview_text = ""
+                    elif kind == "component":
+                        yield ChatStreamChunk.from_component(payload, conversation_id, request_id)
+                    elif kind == "error":
+                        raise payload
+                    elif kind == "done":
+                        return
+        finally:
+            if not task.done():
+                task.cancel()
@@ -1,62 +1,334 @@
-from app.config import LLM_PROVIDER, LLM_CONFIG, CACHE_TTL_SECONDS, CACHE_ENABLED
-from vanna.integrations.openai import OpenAILlmService
-from app.utils.cache import make_cache_key, get_cached_response, set_cached_response
-from app.utils.logger import setup_logger, log_perf
+import asyncio
+import hashlib
+import json
+import re
+import time
+from collections import defaultdict, deque
+
+from app.config import (
+    LLM_PROVIDER,
+    LLM_CONFIG,
+    LLM_BACKENDS,
+    CACHE_TTL_SECONDS,
+    LLM_COALESCE_ENABLED,
+    LLM_HEDGE_ENABLED,
+    LLM_HEDGE_MIN_DELAY_MS,
+    LLM_ROUTER_COOLDOWN_SECONDS,
+    LLM_ROUTER_FAILURE_THRESHOLD,
+)
+from vanna.core.llm import LlmResponse, LlmStreamChunk
+from app.utils.cache import (
+    access_scope,
+    cache_enabled,
+    make_cache_key,
+    get_cached_response,
+    set_cached_response,
+)
+from app.agent.llm_router import Backend, LlmRouter
+from app.agent.llm_scheduler import llm_scheduler
+from app.agent.openai_async import AsyncOpenAILlmService
+from app.agent.streaming import emit_delta, emit_stream_end
+from app.utils.helpers import normalize_question
+from app.utils.logger import setup_logger, log_perf, PERF_HISTORY
+from app.utils.metrics import observe_latency
+from app.utils.single_flight import SingleFlight
 
 logger = setup_logger(__name__)
+llm_inflight = SingleFlight("llm")
 
+# Recent streaming samples per model: time to first token and decode rate
+_stream_samples = defaultdict(
+    lambda: {"ttft_ms": deque(maxlen=PERF_HISTORY), "tokens_per_s": deque(maxlen=PERF_HISTORY)}
+)
+REPLAY_CHUNK = re.compile(r"\S+\s*")
 
-class CachedOpenAILlmService(OpenAILlmService):
-    async def send_request(self, request):
-        if not CACHE_ENABLED:
-            return await super().send_request(request)
-        # Extract basic identifiers
+
+def record_stream_sample(model: str, ttft_ms, tokens_per_s) -> None:
+    samples = _stream_samples[model]
+    if ttft_ms is not None:
+        samples["ttft_ms"].append(ttft_ms)
+    if tokens_per_s is not None:
+        samples["tokens_per_s"].append(tokens_per_s)
+
+
+def stream_stats() -> dict:
+    def _avg(values):
+        return round(sum(values) / len(values), 2) if values else None
+
+    return {
+        model: {
+            "ttft_avg_ms": _avg(samples["ttft_ms"]),
+            "tokens_per_s_avg": _avg(samples["tokens_per_s"]),
+            "samples": len(samples["ttft_ms"]),
+        }
+        for model, samples in list(_stream_samples.items())
+    }
+
+
+def _cacheable(question: str, response) -> bool:
+    # safety: avoid caching errors/short queries/empty completions
+    return bool(
+        question
+        and len(question.split()) >= 3
+        and isinstance(response, LlmResponse)
+        and (response.content or response.tool_calls)
+        and response.finish_reason not in {"length", "content_filter"}
+    )
+
+
+def _tool_call_signature(tool_calls) -> list:
+    # Tool call ids are generated per response; only name and arguments are stable
+    return [
+        {"name": getattr(tc, "name", None), "arguments": getattr(tc, "arguments", None)}
+        for tc in tool_calls or []
+    ]
+
+
+def _split_turn(messages):
+    """Returns (question, turn_state) for the latest user turn of the request."""
+    last_user = max((i for i, m in enumerate(messages) if getattr(m, "role", "") == "user"), default=-1)
+    question = getattr(messages[last_user], "content", "") if last_user >= 0 else ""
+    earlier = [
+        normalize_question(getattr(m, "content", "") or "")
+        for m in messages[: max(last_user, 0)]
+        if getattr(m, "role", "") == "user"
+    ]
+    tail = [
+        {
+            "role": getattr(m, "role", ""),
+            "content": getattr(m, "content", "") or "",
+            "tool_calls": _tool_call_signature(getattr(m, "tool_calls", None)),
+        }
+        for m in messages[last_user + 1 :]
+    ]
+    if not earlier and not tail:
+        return question or "", ""
+    state = json.dumps({"earlier": earlier, "tail": tail}, sort_keys=True, default=str)
+    return question or "", hashlib.sha256(state.encode("utf-8")).hexdigest()
+
+
+class CachedOpenAILlmService(AsyncOpenAILlmService):
+    # Admission-control gate; set by _backend_service
+    backend_name = None
+    max_concurrency = None
+
+    async def _upstream_send(self, request):
+        async with llm_scheduler.slot(self.backend_name or self.model, self.max_concurrency):
+            start = time.perf_counter()
+            response = await AsyncOpenAILlmService.send_request(self, request)
+            self._observe(start)
+            return response
+
+    async def _upstream_stream(self, request):
+        # The slot stays held until the stream is fully consumed or closed
+        async with llm_scheduler.slot(self.backend_name or self.model, self.max_concurrency):
+            start = time.perf_counter()
+            async for chunk in AsyncOpenAILlmService.stream_request(self, request):
+                yield chunk
+            self._observe(start)
+
+    def _observe(self, start: float) -> None:
+        # Queue wait excluded; the router records its backends itself (Backend.record_success)
+        observe_latency(
+            "llm",
+            (time.perf_counter() - start) * 1000,
+            provider=self.backend_name or LLM_PROVIDER,
+            model=self.model,
+        )
+
+    def cache_key_for(self, request) -> tuple:
+        """Returns (cache_key, question) for a request."""
         user = getattr(request, "user", None)
-        user_id = getattr(user, "id", "anonymous")
-        conversation_id = getattr(request, "conversation_id", "none")
+        metadata = getattr(request, "metadata", None) or {}
         messages = getattr(request, "messages", []) or []
-        question = ""
-        if messages:
-            question = getattr(messages[-1], "content", "") or ""
-        # Try to collect schema/semantic context text (last system message heuristic)
-        ddl_ctx = ""
-        if messages:
-            for m in reversed(messages):
-                if getattr(m, "role", "") == "system" and getattr(m, "content", ""):
-                    ddl_ctx = m.content
-                    break
-
-        cache_key = make_cache_key(user_id, question, ddl_ctx, str(conversation_id))
-        cached = get_cached_response(cache_key)
-        if cached:
-            log_perf(logger, "llm.cache_hit", {"user": user_id, "conversation_id": conversation_id})
-            return cached
-
-        response = await super().send_request(request)
+        question, turn_state = _split_turn(messages)
+        # LLMLog records the question before it rewrites the prompt with schema context
+        question = metadata.get("question") or question
+        cache_key = make_cache_key(
+            question,
+            metadata.get("context_version", "none"),
+            self.model,
+            access_scope(getattr(user, "group_memberships", None) or []),
+            turn_state,
+        )
+        return cache_key, question
+
+    async def send_request(self, request):
+        user_id = getattr(getattr(request, "user", None), "id", "anonymous")
+        cache_key, question = self.cache_key_for(request)
+        if cache_enabled():
+            cached = await get_cached_response(cache_key)
+            if cached:
+                log_perf(logger, "llm.cache_hit", {"user": user_id, "model": self.model})
+                response = LlmResponse.model_validate(cached)
+                response.metadata["cache"] = "hit"
+                return response
+        if not LLM_COALESCE_ENABLED:
+            return await self._fetch(request, cache_key, question, user_id)
+
+        # Identical concurrent requests share one upstream generation
+        response, shared = await llm_inflight.do(
+            cache_key, lambda: self._fetch(request, cache_key, question, user_id)
+        )
+        if shared:
+            log_perf(logger, "llm.coalesced", {"user": user_id, "model": self.model})
+            response = response.model_copy(deep=True)
+            response.metadata["cache"] = "coalesced"
+        return response
+
+    async def _fetch(self, request, cache_key: str, question: str, user_id: str):
+        response = await self._upstream_send(request)
+        if not cache_enabled():
+            return response
         try:
-            # safety: avoid caching errors/short queries
-            if (
-                CACHE_ENABLED
-                and question
-                and len(question.split()) >= 3
-                and isinstance(response, dict)
-                and response.get("error") is None
-            ):
-                set_cached_response(cache_key, response, ttl=CACHE_TTL_SECONDS)
-                log_perf(logger, "llm.cache_store", {"user": user_id, "conversation_id": conversation_id})
+            if _cacheable(question, response):
+                await set_cached_response(cache_key, response.model_dump(mode="json"), ttl=CACHE_TTL_SECONDS)
+                log_perf(logger, "llm.cache_store", {"user": user_id, "model": self.model})
         except Exception:
             pass
         return response
 
+    async def stream_request(self, request):
+        """
+        Stream with caching: a cached response is replayed as a synthetic stream;
+        otherwise upstream chunks are forwarded as they arrive (text deltas also
+        go to the request's delta sink) and teed into the cache on completion.
+        """
+        user_id = getattr(getattr(request, "user", None), "id", "anonymous")
+        cache_key, question = self.cache_key_for(request)
+        if cache_enabled():
+            cached = await get_cached_response(cache_key)
+            if cached:
+                log_perf(logger, "llm.cache_hit", {"user": user_id, "model": self.model, "stream": True})
+                async for chunk in self._replay(LlmResponse.model_validate(cached)):
+                    yield chunk
+                return
+
+        future = None
+        if LLM_COALESCE_ENABLED:
+            # Identical concurrent streams: followers replay the leader's finished response
+            future, leader = llm_inflight.publisher(cache_key)
+            if not leader:
+                shared = await asyncio.shield(future)
+                if shared is not None:
+                    log_perf(logger, "llm.coalesced", {"user": user_id, "model": self.model, "stream": True})
+                    async for chunk in self._replay(shared, source="coalesced"):
+                        yield chunk
+                    return
+                # The leader did not finish; generate independently
+                future = None
+
+        start = time.perf_counter()
+        first_token_at = None
+        deltas = 0
+        content_parts = []
+        tool_calls = []
+        finish_reason = None
+        completed = False
+        try:
+            async for chunk in self._upstream_stream(request):
+                if chunk.content:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    deltas += 1
+                    content_parts.append(chunk.content)
+                    emit_delta(chunk.content)
+                if chunk.tool_calls:
+                    tool_calls.extend(chunk.tool_calls)
+                if chunk.finish_reason:
+                    finish_reason = chunk.finish_reason
+                yield chunk
+                # Let the handler flush the delta before the next (blocking) read
+                await asyncio.sleep(0)
+            completed = True
+        finally:
+            emit_stream_end()
+            end = time.perf_counter()
+            ttft_ms = round((first_token_at - start) * 1000, 2) if first_token_at else None
+            # Each content delta is one decoded token for OpenAI-compatible servers
+            decode_s = end - first_token_at if first_token_at else 0
+            tokens_per_s = round(deltas / decode_s, 2) if deltas > 1 and decode_s > 0 else None
+            record_stream_sample(self.model, ttft_ms, tokens_per_s)
+            log_perf(
+                logger,
+                "llm.stream",
+                {
+                    "model": self.model,
+                    "ttft_ms": ttft_ms,
+                    "tokens": deltas,
+                    "tokens_per_s": tokens_per_s,
+                    "duration_ms": round((end - start) * 1000, 2),
+                    "completed": completed,
+                },
+            )
+            # Only a fully consumed stream is shared or cached; an abandoned one may be truncated
+            response = (
+                LlmResponse(
+                    content="".join(content_parts) or None,
+                    tool_calls=tool_calls or None,
+                    finish_reason=finish_reason,
+                )
+                if completed
+                else None
+            )
+            if future is not None:
+                llm_inflight.publish(cache_key, future, response)
+
+        if cache_enabled() and _cacheable(question, response):
+            await set_cached_response(cache_key, response.model_dump(mode="json"), ttl=CACHE_TTL_SECONDS)
+            log_perf(logger, "llm.cache_store", {"user": user_id, "model": self.model, "stream": True})
+
+    async def _replay(self, response: LlmResponse, source: str = "hit"):
+        """Synthetic stream of a cached or shared response: word-sized text chunks, then tool calls."""
+        for piece in REPLAY_CHUNK.findall(response.content or ""):
+            emit_delta(piece)
+            yield LlmStreamChunk(content=piece, metadata={"cache": source})
+        emit_stream_end()
+        if response.tool_calls:
+            yield LlmStreamChunk(
+                tool_calls=response.tool_calls,
+                finish_reason=response.finish_reason,
+                metadata={"cache": source},
+            )
+
+
+class RoutedLlmService(CachedOpenAILlmService):
+    """Cached service whose upstream calls go through the LLM router instead of one client."""
+
+    def __init__(self, router: LlmRouter):
+        # No client of its own; the cache key uses the combined backend label
+        self.router = router
+        self.model = "+".join(b.model for b in router.backends)
+
+    async def _upstream_send(self, request):
+        return await self.router.send_request(request)
+
+    def _upstream_stream(self, request):
+        return self.router.stream_request(request)
+
+
+def _backend_service(name: str, service_cls=AsyncOpenAILlmService):
+    cfg = LLM_CONFIG[name]
+    kwargs = {"model": cfg["model"], "api_key": cfg["api_key"]}
+    if cfg.get("base_url"):
+        kwargs["base_url"] = cfg["base_url"]
+    service = service_cls(**kwargs)
+    service.backend_name = name
+    service.max_concurrency = cfg.get("max_concurrency")
+    return service
+
 
 def get_llm():
-    cfg=LLM_CONFIG[LLM_PROVIDER]
-    if LLM_PROVIDER=="lmstudio":
-        return CachedOpenAILlmService(model=cfg["model"], base_url=cfg["base_url"], api_key=cfg["api_key"])
-    if LLM_PROVIDER=="openai":
-        return CachedOpenAILlmService(model=cfg["model"], api_key=cfg["api_key"])
-    if LLM_PROVIDER=="groq":
-        return CachedOpenAILlmService(model=cfg["model"], api_key=cfg["api_key"], base_url="https://api.groq.com/openai/v1")
-    if LLM_PROVIDER=="gemini":
-        return CachedOpenAILlmService(model=cfg["model"], api_key=cfg["api_key"], base_url="https://generativelanguage.googleapis.com/v1beta/openai/")
-llm=get_llm()
+    if len(LLM_BACKENDS) > 1:
+        router = LlmRouter(
+            [Backend(name, _backend_service(name)) for name in LLM_BACKENDS],
+            hedge_enabled=LLM_HEDGE_ENABLED,
+            hedge_min_delay_ms=LLM_HEDGE_MIN_DELAY_MS,
+            failure_threshold=LLM_ROUTER_FAILURE_THRESHOLD,
+            cooldown_seconds=LLM_ROUTER_COOLDOWN_SECONDS,
+        )
+        return RoutedLlmService(router)
+    return _backend_service(LLM_BACKENDS[0] if LLM_BACKENDS else LLM_PROVIDER, CachedOpenAILlmService)
+
+
+llm = get_llm()
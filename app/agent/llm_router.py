@@ -0,0 +1,232 @@
+"""
+LLM backend router.
+Holds one service per configured backend, tracks each backend's latency
+EWMA and error rate, and sends every request to the fastest healthy one.
+Failed backends cool down and are retried afterwards. Optionally a hedged
+request goes to the runner-up once the primary is slower than its recent
+p95, and whichever backend loses is cancelled.
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, List, Optional
+
+from app.agent.llm_scheduler import LlmOverloadedError, llm_scheduler
+from app.utils.logger import setup_logger, log_perf
+from app.utils.metrics import observe_latency
+
+logger = setup_logger(__name__)
+
+
+class NoHealthyBackendError(RuntimeError):
+    """Raised when every backend failed the request."""
+
+
+class Backend:
+    def __init__(self, name: str, service: Any, alpha: float = 0.3, window: int = 100):
+        self.name = name
+        self.service = service
+        self.model = getattr(service, "model", name)
+        self.max_concurrency = getattr(service, "max_concurrency", None)
+        self.alpha = alpha
+        self.latency_ewma_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.cooldown_until = 0.0
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self._latencies = deque(maxlen=window)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self) -> float:
+        # Untried backends score 0 so each gets measured once; errors inflate the cost
+        latency = self.latency_ewma_ms if self.latency_ewma_ms is not None else 0.0
+        return latency * (1.0 + 4.0 * self.error_rate) + 50.0 * self.in_flight
+
+    def p95_ms(self) -> Optional[float]:
+        if len(self._latencies) < 10:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def record_success(self, duration_ms: float) -> None:
+        self.requests += 1
+        self._latencies.append(duration_ms)
+        observe_latency("llm", duration_ms, provider=self.name, model=self.model)
+        if self.latency_ewma_ms is None:
+            self.latency_ewma_ms = duration_ms
+        else:
+            self.latency_ewma_ms = self.alpha * duration_ms + (1 - self.alpha) * self.latency_ewma_ms
+        self.error_rate = (1 - self.alpha) * self.error_rate
+        self.consecutive_failures = 0
+
+    def record_failure(self, cooldown_seconds: float, failure_threshold: int) -> None:
+        self.requests += 1
+        self.failures += 1
+        self.error_rate = self.alpha + (1 - self.alpha) * self.error_rate
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= failure_threshold:
+            # Back off exponentially while the backend keeps failing
+            exponent = min(self.consecutive_failures - failure_threshold, 5)
+            self.cooldown_until = time.monotonic() + cooldown_seconds * (2 ** exponent)
+
+    def status(self) -> dict:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "healthy": self.healthy,
+            "latency_ewma_ms": round(self.latency_ewma_ms, 2) if self.latency_ewma_ms is not None else None,
+            "p95_ms": self.p95_ms(),
+            "error_rate": round(self.error_rate, 4),
+            "in_flight": self.in_flight,
+            "requests": self.requests,
+            "failures": self.failures,
+            "cooldown_remaining_s": round(max(self.cooldown_until - time.monotonic(), 0.0), 2),
+        }
+
+
+class LlmRouter:
+    def __init__(
+        self,
+        backends: List[Backend],
+        hedge_enabled: bool = False,
+        hedge_min_delay_ms: int = 1000,
+        failure_threshold: int = 2,
+        cooldown_seconds: float = 15.0,
+    ):
+        if not backends:
+            raise ValueError("LlmRouter needs at least one backend")
+        self.backends = backends
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay_ms = hedge_min_delay_ms
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.counters = {"requests": 0, "failovers": 0, "hedges": 0, "hedge_wins": 0}
+
+    def ranked(self) -> List[Backend]:
+        """Healthy backends by score, then cooling-down ones (tried only as a last resort)."""
+        healthy = sorted((b for b in self.backends if b.healthy), key=lambda b: b.score())
+        cooling = sorted((b for b in self.backends if not b.healthy), key=lambda b: b.cooldown_until)
+        return healthy + cooling
+
+    def hedge_delay_s(self, backend: Backend) -> float:
+        p95 = backend.p95_ms()
+        delay_ms = max(self.hedge_min_delay_ms, p95) if p95 is not None else self.hedge_min_delay_ms * 3
+        return delay_ms / 1000
+
+    async def _call(self, backend: Backend, request):
+        # A full queue raises LlmOverloadedError here; that is load, not a backend failure
+        async with llm_scheduler.slot(backend.name, backend.max_concurrency):
+            backend.in_flight += 1
+            start = time.perf_counter()
+            try:
+                response = await backend.service.send_request(request)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                backend.record_failure(self.cooldown_seconds, self.failure_threshold)
+                log_perf(logger, "llm_router.backend_error", {"backend": backend.name, "error": str(exc)})
+                raise
+            finally:
+                backend.in_flight -= 1
+        backend.record_success(round((time.perf_counter() - start) * 1000, 2))
+        return response
+
+    async def send_request(self, request):
+        self.counters["requests"] += 1
+        order = self.ranked()
+        last_exc: Optional[BaseException] = None
+        idx = 0
+        while idx < len(order):
+            primary = order[idx]
+            secondary = order[idx + 1] if idx + 1 < len(order) else None
+            hedge = self.hedge_enabled and secondary is not None and secondary.healthy
+            try:
+                if hedge:
+                    return await self._hedged(primary, secondary, request)
+                return await self._call(primary, request)
+            except Exception as exc:
+                last_exc = exc
+                self.counters["failovers"] += 1
+                # A failed hedge already tried both backends
+                idx += 2 if hedge else 1
+        if isinstance(last_exc, LlmOverloadedError):
+            raise last_exc
+        raise NoHealthyBackendError(f"all LLM backends failed: {last_exc}") from last_exc
+
+    async def _hedged(self, primary: Backend, secondary: Backend, request):
+        """Tries both backends; raises only when both failed."""
+        first = asyncio.ensure_future(self._call(primary, request))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=self.hedge_delay_s(primary))
+            if done:
+                if first.exception() is None:
+                    return first.result()
+                return await self._call(secondary, request)
+
+            self.counters["hedges"] += 1
+            log_perf(logger, "llm_router.hedge", {"primary": primary.name, "secondary": secondary.name})
+            second = asyncio.ensure_future(self._call(secondary, request))
+            pending = {first, second}
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is second:
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Cancel the loser (or both, if the caller itself was cancelled)
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def stream_request(self, request):
+        """Streams are not hedged; failover happens only before the first chunk is delivered."""
+        self.counters["requests"] += 1
+        last_exc: Optional[BaseException] = None
+        for backend in self.ranked():
+            delivered = False
+            try:
+                async with llm_scheduler.slot(backend.name, backend.max_concurrency):
+                    backend.in_flight += 1
+                    start = time.perf_counter()
+                    try:
+                        async for chunk in backend.service.stream_request(request):
+                            delivered = True
+                            yield chunk
+                    finally:
+                        backend.in_flight -= 1
+            except LlmOverloadedError as exc:
+                last_exc = exc
+                self.counters["failovers"] += 1
+                continue
+            except Exception as exc:
+                backend.record_failure(self.cooldown_seconds, self.failure_threshold)
+                log_perf(logger, "llm_router.backend_error", {"backend": backend.name, "error": str(exc)})
+                if delivered:
+                    raise
+                last_exc = exc
+                self.counters["failovers"] += 1
+                continue
+            backend.record_success(round((time.perf_counter() - start) * 1000, 2))
+            return
+        if isinstance(last_exc, LlmOverloadedError):
+            raise last_exc
+        raise NoHealthyBackendError(f"all LLM backends failed: {last_exc}") from last_exc
+
+    def status(self) -> dict:
+        return {
+            **self.counters,
+            "hedge_enabled": self.hedge_enabled,
+            "backends": [b.status() for b in self.backends],
+        }
@@ -0,0 +1,174 @@
+"""
+LLM admission control.
+Each backend gets a concurrency gate. Requests beyond the limit wait in a
+priority queue (interactive chat before health probes before background
+jobs) and give up with LlmOverloadedError once their queue-wait deadline
+passes or the queue is full, instead of piling onto a saturated model
+server and timing out there.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Dict, Optional
+
+from app.config import (
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_QUEUE,
+    LLM_QUEUE_DEADLINE_MS,
+    LLM_PROBE_QUEUE_DEADLINE_MS,
+    LLM_BACKGROUND_QUEUE_DEADLINE_MS,
+)
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0
+    PROBE = 1
+    BACKGROUND = 2
+
+
+DEADLINES_MS = {
+    Priority.INTERACTIVE: LLM_QUEUE_DEADLINE_MS,
+    Priority.PROBE: LLM_PROBE_QUEUE_DEADLINE_MS,
+    Priority.BACKGROUND: LLM_BACKGROUND_QUEUE_DEADLINE_MS,
+}
+
+_priority: ContextVar[Priority] = ContextVar("llm_priority", default=Priority.INTERACTIVE)
+
+
+class LlmOverloadedError(RuntimeError):
+    """The request could not be admitted to an LLM backend in time; maps to HTTP 503."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """Run the enclosed LLM calls at the given priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class ConcurrencyGate:
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = max(limit, 1)
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self._heap = []
+        self._seq = itertools.count()
+        self._wait_ms = deque(maxlen=200)
+        self.counters = {"admitted": 0, "queued": 0, "rejected_full": 0, "timed_out": 0}
+        self.by_priority = {p.name.lower(): 0 for p in Priority}
+
+    async def acquire(self, priority: Priority, deadline_s: float) -> None:
+        self.by_priority[priority.name.lower()] += 1
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            self._admitted(0.0)
+            return
+        if self.waiting >= self.max_queue:
+            self.counters["rejected_full"] += 1
+            raise LlmOverloadedError(f"LLM backend {self.name} queue is full")
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (int(priority), next(self._seq), future))
+        self.waiting += 1
+        self.counters["queued"] += 1
+        start = time.perf_counter()
+        try:
+            done, _ = await asyncio.wait({future}, timeout=deadline_s)
+        except asyncio.CancelledError:
+            self._abandon(future)
+            raise
+        finally:
+            # The only place a waiter leaves the count, however it stopped waiting
+            self.waiting -= 1
+        if not done:
+            self._abandon(future)
+            self.counters["timed_out"] += 1
+            raise LlmOverloadedError(
+                f"LLM backend {self.name} busy; waited {round(deadline_s * 1000)}ms in queue",
+                retry_after=max(int(deadline_s), 1),
+            )
+        self._admitted((time.perf_counter() - start) * 1000)
+
+    def _abandon(self, future) -> None:
+        if future.done() and not future.cancelled():
+            # The slot was handed over just as we gave up; pass it on
+            self.release()
+        else:
+            future.cancel()
+
+    def _admitted(self, wait_ms: float) -> None:
+        self.counters["admitted"] += 1
+        self._wait_ms.append(wait_ms)
+
+    def release(self) -> None:
+        while self._heap:
+            _, _, future = heapq.heappop(self._heap)
+            if not future.done():
+                # Hand the slot straight to the highest-priority waiter
+                future.set_result(True)
+                return
+        self.active -= 1
+
+    def stats(self) -> dict:
+        waits = sorted(self._wait_ms)
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            **self.counters,
+            "by_priority": dict(self.by_priority),
+            "wait_avg_ms": round(sum(waits) / len(waits), 2) if waits else None,
+            "wait_p95_ms": round(waits[min(len(waits) - 1, int(len(waits) * 0.95))], 2) if waits else None,
+        }
+
+
+class LlmScheduler:
+    def __init__(self, default_limit: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_MAX_QUEUE):
+        self.default_limit = default_limit
+        self.max_queue = max_queue
+        self.gates: Dict[str, ConcurrencyGate] = {}
+
+    def gate(self, name: str, limit: Optional[int] = None) -> ConcurrencyGate:
+        gate = self.gates.get(name)
+        if gate is None:
+            gate = ConcurrencyGate(name, limit or self.default_limit, self.max_queue)
+            self.gates[name] = gate
+        return gate
+
+    @asynccontextmanager
+    async def slot(self, name: str, limit: Optional[int] = None):
+        gate = self.gate(name, limit)
+        priority = _priority.get()
+        try:
+            await gate.acquire(priority, DEADLINES_MS[priority] / 1000)
+        except LlmOverloadedError as exc:
+            log_perf(logger, "llm.queue_rejected", {"backend": name, "priority": priority.name, "reason": str(exc)})
+            raise
+        try:
+            yield
+        finally:
+            gate.release()
+
+    def stats(self) -> dict:
+        return {name: gate.stats() for name, gate in self.gates.items()}
+
+
+llm_scheduler = LlmScheduler()
@@ -0,0 +1,122 @@
+"""
+Non-blocking OpenAI-compatible LLM service.
+Vanna's OpenAILlmService calls the synchronous OpenAI client from async
+methods, which blocks the event loop for the whole completion. This variant
+keeps Vanna's payload building and response parsing but sends requests
+through AsyncOpenAI on the shared HTTP transport.
+"""
+
+import json
+from typing import Any, Dict, List, Optional
+
+from openai import AsyncOpenAI
+from vanna.core.llm import LlmResponse, LlmStreamChunk
+from vanna.core.tool import ToolCall
+from vanna.integrations.openai import OpenAILlmService
+
+from app.config import LLM_MAX_RETRIES
+from app.utils.http_client import get_async_http_client, get_sync_http_client
+
+
+def _parse_arguments(raw: Optional[str]) -> Dict[str, Any]:
+    try:
+        loaded = json.loads(raw or "{}")
+    except Exception:
+        return {"_raw": raw}
+    return loaded if isinstance(loaded, dict) else {"args": loaded}
+
+
+class AsyncOpenAILlmService(OpenAILlmService):
+    def __init__(
+        self,
+        model: Optional[str] = None,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        max_retries: int = LLM_MAX_RETRIES,
+    ):
+        # The sync client stays for API parity; it shares the process-wide pool too
+        super().__init__(
+            model=model,
+            api_key=api_key,
+            base_url=base_url,
+            http_client=get_sync_http_client(),
+            max_retries=max_retries,
+        )
+        self.max_retries = max_retries
+        self._aclient: Optional[AsyncOpenAI] = None
+        self._aclient_http = None
+
+    def _async_client(self) -> AsyncOpenAI:
+        http = get_async_http_client()
+        if self._aclient is None or self._aclient_http is not http:
+            self._aclient = AsyncOpenAI(
+                api_key=self._client.api_key,
+                organization=self._client.organization,
+                base_url=self._client.base_url,
+                http_client=http,
+                max_retries=self.max_retries,
+            )
+            self._aclient_http = http
+        return self._aclient
+
+    async def send_request(self, request):
+        payload = self._build_payload(request)
+        resp = await self._async_client().chat.completions.create(**payload, stream=False)
+        if not resp.choices:
+            return LlmResponse(content=None, tool_calls=None, finish_reason=None)
+
+        choice = resp.choices[0]
+        usage = None
+        if getattr(resp, "usage", None):
+            usage = {
+                "prompt_tokens": int(getattr(resp.usage, "prompt_tokens", 0) or 0),
+                "completion_tokens": int(getattr(resp.usage, "completion_tokens", 0) or 0),
+                "total_tokens": int(getattr(resp.usage, "total_tokens", 0) or 0),
+            }
+        return LlmResponse(
+            content=getattr(choice.message, "content", None),
+            tool_calls=self._extract_tool_calls_from_message(choice.message) or None,
+            finish_reason=getattr(choice, "finish_reason", None),
+            usage=usage,
+        )
+
+    async def stream_request(self, request):
+        payload = self._build_payload(request)
+        stream = await self._async_client().chat.completions.create(**payload, stream=True)
+
+        builders: Dict[int, Dict[str, Any]] = {}
+        finish_reason = None
+        try:
+            async for event in stream:
+                if not getattr(event, "choices", None):
+                    continue
+                choice = event.choices[0]
+                finish_reason = getattr(choice, "finish_reason", None) or finish_reason
+                delta = getattr(choice, "delta", None)
+                if delta is None:
+                    continue
+                if getattr(delta, "content", None):
+                    yield LlmStreamChunk(content=delta.content)
+                for tc in getattr(delta, "tool_calls", None) or []:
+                    b = builders.setdefault(getattr(tc, "index", 0) or 0, {"id": None, "name": None, "arguments": ""})
+                    if getattr(tc, "id", None):
+                        b["id"] = tc.id
+                    fn = getattr(tc, "function", None)
+                    if fn is not None:
+                        if getattr(fn, "name", None):
+                            b["name"] = fn.name
+                        if getattr(fn, "arguments", None):
+                            b["arguments"] += fn.arguments
+        finally:
+            # Return the connection to the pool even if the consumer stops early
+            await stream.close()
+
+        tool_calls: List[ToolCall] = [
+            ToolCall(id=b["id"] or "tool_call", name=b["name"], arguments=_parse_arguments(b["arguments"]))
+            for b in builders.values()
+            if b["name"]
+        ]
+        if tool_calls:
+            yield LlmStreamChunk(tool_calls=tool_calls, finish_reason=finish_reason)
+        else:
+            yield LlmStreamChunk(finish_reason=finish_reason or "stop")
@@ -0,0 +1,257 @@
+"""
+Bulk Oracle DDL extraction.
+Rebuilds compact CREATE TABLE statements for a whole owner from a handful of
+dictionary-view queries (ALL_TAB_COLUMNS, ALL_CONSTRAINTS, ALL_CONS_COLUMNS,
+ALL_TAB_COMMENTS/ALL_COL_COMMENTS) instead of one DBMS_METADATA.GET_DDL round
+trip per object. The output carries columns, types, defaults, keys and
+comments, without storage clauses or tablespaces.
+
+Views (and any other non-table type) have no dictionary equivalent, so they
+still go through DBMS_METADATA, spread over a few worker threads that each
+hold their own connection.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from app.config import ORACLE_DDL_VIEW_WORKERS
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+_CHAR_TYPES = {"VARCHAR2", "CHAR"}
+_NCHAR_TYPES = {"NVARCHAR2", "NCHAR"}
+
+
+def _in_list(prefix: str, values: Sequence[str], binds: dict) -> str:
+    names = []
+    for idx, value in enumerate(values):
+        binds[f"{prefix}{idx}"] = value
+        names.append(f":{prefix}{idx}")
+    return ", ".join(names)
+
+
+def _read(value) -> str:
+    return value.read() if hasattr(value, "read") else str(value)
+
+
+def _fetchall(conn, query: str, binds: dict) -> List[tuple]:
+    cur = conn.cursor()
+    try:
+        cur.arraysize = 5000
+        cur.execute(query, binds)
+        return cur.fetchall()
+    finally:
+        cur.close()
+
+
+def format_type(data_type: str, data_length, char_length, char_used, precision, scale) -> str:
+    if data_type in _CHAR_TYPES:
+        return f"{data_type}({char_length} CHAR)" if char_used == "C" else f"{data_type}({data_length})"
+    if data_type in _NCHAR_TYPES:
+        return f"{data_type}({char_length})"
+    if data_type == "NUMBER":
+        if precision is None:
+            return "INTEGER" if scale == 0 else "NUMBER"
+        return f"NUMBER({precision},{scale})" if scale else f"NUMBER({precision})"
+    if data_type == "FLOAT" and precision is not None:
+        return f"FLOAT({precision})"
+    if data_type in {"RAW", "UROWID"}:
+        return f"{data_type}({data_length})"
+    return data_type
+
+
+def _comment(text: Optional[str]) -> str:
+    return " ".join((text or "").split())
+
+
+def build_table_ddl(
+    owner: str,
+    table: str,
+    columns: Sequence[tuple],
+    constraints: Sequence[Tuple[str, str, List[str], Optional[str], List[str]]],
+    table_comment: Optional[str] = None,
+    column_comments: Optional[Dict[str, str]] = None,
+) -> str:
+    """
+    columns: (name, data_type, data_length, char_length, char_used, precision, scale, nullable, default)
+    constraints: (name, type P/U/R, columns, referenced "owner.table", referenced columns)
+    """
+    column_comments = column_comments or {}
+    lines = []
+    for name, data_type, length, char_length, char_used, precision, scale, nullable, default in columns:
+        line = f"{name} {format_type(data_type, length, char_length, char_used, precision, scale)}"
+        if default is not None and str(default).strip():
+            line += f" DEFAULT {' '.join(str(default).split())}"
+        if nullable == "N":
+            line += " NOT NULL"
+        lines.append((line, _comment(column_comments.get(name))))
+    for name, ctype, cols, ref_table, ref_cols in constraints:
+        if ctype == "P":
+            lines.append((f"CONSTRAINT {name} PRIMARY KEY ({', '.join(cols)})", ""))
+        elif ctype == "U":
+            lines.append((f"CONSTRAINT {name} UNIQUE ({', '.join(cols)})", ""))
+        elif ctype == "R" and ref_table:
+            lines.append(
+                (f"CONSTRAINT {name} FOREIGN KEY ({', '.join(cols)}) REFERENCES {ref_table} ({', '.join(ref_cols)})", "")
+            )
+
+    body = []
+    for idx, (line, comment) in enumerate(lines):
+        sep = "," if idx < len(lines) - 1 else ""
+        body.append(f"  {line}{sep}" + (f" -- {comment}" if comment else ""))
+    header = f"-- {_comment(table_comment)}\n" if _comment(table_comment) else ""
+    return f"{header}CREATE TABLE {owner}.{table} (\n" + "\n".join(body) + "\n);"
+
+
+def _table_ddl(conn, owner: str, tables: List[str], names: Optional[Sequence[str]]) -> Dict[str, str]:
+    binds = {"owner": owner}
+    in_names = _in_list("name", names, binds) if names else ""
+    name_filter = f" AND table_name IN ({in_names})" if names else ""
+    cons_filter = f" AND c.table_name IN ({in_names})" if names else ""
+
+    columns: Dict[str, List[tuple]] = {}
+    for row in _fetchall(
+        conn,
+        "SELECT table_name, column_name, data_type, data_length, char_length, char_used, "
+        "data_precision, data_scale, nullable, data_default "
+        f"FROM all_tab_columns WHERE owner = :owner{name_filter} ORDER BY table_name, column_id",
+        binds,
+    ):
+        columns.setdefault(row[0], []).append(tuple(row[1:]))
+
+    table_comments: Dict[str, str] = {}
+    for table, comment in _fetchall(
+        conn,
+        f"SELECT table_name, comments FROM all_tab_comments WHERE owner = :owner{name_filter} AND comments IS NOT NULL",
+        binds,
+    ):
+        table_comments[table] = comment
+    column_comments: Dict[str, Dict[str, str]] = {}
+    for table, column, comment in _fetchall(
+        conn,
+        "SELECT table_name, column_name, comments FROM all_col_comments "
+        f"WHERE owner = :owner{name_filter} AND comments IS NOT NULL",
+        binds,
+    ):
+        column_comments.setdefault(table, {})[column] = comment
+
+    # Key columns for this owner's constraints plus any other owner's keys they reference
+    key_columns: Dict[Tuple[str, str], List[str]] = {}
+    for cons_owner, cons_name, column in _fetchall(
+        conn,
+        "SELECT owner, constraint_name, column_name FROM all_cons_columns "
+        "WHERE owner = :owner OR (owner, constraint_name) IN ("
+        "SELECT r_owner, r_constraint_name FROM all_constraints WHERE owner = :owner AND constraint_type = 'R') "
+        "ORDER BY owner, constraint_name, position",
+        {"owner": owner},
+    ):
+        key_columns.setdefault((cons_owner, cons_name), []).append(column)
+
+    constraints: Dict[str, list] = {}
+    for table, name, ctype, r_owner, r_table, r_name in _fetchall(
+        conn,
+        "SELECT c.table_name, c.constraint_name, c.constraint_type, r.owner, r.table_name, r.constraint_name "
+        "FROM all_constraints c LEFT JOIN all_constraints r "
+        "ON r.owner = c.r_owner AND r.constraint_name = c.r_constraint_name "
+        f"WHERE c.owner = :owner AND c.constraint_type IN ('P', 'U', 'R'){cons_filter} "
+        "ORDER BY c.table_name, DECODE(c.constraint_type, 'P', 0, 'U', 1, 2), c.constraint_name",
+        binds,
+    ):
+        constraints.setdefault(table, []).append(
+            (
+                name,
+                ctype,
+                key_columns.get((owner, name), []),
+                f"{r_owner}.{r_table}" if r_table else None,
+                key_columns.get((r_owner, r_name), []),
+            )
+        )
+
+    return {
+        table: build_table_ddl(
+            owner,
+            table,
+            columns.get(table, []),
+            constraints.get(table, []),
+            table_comments.get(table),
+            column_comments.get(table),
+        )
+        for table in tables
+        if table in columns
+    }
+
+
+def _metadata_ddl(connection_factory: Callable, owner: str, objects: List[Tuple[str, str]]) -> Dict[Tuple[str, str], str]:
+    conn = connection_factory()
+    try:
+        cur = conn.cursor()
+        out = {}
+        try:
+            for name, obj_type in objects:
+                cur.execute(
+                    "SELECT DBMS_METADATA.GET_DDL(:obj_type, :obj_name, :owner) FROM DUAL",
+                    {"obj_type": obj_type.replace(" ", "_"), "obj_name": name, "owner": owner},
+                )
+                row = cur.fetchone()
+                if row and row[0] is not None:
+                    out[(name, obj_type)] = _read(row[0]).strip()
+        finally:
+            cur.close()
+        return out
+    finally:
+        conn.close()
+
+
+def extract_oracle_ddl(
+    connection_factory: Callable,
+    owner: str,
+    object_types: Sequence[str] = ("TABLE", "VIEW"),
+    object_names: Optional[Sequence[str]] = None,
+    view_workers: int = ORACLE_DDL_VIEW_WORKERS,
+) -> Dict[str, str]:
+    """DDL keyed by "<TYPE> <OWNER>.<NAME>": tables from bulk dictionary queries, the rest via DBMS_METADATA."""
+    start = time.perf_counter()
+    owner = owner.upper()
+    names = [n.upper() for n in object_names] if object_names else None
+    binds = {"owner": owner}
+    query = (
+        "SELECT object_name, object_type FROM all_objects "
+        f"WHERE owner = :owner AND object_type IN ({_in_list('type', list(object_types), binds)}) "
+        "AND object_name NOT LIKE 'BIN$%'"
+    )
+    if names:
+        query += f" AND object_name IN ({_in_list('name', names, binds)})"
+    query += " ORDER BY object_type, object_name"
+
+    conn = connection_factory()
+    try:
+        objects = _fetchall(conn, query, binds)
+        tables = [name for name, obj_type in objects if obj_type == "TABLE"]
+        ddl = {f"TABLE {owner}.{t}": text for t, text in _table_ddl(conn, owner, tables, names).items()} if tables else {}
+    finally:
+        conn.close()
+
+    others = [(name, obj_type) for name, obj_type in objects if obj_type != "TABLE"]
+    if others:
+        workers = max(1, min(view_workers, len(others)))
+        chunks = [others[i::workers] for i in range(workers)]
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="oracle-ddl") as pool:
+            results = pool.map(lambda chunk: _metadata_ddl(connection_factory, owner, chunk), chunks)
+            fetched = {key: text for part in results for key, text in part.items()}
+        for name, obj_type in others:
+            if (name, obj_type) in fetched:
+                ddl[f"{obj_type} {owner}.{name}"] = fetched[(name, obj_type)]
+
+    log_perf(
+        logger,
+        "oracle_ddl.extracted",
+        {
+            "owner": owner,
+            "tables": len(tables),
+            "other_objects": len(others),
+            "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+        },
+    )
+    return ddl
@@ -0,0 +1,195 @@
+"""
+Semantic answer cache.
+Remembers which validated SQL answered a question. Incoming questions are
+embedded and matched against an HNSW-indexed Chroma collection scoped by
+context version and access group; a close enough paraphrase lets the
+workflow re-run the stored SQL without an LLM round trip. Only the SQL the
+final answer was built on is stored, and a hit must carry the same numbers,
+quoted literals and negations as the question it answered.
+"""
+
+import asyncio
+import hashlib
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional
+
+from app.config import SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_MIN_WORDS
+from vanna.core.middleware import LlmMiddleware
+
+from app.utils.helpers import normalize_question, same_literals
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+COLLECTION_NAME = "semantic_answer_cache"
+
+# Question currently being answered by the LLM in this request, if it may be stored
+_pending: ContextVar[Optional[dict]] = ContextVar("semantic_cache_pending", default=None)
+
+
+@dataclass(frozen=True)
+class SemanticHit:
+    question: str
+    sql: str
+    similarity: float
+
+
+def make_scope(context_version: str, groups: Iterable[str]) -> str:
+    """Answers are only shared between users with the same groups on the same schema and training data."""
+    raw = f"{context_version}|{','.join(sorted(set(groups or [])))}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+
+class SemanticCache:
+    def __init__(self, threshold: float = SEMANTIC_CACHE_THRESHOLD, enabled: bool = SEMANTIC_CACHE_ENABLED):
+        self.threshold = threshold
+        self.enabled = enabled
+        self._client = None
+        self._embedding_function = None
+        self._collection = None
+        self.counters = {"lookups": 0, "hits": 0, "misses": 0, "literal_mismatches": 0, "stores": 0, "errors": 0}
+
+    def bind(self, client: Any, embedding_function: Any) -> None:
+        """Attach the Chroma client and the embedding function used for training."""
+        self._client = client
+        self._embedding_function = embedding_function
+        self._collection = None
+
+    @property
+    def ready(self) -> bool:
+        return self.enabled and self._client is not None
+
+    def eligible(self, question: str) -> bool:
+        text = normalize_question(question)
+        return bool(text) and not text.startswith("/") and len(text.split()) >= SEMANTIC_CACHE_MIN_WORDS
+
+    def _get_collection(self):
+        if self._collection is None:
+            self._collection = self._client.get_or_create_collection(
+                name=COLLECTION_NAME,
+                embedding_function=self._embedding_function,
+                metadata={"hnsw:space": "cosine"},
+            )
+        return self._collection
+
+    async def _embed(self, text: str) -> Optional[list]:
+        """Embed via the function's async client when it has one (worker pool / service)."""
+        aembed = getattr(self._embedding_function, "aembed", None)
+        return (await aembed([text]))[0] if aembed is not None else None
+
+    def _query(self, text: str, scope: str, embedding=None) -> Optional[SemanticHit]:
+        query = {"query_embeddings": [embedding]} if embedding is not None else {"query_texts": [text]}
+        result = self._get_collection().query(
+            **query,
+            n_results=1,
+            where={"scope": scope},
+            include=["metadatas", "distances"],
+        )
+        distances = (result.get("distances") or [[]])[0]
+        metadatas = (result.get("metadatas") or [[]])[0]
+        if not distances or not metadatas:
+            return None
+        # Cosine space: distance = 1 - cosine similarity
+        similarity = 1.0 - float(distances[0])
+        meta = metadatas[0] or {}
+        return SemanticHit(question=meta.get("question", ""), sql=meta.get("sql", ""), similarity=similarity)
+
+    async def lookup(self, question: str, scope: str) -> Optional[SemanticHit]:
+        if not (self.ready and self.eligible(question)):
+            return None
+        self.counters["lookups"] += 1
+        start = time.perf_counter()
+        try:
+            # Embedding is CPU-bound; keep it off the event loop
+            text = normalize_question(question)
+            best = await asyncio.to_thread(self._query, text, scope, await self._embed(text))
+        except Exception as exc:
+            self.counters["errors"] += 1
+            log_perf(logger, "semantic_cache.error", {"op": "lookup", "error": str(exc)})
+            return None
+        hit = best if best is not None and best.sql and best.similarity >= self.threshold else None
+        if hit is not None and not same_literals(question, hit.question):
+            # "top 5" vs "top 10", 2023 vs 2024, "inactive" vs "active": close, but another answer
+            self.counters["literal_mismatches"] += 1
+            hit = None
+        self.counters["hits" if hit else "misses"] += 1
+        log_perf(
+            logger,
+            "semantic_cache.lookup",
+            {
+                "hit": hit is not None,
+                "similarity": round(best.similarity, 4) if best else None,
+                "threshold": self.threshold,
+                "duration_ms": round((time.perf_counter() - start) * 1000, 2),
+            },
+        )
+        return hit
+
+    def _upsert(self, question: str, sql: str, scope: str, embedding=None) -> None:
+        text = normalize_question(question)
+        entry_id = hashlib.sha256(f"{scope}|{text}".encode("utf-8")).hexdigest()
+        self._get_collection().upsert(
+            ids=[entry_id],
+            documents=[text],
+            embeddings=[embedding] if embedding is not None else None,
+            metadatas=[{"scope": scope, "sql": sql, "question": question, "stored_at": time.time()}],
+        )
+
+    async def remember(self, question: str, sql: str, scope: str) -> None:
+        if not (self.ready and self.eligible(question) and sql):
+            return
+        try:
+            embedding = await self._embed(normalize_question(question))
+            await asyncio.to_thread(self._upsert, question, sql, scope, embedding)
+            self.counters["stores"] += 1
+        except Exception as exc:
+            self.counters["errors"] += 1
+            log_perf(logger, "semantic_cache.error", {"op": "store", "error": str(exc)})
+
+    def begin(self, question: str, scope: str) -> None:
+        """Mark the question of the current request as a candidate for storing."""
+        _pending.set({"question": question, "scope": scope} if self.ready and self.eligible(question) else None)
+
+    def reset(self) -> None:
+        """Forget any candidate left over from an earlier turn handled in this context."""
+        _pending.set(None)
+
+    def record_success(self, sql: str) -> None:
+        """Note the SQL that just executed successfully (as sent to the database) for this request."""
+        pending = _pending.get()
+        if pending:
+            pending["sql"] = sql
+
+    def record_failure(self) -> None:
+        """A later query was blocked or failed; the answer will not rest on the earlier one."""
+        pending = _pending.get()
+        if pending:
+            pending["sql"] = None
+
+    async def commit(self) -> None:
+        """
+        Called once the LLM gives its final answer (no further tool calls): store the SQL
+        of the turn's last run_sql, which that answer was built on. Earlier exploratory
+        queries of the turn were overwritten by it.
+        """
+        pending = _pending.get()
+        if pending and pending.get("sql"):
+            _pending.set(None)
+            await self.remember(pending["question"], pending["sql"], pending["scope"])
+
+    def stats(self) -> dict:
+        return {**self.counters, "enabled": self.enabled, "bound": self._client is not None, "threshold": self.threshold}
+
+
+class SemanticCacheMiddleware(LlmMiddleware):
+    """Commits the pending entry on the final LLM response; runs after tool-call repair."""
+
+    async def after_llm_response(self, request, response):
+        if not response.is_tool_call():
+            await semantic_cache.commit()
+        return response
+
+
+semantic_cache = SemanticCache()
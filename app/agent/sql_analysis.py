@@ -0,0 +1,386 @@
+"""
+Shared SQL analysis.
+Each SQL string is tokenized once with sqlparse and the resulting analysis
+(statements, keywords, referenced tables/columns, CTEs and query scopes) is
+cached in an LRU keyed by the SQL hash. Validation, the schema guard and
+dialect transpilation (app/agent/sql_transpile.py) all read from the same
+cached parse.
+"""
+
+import hashlib
+import threading
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple, Union
+
+import sqlparse
+from cachetools import LRUCache
+from sqlparse import tokens as T
+from sqlparse.sql import (
+    Function,
+    Identifier,
+    IdentifierList,
+    Parenthesis,
+    Statement,
+    Where,
+)
+
+from app.config import SQL_ANALYSIS_CACHE_SIZE
+
+
+@dataclass(frozen=True)
+class TableRef:
+    schema: Optional[str]
+    name: str
+    alias: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ColumnRef:
+    qualifier: Optional[str]
+    name: str
+
+
+class QueryScope:
+    """
+    One SELECT block. Sources map the visible alias (or table name) to either
+    a physical TableRef or the QueryScope of a derived table / CTE.
+    """
+
+    def __init__(self, parent: Optional["QueryScope"] = None):
+        self.parent = parent
+        self.ctes: Dict[str, "QueryScope"] = {}
+        self.sources: Dict[str, Union[TableRef, "QueryScope"]] = {}
+        self.columns: List[ColumnRef] = []
+        self.stars: List[Optional[str]] = []
+        self.outputs: List[str] = []
+        self.aliases: set = set()
+        self.children: List["QueryScope"] = []
+        self.branches: List["QueryScope"] = []
+
+    def lookup_cte(self, name: str) -> Optional["QueryScope"]:
+        scope: Optional[QueryScope] = self
+        while scope is not None:
+            if name in scope.ctes:
+                return scope.ctes[name]
+            scope = scope.parent
+        return None
+
+    def walk(self):
+        yield self
+        for cte in self.ctes.values():
+            yield from cte.walk()
+        for child in self.children:
+            yield from child.walk()
+        for branch in self.branches:
+            yield from branch.walk()
+
+
+class SqlAnalysis:
+    """Read-only result of parsing one SQL string; instances are shared through the cache."""
+
+    def __init__(self, sql: str, statements: Tuple[Statement, ...]):
+        self.sql = sql
+        self.parsed = statements
+        self.statements: Tuple[str, ...] = tuple(_statement_text(s) for s in statements)
+        self.statement = statements[0] if len(statements) == 1 else None
+        self.tokens: Tuple[Tuple[object, str], ...] = ()
+        self.statement_type = ""
+        self.keywords = frozenset()
+        self.has_comments = False
+        self.has_tautology = False
+        self.scope: Optional[QueryScope] = None
+        if self.statement is not None:
+            self._analyze(self.statement)
+
+    def _analyze(self, statement: Statement) -> None:
+        flat = [(tok.ttype, tok.value) for tok in statement.flatten()]
+        self.tokens = tuple(flat)
+        self.has_comments = any(ttype in T.Comment for ttype, _ in flat)
+        significant = [
+            (ttype, value)
+            for ttype, value in flat
+            if ttype not in T.Whitespace and ttype not in T.Comment
+        ]
+        if significant:
+            self.statement_type = significant[0][1].split()[0].lower()
+        self.keywords = frozenset(
+            value.lower() for ttype, value in significant if ttype in T.Keyword
+        )
+        self.has_tautology = _has_tautology(significant)
+        self.scope = QueryScope()
+        _walk_query(statement.tokens, self.scope)
+
+    @property
+    def cte_names(self) -> frozenset:
+        if self.scope is None:
+            return frozenset()
+        return frozenset(name for scope in self.scope.walk() for name in scope.ctes)
+
+    @property
+    def table_refs(self) -> Tuple[TableRef, ...]:
+        if self.scope is None:
+            return ()
+        refs = []
+        for scope in self.scope.walk():
+            refs.extend(src for src in scope.sources.values() if isinstance(src, TableRef))
+        return tuple(refs)
+
+    @property
+    def tables(self) -> frozenset:
+        return frozenset(ref.name for ref in self.table_refs)
+
+    @property
+    def columns(self) -> Tuple[ColumnRef, ...]:
+        if self.scope is None:
+            return ()
+        return tuple(col for scope in self.scope.walk() for col in scope.columns)
+
+
+_cache: LRUCache = LRUCache(maxsize=SQL_ANALYSIS_CACHE_SIZE)
+_cache_lock = threading.Lock()
+_cache_counters = {"hits": 0, "misses": 0}
+
+
+def sql_fingerprint(sql: str) -> str:
+    return hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+
+def analyze_sql(sql: str) -> SqlAnalysis:
+    """Parse `sql` once and memoize the analysis by its SHA-256 hash."""
+    key = sql_fingerprint(sql)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache_counters["hits"] += 1
+            return cached
+        _cache_counters["misses"] += 1
+    statements = tuple(s for s in sqlparse.parse(sql) if _statement_text(s))
+    analysis = SqlAnalysis(sql, statements)
+    with _cache_lock:
+        _cache[key] = analysis
+    return analysis
+
+
+def analysis_cache_stats() -> dict:
+    with _cache_lock:
+        return {**_cache_counters, "size": len(_cache), "maxsize": _cache.maxsize}
+
+
+def clear_analysis_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+        _cache_counters.update(hits=0, misses=0)
+
+
+def _statement_text(statement: Statement) -> str:
+    text = str(statement).strip()
+    while text.endswith(";"):
+        text = text[:-1].rstrip()
+    return text
+
+
+def _literal_value(ttype, value: str) -> Optional[str]:
+    if ttype in T.Number or ttype in T.String.Single:
+        return value.lower()
+    return None
+
+
+def _has_tautology(significant) -> bool:
+    """Detect `OR|AND <literal> = <same literal>` sequences such as `OR 1=1`."""
+    for idx, (ttype, value) in enumerate(significant):
+        if ttype not in T.Keyword or value.lower() not in {"or", "and"}:
+            continue
+        window = significant[idx + 1 : idx + 4]
+        if len(window) < 3:
+            continue
+        left, op, right = window
+        if op[0] not in T.Operator.Comparison or op[1] != "=":
+            continue
+        lval = _literal_value(*left)
+        if lval is not None and lval == _literal_value(*right):
+            return True
+    return False
+
+
+def _is_name(ttype) -> bool:
+    return ttype is T.Name or ttype is T.String.Symbol
+
+
+def _name(value: Optional[str]) -> Optional[str]:
+    if value is None:
+        return None
+    return value.strip('"`[]').lower()
+
+
+def _is_subquery(paren: Parenthesis) -> bool:
+    return any(tok.ttype is T.Keyword.DML and tok.normalized == "SELECT" for tok in paren.tokens) or any(
+        tok.ttype is T.Keyword.CTE for tok in paren.tokens
+    )
+
+
+def _inner_tokens(paren: Parenthesis) -> List:
+    return [tok for tok in paren.tokens[1:-1]]
+
+
+def _walk_query(tokens, scope: QueryScope) -> None:
+    clause = None
+    current = scope
+    seen_select = False
+    for tok in tokens:
+        if tok.is_whitespace or tok.ttype in T.Comment:
+            continue
+        if tok.ttype is T.Keyword.CTE:
+            clause = "cte"
+            continue
+        if tok.ttype is T.Keyword.DML and tok.normalized == "SELECT":
+            if seen_select:
+                branch = QueryScope(parent=scope)
+                branch.ctes = scope.ctes
+                scope.branches.append(branch)
+                current = branch
+            seen_select = True
+            clause = "select"
+            continue
+        if tok.ttype in T.Keyword:
+            word = tok.normalized
+            if word == "FROM" or word.endswith("JOIN"):
+                clause = "from"
+            elif word in {"ON", "USING", "HAVING", "GROUP BY", "ORDER BY", "BY", "WHEN", "THEN", "ELSE"}:
+                clause = "expr"
+            elif word in {"LIMIT", "OFFSET", "FETCH"}:
+                clause = "tail"
+            elif word.startswith(("UNION", "INTERSECT", "EXCEPT", "MINUS")):
+                clause = None
+            elif clause == "from" and word not in {"AS", "LATERAL", "OUTER", "ONLY"}:
+                clause = "expr"
+            continue
+        if isinstance(tok, Where):
+            _collect_expr(tok, current)
+            clause = "expr"
+            continue
+        if clause == "cte":
+            _collect_ctes(tok, scope)
+        elif clause == "from":
+            _collect_sources(tok, current)
+        elif clause == "select":
+            _collect_select_list(tok, current)
+        elif clause == "expr":
+            _collect_expr(tok, current)
+
+
+def _collect_ctes(tok, scope: QueryScope) -> None:
+    items = tok.get_identifiers() if isinstance(tok, IdentifierList) else [tok]
+    for item in items:
+        if not isinstance(item, Identifier):
+            continue
+        paren = next((t for t in item.tokens if isinstance(t, Parenthesis)), None)
+        name = _name(item.get_name())
+        if paren is None or not name:
+            continue
+        cte_scope = QueryScope(parent=scope)
+        _walk_query(_inner_tokens(paren), cte_scope)
+        scope.ctes[name] = cte_scope
+
+
+def _collect_sources(tok, scope: QueryScope) -> None:
+    if isinstance(tok, IdentifierList):
+        for item in tok.get_identifiers():
+            _collect_sources(item, scope)
+        return
+    if isinstance(tok, Parenthesis):
+        if _is_subquery(tok):
+            derived = QueryScope(parent=scope)
+            _walk_query(_inner_tokens(tok), derived)
+            scope.children.append(derived)
+            scope.sources[f"<subquery{len(scope.children)}>"] = derived
+        return
+    if isinstance(tok, Function):
+        _collect_expr(tok, scope)
+        return
+    if not isinstance(tok, Identifier):
+        return
+    first = tok.token_first(skip_ws=True, skip_cm=True)
+    alias = _name(tok.get_alias())
+    if isinstance(first, Parenthesis):
+        derived = QueryScope(parent=scope)
+        _walk_query(_inner_tokens(first), derived)
+        scope.children.append(derived)
+        scope.sources[alias or f"<subquery{len(scope.children)}>"] = derived
+        return
+    if isinstance(first, Function):
+        _collect_expr(first, scope)
+        return
+    name = _name(tok.get_real_name())
+    if not name:
+        return
+    schema = _name(tok.get_parent_name())
+    cte = scope.lookup_cte(name) if schema is None else None
+    if cte is not None:
+        scope.sources[alias or name] = cte
+        return
+    scope.sources[alias or name] = TableRef(schema=schema, name=name, alias=alias)
+
+
+def _collect_select_list(tok, scope: QueryScope) -> None:
+    items = tok.get_identifiers() if isinstance(tok, IdentifierList) else [tok]
+    for item in items:
+        if item.ttype is T.Wildcard:
+            scope.stars.append(None)
+            continue
+        if isinstance(item, Identifier) and item.is_wildcard():
+            scope.stars.append(_name(item.get_parent_name()))
+            continue
+        if item.ttype is T.Keyword and item.normalized == "DISTINCT":
+            continue
+        if isinstance(item, Identifier):
+            alias = _name(item.get_alias())
+            if alias:
+                scope.aliases.add(alias)
+            scope.outputs.append(alias or _name(item.get_real_name()))
+        elif _is_name(item.ttype):
+            scope.outputs.append(_name(item.value))
+        _collect_expr(item, scope)
+
+
+def _expression_tokens(ident: Identifier) -> List:
+    """Tokens of an identifier up to its alias (`expr [AS] alias`)."""
+    out = []
+    for tok in ident.tokens:
+        if tok.is_whitespace or (tok.ttype in T.Keyword and tok.normalized == "AS"):
+            break
+        out.append(tok)
+    return out
+
+
+def _collect_expr(tok, scope: QueryScope) -> None:
+    if tok.ttype is not None:
+        if _is_name(tok.ttype):
+            scope.columns.append(ColumnRef(qualifier=None, name=_name(tok.value)))
+        return
+    if isinstance(tok, Parenthesis) and _is_subquery(tok):
+        sub = QueryScope(parent=scope)
+        _walk_query(_inner_tokens(tok), sub)
+        scope.children.append(sub)
+        return
+    if isinstance(tok, Function):
+        for child in tok.tokens:
+            if isinstance(child, Parenthesis):
+                for arg in child.tokens:
+                    if arg.ttype is not T.Wildcard:
+                        _collect_expr(arg, scope)
+            elif not isinstance(child, Identifier):
+                _collect_expr(child, scope)
+        return
+    if isinstance(tok, Identifier):
+        parts = _expression_tokens(tok)
+        if parts and all(_is_name(p.ttype) or p.ttype is T.Punctuation for p in parts):
+            names = [p for p in parts if p.ttype is not T.Punctuation]
+            if names and parts[-1].ttype is not T.Punctuation:
+                qualifier = _name(names[-2].value) if len(names) >= 2 else None
+                scope.columns.append(ColumnRef(qualifier=qualifier, name=_name(names[-1].value)))
+            return
+        for child in parts:
+            _collect_expr(child, scope)
+        return
+    for child in tok.tokens:
+        _collect_expr(child, scope)
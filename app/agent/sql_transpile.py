@@ -0,0 +1,421 @@
+"""
+Dialect transpilation for LLM-generated SQL.
+Runs between validate_sql and the SQL runner and rewrites common
+cross-dialect idioms (LIMIT/OFFSET, string concatenation, date functions,
+boolean literals, identifier quoting, ILIKE) for the active DB_PROVIDER.
+Rewrites are rendered from the shared sqlparse analysis and memoized by
+(dialect, SQL fingerprint); parenthesised subqueries get their own
+pagination rewrite.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import List, Optional, Tuple
+
+from cachetools import LRUCache
+from sqlparse import tokens as T
+from sqlparse.sql import Comparison, Function, IdentifierList, Operation, Parenthesis, Statement
+
+from app.agent.sql_analysis import analyze_sql, sql_fingerprint
+from app.config import DB_PROVIDER, SQL_TRANSPILE_CACHE_SIZE
+
+
+@dataclass(frozen=True)
+class TranspiledSql:
+    sql: str
+    rules: Tuple[str, ...] = ()
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.rules)
+
+
+FUNCTION_RENAMES = {
+    "oracle": {"len": "LENGTH", "ifnull": "NVL", "isnull": "NVL", "substring": "SUBSTR"},
+    "sqlite": {"len": "LENGTH", "nvl": "IFNULL", "isnull": "IFNULL", "substring": "SUBSTR"},
+    "mssql": {"length": "LEN", "nvl": "ISNULL", "ifnull": "ISNULL", "substr": "SUBSTRING"},
+}
+# Keywords after which TRUE/FALSE stands alone as a condition
+PREDICATE_KEYWORDS = {"where", "and", "or", "not", "on", "having", "when"}
+NOW_FUNCTIONS = {"now", "getdate", "sysdatetime", "current_timestamp", "localtimestamp"}
+NATIVE_NOW_FUNCTIONS = {"oracle": {"localtimestamp"}, "sqlite": set(), "mssql": {"getdate", "sysdatetime"}}
+TODAY_FUNCTIONS = {"curdate", "today", "current_date"}
+TODAY_EXPR = {
+    "oracle": "TRUNC(SYSDATE)",
+    "sqlite": "DATE('now')",
+    "mssql": "CAST(GETDATE() AS DATE)",
+}
+NOW_EXPR = {
+    "oracle": "CURRENT_TIMESTAMP",
+    "sqlite": "CURRENT_TIMESTAMP",
+    "mssql": "GETDATE()",
+}
+# strftime directives mapped to Oracle TO_CHAR and T-SQL FORMAT patterns
+STRFTIME_FORMATS = {
+    "oracle": {"%Y": "YYYY", "%m": "MM", "%d": "DD", "%H": "HH24", "%M": "MI", "%S": "SS", "%j": "DDD"},
+    "mssql": {"%Y": "yyyy", "%m": "MM", "%d": "dd", "%H": "HH", "%M": "mm", "%S": "ss"},
+}
+
+_cache: LRUCache = LRUCache(maxsize=SQL_TRANSPILE_CACHE_SIZE)
+_cache_lock = threading.Lock()
+_cache_counters = {"hits": 0, "misses": 0, "rewritten": 0}
+
+
+def transpile(sql: str, dialect: str = DB_PROVIDER) -> TranspiledSql:
+    """Rewrite `sql` for `dialect`; results are memoized per (dialect, fingerprint)."""
+    key = (dialect, sql_fingerprint(sql))
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None:
+            _cache_counters["hits"] += 1
+            return cached
+        _cache_counters["misses"] += 1
+    analysis = analyze_sql(sql)
+    if analysis.statement is None or dialect not in FUNCTION_RENAMES:
+        result = TranspiledSql(sql=sql)
+    else:
+        renderer = _Renderer(dialect)
+        rendered = renderer.render_statement(analysis.statement)
+        result = TranspiledSql(sql=rendered, rules=tuple(sorted(renderer.rules)))
+    with _cache_lock:
+        _cache[key] = result
+        if result.changed:
+            _cache_counters["rewritten"] += 1
+    return result
+
+
+def rewrite_pagination(sql: str, dialect: str = DB_PROVIDER) -> str:
+    """Only the LIMIT/OFFSET <-> FETCH rewrite; the runners' fallback while SQL_TRANSPILE_ENABLED is off."""
+    analysis = analyze_sql(sql)
+    if analysis.statement is None or dialect not in FUNCTION_RENAMES:
+        return sql
+    renderer = _Renderer(dialect, pagination_only=True)
+    rendered = renderer.render_statement(analysis.statement)
+    return rendered if renderer.rules else sql
+
+
+def transpile_cache_stats() -> dict:
+    with _cache_lock:
+        return {**_cache_counters, "size": len(_cache), "maxsize": _cache.maxsize}
+
+
+def clear_transpile_cache() -> None:
+    with _cache_lock:
+        _cache.clear()
+        _cache_counters.update(hits=0, misses=0, rewritten=0)
+
+
+def _strip_terminator(tokens: List) -> List:
+    while tokens and (tokens[-1].is_whitespace or (tokens[-1].ttype is T.Punctuation and tokens[-1].value == ";")):
+        tokens.pop()
+    return tokens
+
+
+def _is_int(tok) -> bool:
+    return tok is not None and tok.ttype in T.Number.Integer
+
+
+def _is_kw(tok, *words: str) -> bool:
+    return tok is not None and tok.ttype in T.Keyword and tok.normalized in words
+
+
+def _parse_pagination(tokens: List) -> Optional[Tuple[int, Optional[str], Optional[str], str]]:
+    """
+    Recognize a trailing top-level pagination clause. Returns
+    (start_index, limit, offset, style) where style is "limit" or "fetch".
+    """
+    sig = [(idx, tok) for idx, tok in enumerate(tokens) if not tok.is_whitespace and tok.ttype not in T.Comment]
+    while sig and sig[-1][1].ttype is T.Punctuation and sig[-1][1].value == ";":
+        sig.pop()
+    starts = [pos for pos, (_, tok) in enumerate(sig) if _is_kw(tok, "LIMIT", "OFFSET", "FETCH")]
+    if not starts:
+        return None
+    pos = starts[0]
+    rest = [tok for _, tok in sig[pos:]]
+    start_index = sig[pos][0]
+
+    def at(i):
+        return rest[i] if i < len(rest) else None
+
+    if _is_kw(at(0), "LIMIT"):
+        if isinstance(at(1), IdentifierList):
+            ints = [t for t in at(1).tokens if _is_int(t)]
+            if len(ints) == 2 and len(rest) == 2:
+                return start_index, ints[1].value, ints[0].value, "limit"
+            return None
+        if not _is_int(at(1)):
+            return None
+        if len(rest) == 2:
+            return start_index, at(1).value, None, "limit"
+        if len(rest) == 4 and _is_kw(at(2), "OFFSET") and _is_int(at(3)):
+            return start_index, at(1).value, at(3).value, "limit"
+        return None
+
+    i = 0
+    offset = None
+    if _is_kw(at(0), "OFFSET"):
+        if not _is_int(at(1)):
+            return None
+        offset = at(1).value
+        i = 2
+        if _is_kw(at(i), "ROWS", "ROW"):
+            i += 1
+        if at(i) is None:
+            return start_index, None, offset, "fetch"
+    if (
+        _is_kw(at(i), "FETCH")
+        and _is_kw(at(i + 1), "FIRST", "NEXT")
+        and _is_int(at(i + 2))
+        and _is_kw(at(i + 3), "ROWS", "ROW")
+        and _is_kw(at(i + 4), "ONLY")
+        and len(rest) == i + 5
+    ):
+        return start_index, at(i + 2).value, offset, "fetch"
+    return None
+
+
+def _is_subquery(tok) -> bool:
+    first = next((child for child in tok.tokens[1:] if not child.is_whitespace), None)
+    return first is not None and first.ttype is T.Keyword.DML and first.normalized == "SELECT"
+
+
+def _chain_has_string(tok: Operation) -> bool:
+    return any(
+        child.ttype in T.String.Single or (isinstance(child, Operation) and _chain_has_string(child))
+        for child in tok.tokens
+    )
+
+
+class _Renderer:
+    def __init__(self, dialect: str, pagination_only: bool = False):
+        self.dialect = dialect
+        self.pagination_only = pagination_only
+        self.rules = set()
+        self._last = ""
+        self._before_last = ""
+        self._top_after_select: Optional[str] = None
+
+    def render_statement(self, statement: Statement) -> str:
+        return self._render_query(_strip_terminator(list(statement.tokens)))
+
+    def _render_query(self, tokens: List) -> str:
+        """One SELECT, top-level or parenthesised; each carries its own pagination clause."""
+        outer_top, self._top_after_select = self._top_after_select, None
+        pagination = _parse_pagination(tokens)
+        tail = ""
+        if pagination is not None:
+            start, limit, offset, style = pagination
+            tail = self._pagination_tail(tokens[:start], limit, offset, style)
+            if tail is not None:
+                tokens = tokens[:start]
+            else:
+                tail = ""
+        top_anchor = self._top_anchor(tokens) if self._top_after_select else None
+        parts = []
+        for tok in tokens:
+            parts.append(self.render(tok))
+            if tok is top_anchor:
+                parts.append(f" TOP {self._top_after_select}")
+        self._top_after_select = outer_top
+        head = "".join(parts).strip()
+        return f"{head} {tail}".strip() if tail else head
+
+    @staticmethod
+    def _top_anchor(tokens: List):
+        """Top-level token after which T-SQL expects `TOP n` (SELECT or SELECT DISTINCT)."""
+        significant = [tok for tok in tokens if not tok.is_whitespace]
+        for idx, tok in enumerate(significant):
+            if tok.ttype is T.Keyword.DML and tok.normalized == "SELECT":
+                following = significant[idx + 1] if idx + 1 < len(significant) else None
+                if _is_kw(following, "DISTINCT", "ALL"):
+                    return following
+                return tok
+        return None
+
+    def _pagination_tail(self, head: List, limit, offset, style) -> Optional[str]:
+        if self.dialect == "sqlite":
+            if style == "limit":
+                return None
+            self.rules.add("pagination")
+            if limit is None:
+                return f"LIMIT -1 OFFSET {offset}"
+            return f"LIMIT {limit}" + (f" OFFSET {offset}" if offset else "")
+        if style == "fetch":
+            return None
+        self.rules.add("pagination")
+        if self.dialect == "oracle":
+            if offset:
+                return f"OFFSET {offset} ROWS FETCH NEXT {limit} ROWS ONLY"
+            return f"FETCH FIRST {limit} ROWS ONLY"
+        # mssql: OFFSET/FETCH requires ORDER BY; plain limits become TOP n
+        has_order = any(_is_kw(tok, "ORDER BY") for tok in head)
+        if offset or has_order:
+            order = "" if has_order else "ORDER BY (SELECT NULL) "
+            return f"{order}OFFSET {offset or 0} ROWS FETCH NEXT {limit} ROWS ONLY"
+        self._top_after_select = limit
+        return ""
+
+    def render(self, tok) -> str:
+        if isinstance(tok, Parenthesis) and _is_subquery(tok):
+            self._last = "("
+            inner = self._render_query(list(tok.tokens[1:-1]))
+            self._last = ")"
+            return f"({inner})"
+        if self.pagination_only:
+            return "".join(self.render(child) for child in tok.tokens) if tok.is_group else tok.value
+        if not tok.is_group:
+            return self._render_leaf(tok)
+        if isinstance(tok, Function):
+            rendered = self._render_function(tok)
+            if rendered is not None:
+                self._last = ")"
+                return rendered
+        if isinstance(tok, Comparison):
+            rendered = self._render_ilike(tok)
+            if rendered is not None:
+                return rendered
+        if isinstance(tok, Operation):
+            return self._render_operation(tok)
+        return "".join(self.render(child) for child in tok.tokens)
+
+    def _render_leaf(self, tok) -> str:
+        value = tok.value
+        out = value
+        if tok.ttype in T.Keyword and tok.normalized in {"TRUE", "FALSE"}:
+            if self.dialect in {"oracle", "mssql"} and not self._after_is():
+                # A bare predicate (WHERE TRUE) needs a condition; an operand or value a number
+                if self._last in PREDICATE_KEYWORDS:
+                    out = "1=1" if tok.normalized == "TRUE" else "1=0"
+                else:
+                    out = "1" if tok.normalized == "TRUE" else "0"
+                self.rules.add("boolean_literal")
+        elif tok.ttype in T.Keyword and tok.normalized == "CURRENT_DATE":
+            if self.dialect != "sqlite":
+                out = TODAY_EXPR[self.dialect]
+                self.rules.add("date_function")
+        elif tok.ttype in T.Operator and value == "||" and self.dialect == "mssql":
+            out = "+"
+            self.rules.add("concat_operator")
+        elif tok.ttype is T.Name:
+            out = self._render_name(value)
+        if not tok.is_whitespace:
+            self._before_last, self._last = self._last, value.lower()
+        return out
+
+    def _after_is(self) -> bool:
+        """`x IS [NOT] TRUE` is left alone."""
+        return self._last == "is" or (self._last == "not" and self._before_last == "is")
+
+    def _render_name(self, value: str) -> str:
+        if value.lower() == "sysdate" and self._last != "." and self.dialect != "oracle":
+            self.rules.add("date_function")
+            return NOW_EXPR[self.dialect]
+        quoted = (value.startswith("`") and value.endswith("`")) or (
+            value.startswith("[") and value.endswith("]")
+        )
+        if not quoted or len(value) < 3:
+            return value
+        inner = value[1:-1]
+        if self.dialect == "mssql":
+            if value.startswith("["):
+                return value
+            self.rules.add("identifier_quoting")
+            return f"[{inner}]"
+        if self.dialect == "sqlite" and value.startswith("`"):
+            return value
+        self.rules.add("identifier_quoting")
+        # Oracle folds unquoted names to upper case, matching MySQL/T-SQL case-insensitive quoting
+        if self.dialect == "oracle" and inner.replace("_", "").isalnum():
+            return inner
+        return f'"{inner}"'
+
+    def _render_operation(self, tok: Operation, concat: Optional[bool] = None) -> str:
+        # sqlparse nests `a + ' ' + b` as ((a + ' ') + b): one string literal anywhere in the
+        # chain makes every `+` of it a concatenation
+        if concat is None:
+            concat = self.dialect != "mssql" and _chain_has_string(tok)
+        parts = []
+        for child in tok.tokens:
+            if isinstance(child, Operation):
+                parts.append(self._render_operation(child, concat))
+            elif child.ttype in T.Operator and child.value == "+" and concat:
+                self.rules.add("concat_operator")
+                parts.append("||")
+                self._last = "||"
+            else:
+                parts.append(self.render(child))
+        return "".join(parts)
+
+    def _render_ilike(self, tok: Comparison) -> Optional[str]:
+        op_index = next(
+            (
+                idx
+                for idx, child in enumerate(tok.tokens)
+                if child.ttype in T.Operator.Comparison and child.value.upper().split()[-1] == "ILIKE"
+            ),
+            None,
+        )
+        if op_index is None:
+            return None
+        self.rules.add("ilike")
+        negated = tok.tokens[op_index].value.upper().startswith("NOT")
+        left = "".join(self.render(child) for child in tok.tokens[:op_index]).strip()
+        right = "".join(self.render(child) for child in tok.tokens[op_index + 1 :]).strip()
+        op = "NOT LIKE" if negated else "LIKE"
+        if self.dialect == "oracle":
+            return f"UPPER({left}) {op} UPPER({right})"
+        return f"{left} {op} {right}"
+
+    def _function_args(self, paren: Parenthesis) -> List[str]:
+        inner = list(paren.tokens[1:-1])
+        if len(inner) == 1 and isinstance(inner[0], IdentifierList):
+            inner = list(inner[0].tokens)
+        args, current = [], []
+        for child in inner:
+            if child.ttype is T.Punctuation and child.value == ",":
+                args.append(current)
+                current = []
+            else:
+                current.append(child)
+        if current or args:
+            args.append(current)
+        return ["".join(self.render(child) for child in arg).strip() for arg in args]
+
+    def _render_function(self, tok: Function) -> Optional[str]:
+        name = (tok.get_name() or "").lower()
+        paren = next((child for child in tok.tokens if isinstance(child, Parenthesis)), None)
+        if paren is None:
+            return None
+        dialect = self.dialect
+        if name in NOW_FUNCTIONS:
+            if name in NATIVE_NOW_FUNCTIONS[dialect] or self._function_args(paren) not in ([], [""]):
+                return None
+            self.rules.add("date_function")
+            return NOW_EXPR[dialect]
+        if name in TODAY_FUNCTIONS:
+            self.rules.add("date_function")
+            return TODAY_EXPR[dialect]
+        if name == "date" and dialect != "sqlite":
+            args = self._function_args(paren)
+            if len(args) == 1 and args[0].lower() == "'now'":
+                self.rules.add("date_function")
+                return TODAY_EXPR[dialect]
+            return None
+        if name == "strftime" and dialect in STRFTIME_FORMATS:
+            args = self._function_args(paren)
+            if len(args) == 2 and args[0].startswith("'") and args[0].endswith("'"):
+                fmt = args[0][1:-1]
+                for directive, replacement in STRFTIME_FORMATS[dialect].items():
+                    fmt = fmt.replace(directive, replacement)
+                if "%" in fmt:
+                    return None
+                self.rules.add("date_function")
+                func = "TO_CHAR" if dialect == "oracle" else "FORMAT"
+                return f"{func}({args[1]}, '{fmt}')"
+            return None
+        renamed = FUNCTION_RENAMES[dialect].get(name)
+        if renamed:
+            self.rules.add("function_name")
+            args = self._function_args(paren)
+            return f"{renamed}({', '.join(args)})"
+        return None
@@ -1,14 +1,19 @@
 """
 Phase 1.B — SQL Safety Layer.
 Lightweight pre-execution checks: single-statement enforcement, basic
-destructive/unsupported verb blocking, and comment/tautology screening.
+destructive/unsupported verb blocking, comment/tautology screening, and
+column resolution against the schema catalog.
 """
 
-import re
-from typing import Set
+from difflib import get_close_matches
+from typing import Dict, List, Optional, Set, Tuple, Union
 
+from app.agent.catalog import BUILTIN_TABLES, CatalogSnapshot
+from app.agent.sql_analysis import ColumnRef, QueryScope, SqlAnalysis, TableRef, analyze_sql
 from app.config import DB_PROVIDER
 
+COLUMN_SUGGESTION_LIMIT = 3
+
 
 class SQLValidationError(ValueError):
     """Raised when SQL fails basic safety validation."""
@@ -18,46 +23,172 @@ ALLOWED_STATEMENTS: Set[str] = {"select", "with", "explain", "describe", "show"}
 if DB_PROVIDER == "sqlite":
     ALLOWED_STATEMENTS.add("pragma")
 DESTRUCTIVE_KEYWORDS = {"drop", "truncate", "alter", "delete", "update", "insert"}
-COMMENT_PATTERN = re.compile(r"--|/\\*")
-TAUTOLOGY_PATTERN = re.compile(r"\\b(or|and)\\s+1\\s*=\\s*1\\b", re.IGNORECASE)
 
 
 def _normalize(sql: str) -> str:
     if not isinstance(sql, str):
         raise SQLValidationError("SQL must be a string")
-    cleaned = re.sub(r"\\s+", " ", sql).strip()
+    cleaned = sql.strip()
     if not cleaned:
         raise SQLValidationError("SQL is required")
     return cleaned
 
 
-def _ensure_single_statement(sql: str) -> str:
-    parts = [part.strip() for part in sql.split(";") if part.strip()]
-    if len(parts) != 1:
+def _ensure_single_statement(analysis: SqlAnalysis) -> str:
+    if len(analysis.statements) != 1:
         raise SQLValidationError("Only single SQL statements are allowed")
-    return parts[0]
+    return analysis.statements[0]
 
 
-def _ensure_supported_statement(sql: str) -> None:
-    if COMMENT_PATTERN.search(sql):
+def _ensure_supported_statement(analysis: SqlAnalysis) -> None:
+    if analysis.has_comments:
         raise SQLValidationError("Inline SQL comments are not allowed")
-    if TAUTOLOGY_PATTERN.search(sql):
+    if analysis.has_tautology:
         raise SQLValidationError("Tautology patterns are not allowed")
 
-    keyword = sql.split()[0].lower()
+    keyword = analysis.statement_type
     if keyword not in ALLOWED_STATEMENTS:
         allowed = ", ".join(sorted(ALLOWED_STATEMENTS))
         raise SQLValidationError(f"Unsupported SQL statement '{keyword}'. Allowed: {allowed}")
 
-    if re.search(r"\\b(" + "|".join(DESTRUCTIVE_KEYWORDS) + r")\\b", sql, re.IGNORECASE):
+    if analysis.keywords & DESTRUCTIVE_KEYWORDS:
         raise SQLValidationError("Destructive statements are blocked in this mode")
 
 
 def validate_sql(sql: str) -> str:
     """
     Basic SQL guardrail for Phase 1.B. Returns normalized single statement or raises SQLValidationError.
+    Statement splitting, comments and keywords come from the shared token-level analysis,
+    so separators or keywords inside string literals no longer trigger false positives.
     """
-    normalized = _normalize(sql)
-    single_statement = _ensure_single_statement(normalized)
-    _ensure_supported_statement(single_statement)
+    analysis = analyze_sql(_normalize(sql))
+    single_statement = _ensure_single_statement(analysis)
+    _ensure_supported_statement(analysis)
     return single_statement
+
+
+# Column-level pre-validation against the schema catalog.
+# Names that resolve without a FROM source (pseudo-columns, niladic functions).
+PSEUDO_COLUMNS = {
+    "oracle": {
+        "rownum", "rowid", "level", "sysdate", "systimestamp", "user", "uid", "current_date",
+        "current_timestamp", "localtimestamp", "sessiontimezone", "dbtimezone", "ora_rowscn",
+    },
+    "sqlite": {"rowid", "oid", "_rowid_", "current_date", "current_time", "current_timestamp"},
+    # sqlparse reads T-SQL `TOP n` as a name
+    "mssql": {"top", "current_timestamp", "current_user", "system_user", "session_user"},
+}
+
+
+class ColumnValidationError(SQLValidationError):
+    """Raised when SQL references columns that do not exist in the schema catalog."""
+
+    def __init__(self, unknown: List[Tuple[str, Tuple[str, ...]]]):
+        self.unknown = unknown
+        parts = []
+        for reference, suggestions in unknown:
+            hint = f" (did you mean: {', '.join(suggestions)})" if suggestions else ""
+            parts.append(f"{reference}{hint}")
+        super().__init__(f"Unknown columns: {'; '.join(parts)}")
+
+    @property
+    def suggestions(self) -> Dict[str, List[str]]:
+        return {reference: list(suggestions) for reference, suggestions in self.unknown}
+
+
+class _ColumnResolver:
+    def __init__(self, snapshot: CatalogSnapshot, dialect: str):
+        self.snapshot = snapshot
+        self.builtin_tables = BUILTIN_TABLES.get(dialect, set())
+        self.pseudo_columns = PSEUDO_COLUMNS.get(dialect, set())
+        self._memo: Dict[int, Optional[frozenset]] = {}
+
+    def source_columns(self, source: Union[TableRef, QueryScope]) -> Optional[frozenset]:
+        """Columns exposed by a FROM source; None means unknown (accept any reference)."""
+        key = id(source)
+        if key in self._memo:
+            return self._memo[key]
+        self._memo[key] = None  # guards recursive CTEs
+        if isinstance(source, TableRef):
+            obj = None if source.name in self.builtin_tables else self.snapshot.lookup(source.name, source.schema)
+            columns = obj.column_set if obj is not None and obj.column_set else None
+        else:
+            columns = self._scope_outputs(source)
+        self._memo[key] = columns
+        return columns
+
+    def _scope_outputs(self, scope: QueryScope) -> Optional[frozenset]:
+        names = set(scope.outputs)
+        for qualifier in scope.stars:
+            if qualifier is None:
+                sources = list(scope.sources.values())
+            else:
+                sources = [scope.sources[qualifier]] if qualifier in scope.sources else []
+            if not sources:
+                return None
+            for source in sources:
+                columns = self.source_columns(source)
+                if columns is None:
+                    return None
+                names |= columns
+        return frozenset(names)
+
+    def _visible(self, scope: QueryScope):
+        current: Optional[QueryScope] = scope
+        while current is not None:
+            yield current
+            current = current.parent
+
+    def check(self, scope: QueryScope, column: ColumnRef) -> Optional[Tuple[str, Tuple[str, ...]]]:
+        if column.qualifier is not None:
+            for visible in self._visible(scope):
+                source = visible.sources.get(column.qualifier)
+                if source is None:
+                    continue
+                columns = self.source_columns(source)
+                if columns is None or column.name in columns:
+                    return None
+                return f"{column.qualifier}.{column.name}", _closest(column.name, columns)
+            # Unresolved qualifiers (sequences, packages, parse gaps) are left to the database
+            return None
+
+        if column.name in self.pseudo_columns:
+            return None
+        candidates = set()
+        seen_source = False
+        for visible in self._visible(scope):
+            if column.name in visible.aliases:
+                return None
+            for source in visible.sources.values():
+                seen_source = True
+                columns = self.source_columns(source)
+                if columns is None or column.name in columns:
+                    return None
+                candidates |= columns
+        if not seen_source:
+            return None
+        return column.name, _closest(column.name, candidates)
+
+
+def _closest(name: str, candidates) -> Tuple[str, ...]:
+    return tuple(get_close_matches(name, sorted(candidates), n=COLUMN_SUGGESTION_LIMIT, cutoff=0.5))
+
+
+def validate_columns(sql: str, snapshot: Optional[CatalogSnapshot], dialect: str = DB_PROVIDER) -> None:
+    """
+    Resolve every column reference (qualified, aliased, through CTEs, derived
+    tables and SELECT * expansion) against the catalog snapshot. Raises
+    ColumnValidationError listing unknown columns and their closest real names.
+    """
+    analysis = analyze_sql(sql)
+    if snapshot is None or analysis.scope is None:
+        return
+    resolver = _ColumnResolver(snapshot, dialect)
+    unknown: Dict[str, Tuple[str, ...]] = {}
+    for scope in analysis.scope.walk():
+        for column in scope.columns:
+            problem = resolver.check(scope, column)
+            if problem is not None:
+                unknown.setdefault(problem[0], problem[1])
+    if unknown:
+        raise ColumnValidationError(sorted(unknown.items()))
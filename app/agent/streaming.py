@@ -0,0 +1,39 @@
+"""
+Token streaming side channel.
+The agent accumulates an LLM stream before yielding anything, so the LLM
+service publishes text deltas to a per-request sink instead; SafeChatHandler
+installs the sink and turns the deltas into a live-updating text component.
+"""
+
+from contextvars import ContextVar
+from typing import Callable, Optional
+
+DeltaSink = Callable[[str, str], None]
+
+_sink: ContextVar[Optional[DeltaSink]] = ContextVar("llm_delta_sink", default=None)
+
+
+def set_delta_sink(sink: Optional[DeltaSink]):
+    return _sink.set(sink)
+
+
+def reset_delta_sink(token) -> None:
+    _sink.reset(token)
+
+
+def streaming_active() -> bool:
+    return _sink.get() is not None
+
+
+def emit_delta(text: str) -> None:
+    """Publish a text delta of the LLM response currently streaming for this request."""
+    sink = _sink.get()
+    if sink is not None and text:
+        sink("delta", text)
+
+
+def emit_stream_end() -> None:
+    """Signal that the current LLM stream finished; the agent renders the final text itself."""
+    sink = _sink.get()
+    if sink is not None:
+        sink("end", "")
@@ -0,0 +1,167 @@
+"""
+Tool-call repair.
+Small local models often produce almost-valid tool calls: trailing commas,
+a missing closing brace, prose or code fences around the JSON, several calls
+glued together, or a call written into the message text instead of the
+tool_calls field. Each of those used to cost a second generation. This layer
+repairs them after the LLM responds and only accepts a repaired call when it
+validates against the tool's argument schema.
+"""
+
+import json
+import re
+import uuid
+from typing import Any, Dict, List, Optional
+
+from jsonschema import validators
+from vanna.core.middleware import LlmMiddleware
+from vanna.core.tool import ToolCall
+
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+_FENCE = re.compile(r"```(?:json)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_CLOSERS = {"{": "}", "[": "]"}
+
+counters = {"clean": 0, "repaired": 0, "failed": 0}
+_validators: Dict[str, Any] = {}
+
+
+def extract_json_object(text: str) -> Optional[dict]:
+    """First JSON object in text, tolerating fences, surrounding prose, trailing commas and missing closers."""
+    if not text:
+        return None
+    fenced = _FENCE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    start = text.find("{")
+    if start < 0:
+        return None
+
+    stack: List[str] = []
+    in_string = escaped = False
+    end = None
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in _CLOSERS:
+            stack.append(_CLOSERS[ch])
+        elif ch in "}]" and stack:
+            stack.pop()
+            if not stack:
+                end = i + 1
+                break
+
+    # Stopping at the first balanced object also drops any concatenated calls after it
+    candidate = text[start:end] if end else text[start:].rstrip() + ('"' if in_string else "") + "".join(reversed(stack))
+    candidate = _TRAILING_COMMA.sub(r"\1", candidate)
+    try:
+        loaded = json.loads(candidate)
+    except ValueError:
+        return None
+    return loaded if isinstance(loaded, dict) else None
+
+
+def _validator(tool) -> Any:
+    key = f"{tool.name}:{json.dumps(tool.parameters, sort_keys=True, default=str)}"
+    validator = _validators.get(key)
+    if validator is None:
+        cls = validators.validator_for(tool.parameters)
+        validator = cls(tool.parameters)
+        _validators[key] = validator
+    return validator
+
+
+def _valid(tool, arguments: dict) -> bool:
+    return tool is not None and _validator(tool).is_valid(arguments)
+
+
+def _as_call(obj: dict, tools: Dict[str, Any], bare: bool) -> Optional[ToolCall]:
+    """Interpret a parsed object as {"name", "arguments"} or, when bare, as the arguments of exactly one tool."""
+    if isinstance(obj.get("name"), str) and obj["name"] in tools:
+        arguments = obj.get("arguments", obj.get("parameters", {}))
+        if isinstance(arguments, str):
+            arguments = extract_json_object(arguments)
+        if isinstance(arguments, dict) and _valid(tools[obj["name"]], arguments):
+            return ToolCall(id=f"repaired-{uuid.uuid4().hex[:8]}", name=obj["name"], arguments=arguments)
+        return None
+    if not bare:
+        return None
+    matches = [tool for tool in tools.values() if _valid(tool, obj)]
+    if len(matches) == 1:
+        return ToolCall(id=f"repaired-{uuid.uuid4().hex[:8]}", name=matches[0].name, arguments=obj)
+    return None
+
+
+def _broken_arguments(arguments: dict) -> Optional[str]:
+    # AsyncOpenAILlmService/OpenAILlmService park unparseable arguments under "_raw"
+    if set(arguments) == {"_raw"} and isinstance(arguments["_raw"], str):
+        return arguments["_raw"]
+    return None
+
+
+def repair_response(response, tool_schemas) -> Any:
+    tools = {t.name: t for t in tool_schemas or []}
+    if not tools:
+        return response
+
+    if response.tool_calls:
+        fixed = []
+        for call in response.tool_calls:
+            raw = _broken_arguments(call.arguments or {})
+            if raw is None:
+                counters["clean"] += 1
+                fixed.append(call)
+                continue
+            arguments = extract_json_object(raw)
+            if arguments is not None and _valid(tools.get(call.name), arguments):
+                counters["repaired"] += 1
+                fixed.append(ToolCall(id=call.id, name=call.name, arguments=arguments))
+            else:
+                # Leave it for the tool's own validation error; the LLM gets to retry
+                counters["failed"] += 1
+                fixed.append(call)
+        response.tool_calls = fixed
+        return response
+
+    content = response.content or ""
+    if "{" not in content:
+        return response
+    obj = extract_json_object(content)
+    # Bare arguments only count when the message is nothing but JSON; prose may quote examples
+    bare = content.lstrip().startswith(("{", "```"))
+    call = _as_call(obj, tools, bare) if obj is not None else None
+    if call is None:
+        if obj is not None and isinstance(obj.get("name"), str):
+            counters["failed"] += 1
+        return response
+
+    counters["repaired"] += 1
+    log_perf(logger, "tool_call.repaired_from_text", {"tool": call.name})
+    response.tool_calls = [call]
+    response.content = None
+    response.finish_reason = "tool_calls"
+    return response
+
+
+class ToolCallRepairMiddleware(LlmMiddleware):
+    async def after_llm_response(self, request, response):
+        try:
+            return repair_response(response, getattr(request, "tools", None))
+        except Exception as exc:
+            log_perf(logger, "tool_call.repair_error", {"error": str(exc)})
+            return response
+
+
+def repair_stats() -> dict:
+    return dict(counters)
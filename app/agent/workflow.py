@@ -1,8 +1,33 @@
+import uuid
+
 from vanna.core.workflow import WorkflowHandler, WorkflowResult
 from vanna.components import RichTextComponent
+from vanna.core.storage import Message
+from vanna.core.tool import ToolCall, ToolContext
+
+from app.agent.context_version import context_version
+from app.agent.semantic_cache import make_scope, semantic_cache
+from app.config import MEMORY_FAST_PATH_ENABLED, MEMORY_FAST_PATH_MARGIN, MEMORY_FAST_PATH_THRESHOLD
+from app.utils.helpers import same_literals
+from app.utils.logger import setup_logger, log_perf
+
+logger = setup_logger(__name__)
+
+
+def _has_earlier_user_turns(conversation) -> bool:
+    # The workflow runs before the current message is added to the conversation
+    return any(getattr(m, "role", None) == "user" for m in getattr(conversation, "messages", None) or [])
 
 
 class CommandWorkflowHandler(WorkflowHandler):
+    def __init__(self):
+        self.counters = {
+            "memory_hits": 0,
+            "memory_ambiguous": 0,
+            "memory_replay_failed": 0,
+            "memory_literal_mismatches": 0,
+        }
+
     async def try_handle(self, agent, user, conversation, message):
         if message == "/help":
             return WorkflowResult(
@@ -10,7 +35,129 @@ class CommandWorkflowHandler(WorkflowHandler):
                 components=[RichTextComponent(content="# Help Commands")],
             )
 
+        semantic_cache.reset()
+        saved = await self._try_saved_tool_use(agent, user, conversation, message)
+        if saved is not None:
+            return saved
+
+        cached = await self._try_semantic_cache(agent, user, conversation, message)
+        if cached is not None:
+            return cached
+
         return WorkflowResult(should_skip_llm=False)
 
+    def _context(self, agent, user, conversation, source: str) -> ToolContext:
+        return ToolContext(
+            user=user,
+            conversation_id=conversation.id,
+            request_id=str(uuid.uuid4()),
+            agent_memory=agent.agent_memory,
+            observability_provider=agent.observability_provider,
+            metadata={source: True},
+        )
+
+    async def _run_sql(self, agent, context: ToolContext, sql: str, prefix: str):
+        return await agent.tool_registry.execute(
+            ToolCall(id=f"{prefix}-{uuid.uuid4().hex[:8]}", name="run_sql", arguments={"sql": sql}),
+            context,
+        )
+
+    def _answer(self, message: str, note: str, result) -> WorkflowResult:
+        components = [RichTextComponent(content=note)]
+        if result.ui_component is not None:
+            components.append(result.ui_component)
+
+        async def record_exchange(conv):
+            conv.add_message(Message(role="user", content=message))
+            conv.add_message(Message(role="assistant", content=result.result_for_llm))
+
+        return WorkflowResult(
+            should_skip_llm=True,
+            components=components,
+            conversation_mutation=record_exchange,
+        )
+
+    async def _try_saved_tool_use(self, agent, user, conversation, message):
+        """Run the SQL of a saved correct tool use when the question clearly matches it."""
+        if not MEMORY_FAST_PATH_ENABLED or not message or message.startswith("/"):
+            return None
+        context = self._context(agent, user, conversation, "memory_fast_path")
+        try:
+            matches = await agent.agent_memory.search_similar_usage(
+                message,
+                context,
+                limit=3,
+                similarity_threshold=MEMORY_FAST_PATH_THRESHOLD,
+                tool_name_filter="run_sql",
+            )
+        except Exception as exc:
+            log_perf(logger, "memory_fast_path.search_error", {"error": str(exc)})
+            return None
+        matches = [m for m in matches if (m.memory.args or {}).get("sql")]
+        if not matches:
+            return None
+        # A close score is not enough: "top 5" and "top 10" embed almost identically
+        exact = [m for m in matches if same_literals(message, m.memory.question)]
+        if not exact:
+            self.counters["memory_literal_mismatches"] += 1
+            return None
+        matches = exact
+
+        best = matches[0]
+        sql = best.memory.args["sql"]
+        rival = next((m for m in matches[1:] if m.memory.args["sql"] != sql), None)
+        if rival is not None and best.similarity_score - rival.similarity_score < MEMORY_FAST_PATH_MARGIN:
+            # Two different saved queries fit about equally well; let the LLM decide
+            self.counters["memory_ambiguous"] += 1
+            return None
+
+        result = await self._run_sql(agent, context, sql, "memory")
+        if not result.success:
+            self.counters["memory_replay_failed"] += 1
+            log_perf(logger, "memory_fast_path.replay_failed", {"error": result.error})
+            return None
+
+        self.counters["memory_hits"] += 1
+        log_perf(
+            logger,
+            "memory_fast_path.replay",
+            {"similarity": round(best.similarity_score, 4), "conversation_id": conversation.id},
+        )
+        note = f"Answered from a saved query for: _{best.memory.question}_\n\n```sql\n{sql}\n```"
+        return self._answer(message, note, result)
+
+    async def _try_semantic_cache(self, agent, user, conversation, message):
+        """Answer a paraphrase of a previously answered question by re-running its SQL."""
+        if not (semantic_cache.ready and semantic_cache.eligible(message)):
+            return None
+        if _has_earlier_user_turns(conversation):
+            # A follow-up ("now by month") means nothing without the turns before it
+            return None
+        scope = make_scope(context_version(), getattr(user, "group_memberships", []))
+        hit = await semantic_cache.lookup(message, scope)
+        if hit is None:
+            # The LLM answers this one; store its SQL once it executes successfully
+            semantic_cache.begin(message, scope)
+            return None
+
+        context = self._context(agent, user, conversation, "semantic_cache")
+        result = await self._run_sql(agent, context, hit.sql, "semantic")
+        if not result.success:
+            # Stale entry (schema drift, permissions); fall back to the LLM and overwrite it
+            log_perf(logger, "semantic_cache.replay_failed", {"error": result.error})
+            semantic_cache.begin(message, scope)
+            return None
+
+        log_perf(
+            logger,
+            "semantic_cache.replay",
+            {"similarity": round(hit.similarity, 4), "conversation_id": conversation.id},
+        )
+        note = f"Answered from a similar earlier question: _{hit.question}_\n\n```sql\n{hit.sql}\n```"
+        return self._answer(message, note, result)
+
+    def stats(self) -> dict:
+        return dict(self.counters)
+
 
 workflow_handler = CommandWorkflowHandler()
@@ -2,6 +2,7 @@ from fastapi import FastAPI, HTTPException
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from app.agent.llm_scheduler import LlmOverloadedError
 from app.utils.logger import setup_logger
 
 logger = setup_logger(__name__)
@@ -24,6 +25,15 @@ def register_exception_handlers(app: FastAPI) -> None:
         safe_detail = exc.detail if exc.status_code < 500 else "An error occurred."
         return JSONResponse(status_code=exc.status_code, content={"detail": safe_detail})
 
+    @app.exception_handler(LlmOverloadedError)
+    async def llm_overloaded_handler(request, exc: LlmOverloadedError):
+        logger.warning("LLM overloaded", extra={"path": str(request.url), "reason": str(exc)})
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "The language model is busy. Please try again shortly."},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
     @app.exception_handler(Exception)
     async def unhandled_exception_handler(request, exc: Exception):
         logger.exception("Unhandled error", extra={"path": str(request.url)})
@@ -5,7 +5,8 @@ from fastapi import APIRouter
 from app.agent.db import test_connections
 from app.agent.builder import knowledge_base
 from app.config import DB_PROVIDER, LLM_CONFIG, LLM_PROVIDER, PORT
-from app.utils.logger import perf_snapshot, get_trace_ids
+from app.utils.logger import get_trace_ids
+from app.utils.metrics import latency_metrics
 from app.runtime import state, uptime_seconds
 
 router = APIRouter()
@@ -34,22 +35,24 @@ def health_check():
 @router.get("/health/ready")
 async def readiness_check():
     db_status = await test_connections()
-    llm_vals = list(perf_snapshot["llm_ms"])
-    llm_avg = round(sum(llm_vals) / len(llm_vals), 2) if llm_vals else None
-    vector_ready = False
+    llm_latency = latency_metrics.stage_summary("llm")
     try:
-        df = knowledge_base.get_training_data()
-        vector_ready = bool(df is not None and not df.empty)
+        vector_store = knowledge_base.vector_stats()
+        vector_store["ready"] = vector_store["total"] > 0
     except Exception:
-        vector_ready = False
+        vector_store = {"ready": False}
     trace_id, _ = get_trace_ids()
     overall = "ok" if db_status.get("status") == "ok" else "error"
     return {
         "status": overall,
         "service": "vanna",
         "db": db_status,
-        "llm": {"status": "ok" if llm_avg else "unknown", "latency_ms": llm_avg},
-        "vector_store": {"ready": vector_ready},
+        "llm": {
+            "status": "ok" if llm_latency["count"] else "unknown",
+            "latency_ms": llm_latency["p50"],
+            "p99_ms": llm_latency["p99"],
+        },
+        "vector_store": vector_store,
         "trace_id": trace_id,
         "uptime_seconds": round(uptime_seconds(), 2),
         "timestamp": datetime.utcnow().isoformat(),
@@ -58,16 +61,14 @@ async def readiness_check():
 
 @router.get("/health/perf")
 async def perf_check():
-    llm_vals = list(perf_snapshot["llm_ms"])
-    sql_vals = list(perf_snapshot["sql_ms"])
-    llm_avg = round(sum(llm_vals) / len(llm_vals), 2) if llm_vals else 0.0
-    sql_avg = round(sum(sql_vals) / len(sql_vals), 2) if sql_vals else 0.0
+    window = latency_metrics.windows[0] if latency_metrics.windows else None
     return {
         "status": "ok",
         "service": "vanna",
-        "llm_recent_ms": llm_vals,
-        "sql_recent_ms": sql_vals,
-        "llm_avg_ms": llm_avg,
-        "sql_avg_ms": sql_avg,
+        "window_seconds": window,
+        "stages": {
+            stage: latency_metrics.stage_summary(stage, window)
+            for stage in ("request", "context", "llm", "sql", "fetch", "visualization")
+        },
         "timestamp": datetime.utcnow().isoformat(),
     }
@@ -4,6 +4,7 @@ from datetime import datetime
 from fastapi import APIRouter
 
 from app.agent.llm import llm
+from app.agent.llm_scheduler import Priority, llm_priority, llm_scheduler
 from app.config import LLM_CONFIG, LLM_PROVIDER
 from vanna.core.llm.models import LlmMessage, LlmRequest
 from vanna.core.user.models import User
@@ -21,7 +22,9 @@ async def llm_status():
     model_name = LLM_CONFIG.get(LLM_PROVIDER, {}).get("model")
     start_time = datetime.utcnow()
     try:
-        response = await asyncio.wait_for(llm.send_request(request), timeout=3)
+        # Probes queue behind chat traffic and give up quickly when the backend is saturated
+        with llm_priority(Priority.PROBE):
+            response = await asyncio.wait_for(llm.send_request(request), timeout=3)
         duration = (datetime.utcnow() - start_time).total_seconds()
         return {
             "status": "ok",
@@ -29,6 +32,8 @@ async def llm_status():
             "model": model_name,
             "response": response.content,
             "duration_seconds": round(duration, 3),
+            "router": llm.router.status() if hasattr(llm, "router") else None,
+            "queue": llm_scheduler.stats(),
         }
     except asyncio.TimeoutError:
         return {
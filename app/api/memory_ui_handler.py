@@ -1,20 +1,22 @@
 import os
 from fastapi import APIRouter
-import requests
+
+from app.utils.http_client import get_async_http_client
 
 router = APIRouter(prefix="/api/system", tags=["UI Memory Ops"])
 
 
 @router.post("/execute-memory-op")
-def execute_memory_op(action: str, force: bool = False):
+async def execute_memory_op(action: str, force: bool = False):
     base = f"http://localhost:{os.getenv('APP_PORT', '7777')}"
+    client = get_async_http_client()
     if action == "Backup":
-        res = requests.post(f"{base}/api/system/backup-memory")
+        res = await client.post(f"{base}/api/system/backup-memory")
         return res.json()
 
     if action == "Reset":
-        res = requests.delete(
-            f"{base}/api/system/reset-memory?force={'true' if force else 'false'}"
+        res = await client.delete(
+            f"{base}/api/system/reset-memory", params={"force": "true" if force else "false"}
         )
         return res.json()
 
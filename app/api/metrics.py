@@ -1,7 +1,15 @@
 from fastapi import APIRouter
 
-from app.utils.logger import perf_snapshot
-from app.utils.metrics import get_metrics_snapshot
+from app.agent.compaction import compactor
+from app.agent.embedding_cache import embedding_cache
+from app.agent.embeddings import embedding_function
+from app.agent.llm import llm, llm_inflight, stream_stats
+from app.agent.llm_scheduler import llm_scheduler
+from app.agent.semantic_cache import semantic_cache
+from app.agent.tool_call_repair import repair_stats
+from app.agent.workflow import workflow_handler
+from app.utils.cache import cache_stats
+from app.utils.metrics import get_latency_snapshot, get_metrics_snapshot
 
 router = APIRouter(prefix="/api", tags=["metrics"])
 
@@ -9,14 +17,18 @@ router = APIRouter(prefix="/api", tags=["metrics"])
 @router.get("/metrics")
 def metrics():
     snapshot = get_metrics_snapshot()
-    llm = list(perf_snapshot.get("llm_ms", []))
-    sql = list(perf_snapshot.get("sql_ms", []))
     return {
         "counters": snapshot,
-        "perf": {
-            "llm_ms": llm,
-            "sql_ms": sql,
-            "llm_avg_ms": round(sum(llm) / len(llm), 2) if llm else None,
-            "sql_avg_ms": round(sum(sql) / len(sql), 2) if sql else None,
-        },
+        "cache": cache_stats(),
+        "semantic_cache": semantic_cache.stats(),
+        "memory_fast_path": workflow_handler.stats(),
+        "compaction": compactor.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embeddings": embedding_function.stats(),
+        "tool_call_repair": repair_stats(),
+        "llm_coalescing": llm_inflight.stats(),
+        "llm_streaming": stream_stats(),
+        "llm_queue": llm_scheduler.stats(),
+        "llm_router": llm.router.status() if hasattr(llm, "router") else None,
+        "latency": get_latency_snapshot(),
     }
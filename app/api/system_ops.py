@@ -6,6 +6,7 @@ import chromadb
 from chromadb.config import Settings
 from fastapi import APIRouter, HTTPException, Request
 
+from app.agent.db import schema_catalog
 from app.utils.logger import setup_logger, get_trace_ids
 
 router = APIRouter(prefix="/api/system", tags=["System Management"])
@@ -99,3 +100,22 @@ def reset_memory(request: Request, force: bool = False):
         trace_id, _ = get_trace_ids()
         logger.info("reset.failure", extra={"extra_data": {"trace_id": trace_id, "user": user, "error": str(e)}})
         raise HTTPException(500, str(e))
+
+
+@router.get("/catalog")
+def catalog_status(request: Request):
+    _require_admin(request)
+    return schema_catalog.status()
+
+
+@router.post("/catalog/refresh")
+def refresh_catalog(request: Request):
+    """Reload the schema catalog now instead of waiting for the TTL refresh."""
+    user = _require_admin(request)
+    schema_catalog.refresh()
+    trace_id, _ = get_trace_ids()
+    status = schema_catalog.status()
+    logger.info("catalog.refresh", extra={"extra_data": {"trace_id": trace_id, "user": user, **status}})
+    if status["last_error"]:
+        raise HTTPException(503, f"Catalog refresh failed: {status['last_error']}")
+    return {"status": "success", **status}
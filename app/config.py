@@ -26,15 +26,26 @@ ORACLE_TRAIN_OBJECTS = [
 ORACLE_TRAIN_TABLES = [
     t.strip().upper() for t in os.getenv("ORACLE_TRAIN_TABLES", "ALL").split(",") if t.strip()
 ]
+# Views are extracted with DBMS_METADATA on this many parallel connections
+ORACLE_DDL_VIEW_WORKERS = int(os.getenv("ORACLE_DDL_VIEW_WORKERS", 4))
 DB_MSSQL_CONN = os.getenv("DB_MSSQL_CONN", "")
 
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "lmstudio").lower()
 LLM_MAX_PROMPT_CHARS = int(os.getenv("LLM_MAX_PROMPT_CHARS", 12000))
+# Conversation compaction: once history passes the trigger, older turns become a summary
+COMPACTION_ENABLED = os.getenv("COMPACTION_ENABLED", "true").lower() == "true"
+COMPACTION_TRIGGER_CHARS = int(os.getenv("COMPACTION_TRIGGER_CHARS", LLM_MAX_PROMPT_CHARS // 2))
+COMPACTION_KEEP_TURNS = int(os.getenv("COMPACTION_KEEP_TURNS", 2))
+COMPACTION_SUMMARY_CHARS = int(os.getenv("COMPACTION_SUMMARY_CHARS", 2000))
+COMPACTION_LLM_SUMMARY = os.getenv("COMPACTION_LLM_SUMMARY", "true").lower() == "true"
+COMPACTION_CACHE_SIZE = int(os.getenv("COMPACTION_CACHE_SIZE", 256))
 LLM_CONFIG = {
     "lmstudio": {
         "base_url": os.getenv("LM_STUDIO_URL", "http://10.10.10.1:1234/v1"),
         "model": os.getenv("LM_STUDIO_MODEL", "gemma-3n"),
         "api_key": "lm-studio",
+        # A local model server decodes only a few sequences at once
+        "max_concurrency": int(os.getenv("LM_STUDIO_MAX_CONCURRENCY", 2)),
     },
     "openai": {
         "api_key": os.getenv("OPENAI_API_KEY", "NONE"),
@@ -43,12 +54,18 @@ LLM_CONFIG = {
     "groq": {
         "api_key": os.getenv("GROQ_API_KEY", "NONE"),
         "model": os.getenv("GROQ_MODEL", "mixtral-8x7b-32768"),
+        "base_url": "https://api.groq.com/openai/v1",
     },
     "gemini": {
         "api_key": os.getenv("GEMINI_API_KEY", "NONE"),
         "model": os.getenv("GEMINI_MODEL", "gemini-pro"),
+        "base_url": "https://generativelanguage.googleapis.com/v1beta/openai/",
     },
 }
+# Backends the LLM router may use, in LLM_CONFIG names; defaults to LLM_PROVIDER alone
+LLM_BACKENDS = [
+    b.strip().lower() for b in os.getenv("LLM_BACKENDS", LLM_PROVIDER).split(",") if b.strip()
+]
 
 SUPPORTED_DB_PROVIDERS = {"sqlite", "oracle", "mssql"}
 if DB_PROVIDER not in SUPPORTED_DB_PROVIDERS:
@@ -72,6 +89,12 @@ if LLM_PROVIDER not in LLM_CONFIG:
         f"Unsupported LLM_PROVIDER: {LLM_PROVIDER!r}. "
         f"Available options: {', '.join(sorted(LLM_CONFIG.keys()))}"
     )
+_unknown_backends = [b for b in LLM_BACKENDS if b not in LLM_CONFIG]
+if _unknown_backends:
+    raise RuntimeError(
+        f"Unsupported LLM_BACKENDS entries: {', '.join(_unknown_backends)}. "
+        f"Available options: {', '.join(sorted(LLM_CONFIG.keys()))}"
+    )
 
 HOST = os.getenv("HOST", "0.0.0.0")
 PORT = int(os.getenv("PORT", 7777))
@@ -89,10 +112,88 @@ DB_RETRY_BACKOFF_MS = int(os.getenv("DB_RETRY_BACKOFF_MS", 500))
 LLM_TIMEOUT_MS = int(os.getenv("LLM_TIMEOUT_MS", 60000))
 LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
 LLM_RETRY_BACKOFF_MS = int(os.getenv("LLM_RETRY_BACKOFF_MS", 500))
+LLM_COALESCE_ENABLED = os.getenv("LLM_COALESCE_ENABLED", "true").lower() == "true"
+LLM_ROUTER_FAILURE_THRESHOLD = int(os.getenv("LLM_ROUTER_FAILURE_THRESHOLD", 2))
+LLM_ROUTER_COOLDOWN_SECONDS = float(os.getenv("LLM_ROUTER_COOLDOWN_SECONDS", 15))
+LLM_HEDGE_ENABLED = os.getenv("LLM_HEDGE_ENABLED", "false").lower() == "true"
+LLM_HEDGE_MIN_DELAY_MS = int(os.getenv("LLM_HEDGE_MIN_DELAY_MS", 1000))
+# Admission control: concurrent requests per backend (unless LLM_CONFIG sets max_concurrency),
+# queued requests per backend, and how long each priority may wait for a slot
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+LLM_MAX_QUEUE = int(os.getenv("LLM_MAX_QUEUE", 32))
+LLM_QUEUE_DEADLINE_MS = int(os.getenv("LLM_QUEUE_DEADLINE_MS", 15000))
+LLM_PROBE_QUEUE_DEADLINE_MS = int(os.getenv("LLM_PROBE_QUEUE_DEADLINE_MS", 500))
+LLM_BACKGROUND_QUEUE_DEADLINE_MS = int(os.getenv("LLM_BACKGROUND_QUEUE_DEADLINE_MS", 120000))
+# Shared HTTP transport for LLM clients (keep-alive pool; HTTP/2 needs the h2 package)
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("HTTP_MAX_KEEPALIVE_CONNECTIONS", 20))
+HTTP_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_KEEPALIVE_EXPIRY_SECONDS", 60))
+HTTP_CONNECT_TIMEOUT_MS = int(os.getenv("HTTP_CONNECT_TIMEOUT_MS", 5000))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
 MAX_PAYLOAD_SIZE_BYTES = int(os.getenv("MAX_PAYLOAD_SIZE_BYTES", 1048576))
+SQL_ANALYSIS_CACHE_SIZE = int(os.getenv("SQL_ANALYSIS_CACHE_SIZE", 512))
+SQL_TRANSPILE_ENABLED = os.getenv("SQL_TRANSPILE_ENABLED", "true").lower() == "true"
+SQL_TRANSPILE_CACHE_SIZE = int(os.getenv("SQL_TRANSPILE_CACHE_SIZE", 512))
+SCHEMA_CATALOG_TTL_SECONDS = int(os.getenv("SCHEMA_CATALOG_TTL_SECONDS", 300))
+SCHEMA_CATALOG_RETRY_SECONDS = int(os.getenv("SCHEMA_CATALOG_RETRY_SECONDS", 30))
+SQL_COLUMN_CHECK_ENABLED = os.getenv("SQL_COLUMN_CHECK_ENABLED", "true").lower() == "true"
 
 # Redis cache
 CACHE_ENABLED = os.getenv("CACHE_ENABLED", "False").upper() == "TRUE"
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 600))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 20))
+CACHE_OP_TIMEOUT_MS = int(os.getenv("CACHE_OP_TIMEOUT_MS", 150))
+CACHE_HEALTH_PROBE_SECONDS = int(os.getenv("CACHE_HEALTH_PROBE_SECONDS", 15))
+# In-process tier in front of Redis (also the only tier when Redis is off)
+CACHE_LOCAL_ENABLED = os.getenv("CACHE_LOCAL_ENABLED", "true").lower() == "true"
+CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", 1024))
+CACHE_LOCAL_TTL_SECONDS = int(os.getenv("CACHE_LOCAL_TTL_SECONDS", 120))
+CACHE_NEGATIVE_TTL_SECONDS = int(os.getenv("CACHE_NEGATIVE_TTL_SECONDS", 5))
+
+# Semantic answer cache (paraphrased questions reuse validated SQL)
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_MIN_WORDS = int(os.getenv("SEMANTIC_CACHE_MIN_WORDS", 3))
+
+# Pre-LLM fast path: replay a saved correct run_sql when the question closely matches it
+MEMORY_FAST_PATH_ENABLED = os.getenv("MEMORY_FAST_PATH_ENABLED", "true").lower() == "true"
+MEMORY_FAST_PATH_THRESHOLD = float(os.getenv("MEMORY_FAST_PATH_THRESHOLD", 0.9))
+MEMORY_FAST_PATH_MARGIN = float(os.getenv("MEMORY_FAST_PATH_MARGIN", 0.03))
+
+# Embeddings: model loads lazily on first use; "onnx" runs it on ONNX Runtime (int8 when quantized)
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").lower()
+EMBEDDING_ONNX_QUANTIZED = os.getenv("EMBEDDING_ONNX_QUANTIZED", "true").lower() == "true"
+EMBEDDING_ONNX_FILE = os.getenv("EMBEDDING_ONNX_FILE", "")
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 64))
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() == "true"
+# >0 runs the model in that many worker processes; texts arriving within the window share a batch
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", 0))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", 5))
+# Shared service for several uvicorn workers: python -m app.agent.embedding_service
+EMBEDDING_SERVICE_URL = os.getenv("EMBEDDING_SERVICE_URL", "")
+EMBEDDING_SERVICE_HOST = os.getenv("EMBEDDING_SERVICE_HOST", "127.0.0.1")
+EMBEDDING_SERVICE_PORT = int(os.getenv("EMBEDDING_SERVICE_PORT", 8765))
+# Persistent float16 vectors keyed by (model, sha256(text)); survives chroma_db purges
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", str(DATA_DIR / "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200000))
+# Bulk training: documents embedded and upserted per batch
+TRAIN_BATCH_SIZE = int(os.getenv("TRAIN_BATCH_SIZE", 256))
+# Vector-store counts/DDL list are cached per training revision, and at most this long
+VECTOR_STATS_TTL_SECONDS = int(os.getenv("VECTOR_STATS_TTL_SECONDS", 30))
+# HNSW index of the training collections (size with scripts/benchmark_hnsw.py).
+# M and construction ef apply when a collection is created; search ef also to existing ones.
+VECTOR_HNSW_M = int(os.getenv("VECTOR_HNSW_M", 16))
+VECTOR_HNSW_CONSTRUCTION_EF = int(os.getenv("VECTOR_HNSW_CONSTRUCTION_EF", 100))
+VECTOR_HNSW_SEARCH_EF = int(os.getenv("VECTOR_HNSW_SEARCH_EF", 100))
+# Latency histograms per pipeline stage: relative bucket precision, sliding windows reported
+# by /api/metrics (seconds, comma-separated), window slot width and labelled series cap
+METRICS_HISTOGRAM_PRECISION = float(os.getenv("METRICS_HISTOGRAM_PRECISION", 0.02))
+METRICS_WINDOWS_SECONDS = [
+    int(w) for w in os.getenv("METRICS_WINDOWS_SECONDS", "60,300,900").split(",") if w.strip()
+]
+METRICS_SLOT_SECONDS = int(os.getenv("METRICS_SLOT_SECONDS", 10))
+METRICS_MAX_SERIES = int(os.getenv("METRICS_MAX_SERIES", 200))
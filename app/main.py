@@ -1,3 +1,4 @@
+import asyncio
 import os
 import sys
 from pathlib import Path
@@ -33,6 +34,9 @@ from app.middlewares.trace_context import TraceContextMiddleware
 from app.middlewares.slow_detector import SlowRequestMiddleware
 from app.middlewares.security_headers import SecurityHeadersMiddleware
 from app.agent.db import close_db
+from app.agent.embeddings import embedding_function
+from app.utils.cache import close_cache
+from app.utils.http_client import close_http_clients
 from app.config import (
     HOST,
     DEBUG,
@@ -43,6 +47,7 @@ from app.config import (
     RATE_LIMIT_MAX_REQUESTS,
     RATE_LIMIT_WINDOW_SECONDS,
     MAX_PAYLOAD_SIZE_BYTES,
+    EMBEDDING_WARMUP,
 )
 from app.runtime import update_runtime
 
@@ -138,10 +143,17 @@ def start():
     print(f"  DB Provider: {DB_PROVIDER} (status={db_status}, sqlite path={sqlite_note})")
 
     async def lifespan(app):
+        # Load the embedding model in the background; the server accepts connections meanwhile
+        warmup = asyncio.create_task(asyncio.to_thread(embedding_function.warm_up)) if EMBEDDING_WARMUP else None
         try:
             yield
         finally:
             close_db()
+            await close_cache()
+            await close_http_clients()
+            if warmup is not None and not warmup.done():
+                warmup.cancel()
+            embedding_function.close()
 
     server.create_app = lambda: app
     app.router.lifespan_context = asynccontextmanager(lifespan)
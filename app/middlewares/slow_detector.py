@@ -5,7 +5,7 @@ from fastapi import Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
 from app.utils.logger import setup_logger, log_perf
-from app.utils.metrics import increment_counter
+from app.utils.metrics import increment_counter, observe_latency
 
 
 SLOW_THRESHOLD_MS = int(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "2000"))
@@ -20,6 +20,15 @@ class SlowRequestMiddleware(BaseHTTPMiddleware):
         duration_ms = round((time.perf_counter() - start) * 1000, 2)
         if response.status_code >= 500:
             increment_counter("errors_total")
+        # Parameterised paths are labelled by their template so ids in URLs do not each become a series
+        route = request.scope.get("route")
+        if route is None:
+            route = "unmatched"
+        elif request.path_params:
+            route = getattr(route, "path", "unmatched")
+        else:
+            route = request.url.path
+        observe_latency("request", duration_ms, route=route)
         log_perf(
             logger,
             "http.request",
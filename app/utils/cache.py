@@ -1,68 +1,301 @@
+import asyncio
 import hashlib
 import json
-from typing import Any
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional
 
-import redis
+import redis.asyncio as aioredis
+from cachetools import TLRUCache
 
-from app.config import REDIS_HOST, REDIS_PORT, CACHE_TTL_SECONDS, CACHE_ENABLED
-from app.utils.logger import setup_logger
+from app.config import (
+    REDIS_HOST,
+    REDIS_PORT,
+    CACHE_TTL_SECONDS,
+    CACHE_ENABLED,
+    REDIS_MAX_CONNECTIONS,
+    CACHE_OP_TIMEOUT_MS,
+    CACHE_HEALTH_PROBE_SECONDS,
+    CACHE_LOCAL_ENABLED,
+    CACHE_LOCAL_MAX_ENTRIES,
+    CACHE_LOCAL_TTL_SECONDS,
+    CACHE_NEGATIVE_TTL_SECONDS,
+)
+from app.utils.helpers import normalize_question
+from app.utils.logger import setup_logger, log_perf
 
 logger = setup_logger(__name__)
 
-CACHE_AVAILABLE = False
-counters = {"cache_hit": 0, "cache_miss": 0, "cache_failures": 0}
+# Optimistic until the first failure; a failure hands recovery to the health probe
+CACHE_AVAILABLE = CACHE_ENABLED
+counters = {
+    "cache_hit": 0,
+    "cache_miss": 0,
+    "cache_failures": 0,
+    "cache_timeouts": 0,
+    "cache_recoveries": 0,
+    "local_hit": 0,
+    "local_negative_hit": 0,
+    "local_miss": 0,
+    "redis_hit": 0,
+    "redis_miss": 0,
+}
 
-_client = None
+_OP_TIMEOUT = CACHE_OP_TIMEOUT_MS / 1000
+_FAILED = object()
 
-if CACHE_ENABLED:
-    try:
-        _client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
-        _client.ping()
-        CACHE_AVAILABLE = True
-    except Exception as exc:
-        logger.info("cache.disabled", extra={"extra_data": {"reason": str(exc)}})
-        CACHE_AVAILABLE = False
-        _client = None
+_client: Optional[aioredis.Redis] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_probe_task: Optional[asyncio.Task] = None
+_disabled_reason: Optional[str] = None
+_disabled_at: Optional[float] = None
+
+# Local tier: entries are (value, ttl) so each key expires on its own schedule.
+# _NEGATIVE marks a key recently confirmed absent, skipping the Redis probe.
+_NEGATIVE = object()
+_local = TLRUCache(
+    maxsize=max(CACHE_LOCAL_MAX_ENTRIES, 1),
+    ttu=lambda _key, entry, now: now + entry[1],
+    timer=time.monotonic,
+)
+_local_lock = threading.Lock()
+
+
+def cache_enabled() -> bool:
+    """True when at least one tier can serve lookups."""
+    return CACHE_ENABLED or CACHE_LOCAL_ENABLED
+
+
+CACHE_KEY_PREFIX = "vanna_cache:v2"
+
+
+def access_scope(groups: Iterable[str]) -> str:
+    """Users with the same group memberships may share cached answers."""
+    return hashlib.sha256(",".join(sorted(set(groups or []))).encode("utf-8")).hexdigest()[:12]
+
+
+def make_cache_key(question: str, context_version: str, model: str, scope: str, turn_state: str = ""):
+    """
+    Key = model + context version + access scope + normalized question (+ the
+    tool-loop state of the turn). Bumping the context version orphans old
+    keys, which then expire by TTL; nothing has to be scanned or deleted.
+    """
+    digest = hashlib.sha256(f"{normalize_question(question)}\x1f{turn_state}".encode("utf-8")).hexdigest()
+    return f"{CACHE_KEY_PREFIX}:{model}:{context_version}:{scope}:{digest}"
 
 
-def make_cache_key(user_id: str, question: str, ddl_context: str, conversation_id: str):
-    digest = hashlib.sha256(f"{question}{ddl_context}{conversation_id}".encode("utf-8")).hexdigest()
-    return f"vanna_cache:{user_id}:{digest}"
+def _get_client() -> aioredis.Redis:
+    """
+    Lazily build the client on the running loop. Connections are bound to the
+    loop that opened them, so a new loop (tests, reloads) gets a fresh pool.
+    The pool is bounded and blocks for at most the op timeout when exhausted.
+    """
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        pool = aioredis.BlockingConnectionPool(
+            host=REDIS_HOST,
+            port=REDIS_PORT,
+            max_connections=REDIS_MAX_CONNECTIONS,
+            timeout=_OP_TIMEOUT,
+            socket_timeout=_OP_TIMEOUT,
+            socket_connect_timeout=_OP_TIMEOUT,
+            decode_responses=True,
+        )
+        _client = aioredis.Redis(connection_pool=pool)
+        _client_loop = loop
+    return _client
 
 
-def get_cached_response(key: str):
-    if not (CACHE_ENABLED and CACHE_AVAILABLE and _client):
+def _usable() -> bool:
+    return CACHE_ENABLED and CACHE_AVAILABLE
+
+
+def _local_get(key: str):
+    """Return the local entry value, _NEGATIVE, or None when the key is not held locally."""
+    if not CACHE_LOCAL_ENABLED:
         return None
+    with _local_lock:
+        entry = _local.get(key)
+    return entry[0] if entry is not None else None
+
+
+def _local_set(key: str, value: Any, ttl: float) -> None:
+    if not CACHE_LOCAL_ENABLED or ttl <= 0:
+        return
+    with _local_lock:
+        _local[key] = (value, ttl)
+
+
+def _local_ttl(ttl: int) -> int:
+    # Bound staleness across workers while Redis is the source of truth
+    return min(ttl, CACHE_LOCAL_TTL_SECONDS) if _usable() else ttl
+
+
+async def _run(op):
+    """Run one Redis operation under the per-op timeout; failures disable the cache."""
     try:
-        raw = _client.get(key)
-        if not raw:
-            counters["cache_miss"] += 1
-            return None
-        counters["cache_hit"] += 1
-        return json.loads(raw)
+        return await asyncio.wait_for(op(_get_client()), timeout=_OP_TIMEOUT)
+    except asyncio.TimeoutError:
+        counters["cache_timeouts"] += 1
+        counters["cache_failures"] += 1
+        _auto_disable(TimeoutError(f"cache operation exceeded {CACHE_OP_TIMEOUT_MS}ms"))
     except Exception as exc:
         counters["cache_failures"] += 1
         _auto_disable(exc)
-        return None
+    return _FAILED
 
 
-def set_cached_response(key: str, value: Any, ttl: int = CACHE_TTL_SECONDS):
-    if not (CACHE_ENABLED and CACHE_AVAILABLE and _client):
+def _decode(raw: Optional[str]):
+    if not raw:
         return None
     try:
-        _client.setex(key, ttl, json.dumps(value))
-    except Exception as exc:
+        return json.loads(raw)
+    except ValueError:
         counters["cache_failures"] += 1
-        _auto_disable(exc)
         return None
 
 
-def _auto_disable(exc: Exception):
-    global CACHE_AVAILABLE
+def _probe_local(key: str):
+    """Returns (handled, value): handled is True when the local tier answered."""
+    local = _local_get(key)
+    if local is _NEGATIVE:
+        counters["local_negative_hit"] += 1
+        counters["cache_miss"] += 1
+        return True, None
+    if local is not None:
+        counters["local_hit"] += 1
+        counters["cache_hit"] += 1
+        return True, local
+    counters["local_miss"] += 1
+    return False, None
+
+
+def _record_remote(key: str, value: Any) -> None:
+    if value is None:
+        counters["redis_miss"] += 1
+        counters["cache_miss"] += 1
+        _local_set(key, _NEGATIVE, CACHE_NEGATIVE_TTL_SECONDS)
+        return
+    counters["redis_hit"] += 1
+    counters["cache_hit"] += 1
+    _local_set(key, value, CACHE_LOCAL_TTL_SECONDS)
+
+
+async def get_cached_response(key: str):
+    """
+    Local tier first, then Redis. Values returned from the local tier are
+    shared objects; callers must treat them as read-only.
+    """
+    handled, value = _probe_local(key)
+    if handled:
+        return value
+    if not _usable():
+        counters["cache_miss"] += 1
+        return None
+    raw = await _run(lambda client: client.get(key))
+    if raw is _FAILED:
+        counters["cache_miss"] += 1
+        return None
+    value = _decode(raw)
+    _record_remote(key, value)
+    return value
+
+
+async def set_cached_response(key: str, value: Any, ttl: int = CACHE_TTL_SECONDS):
+    _local_set(key, value, _local_ttl(ttl))
+    if not _usable():
+        return None
+    payload = json.dumps(value)
+    await _run(lambda client: client.set(key, payload, ex=ttl))
+    return None
+
+
+def clear_local_cache() -> None:
+    with _local_lock:
+        _local.clear()
+
+
+def _auto_disable(exc: BaseException):
+    global CACHE_AVAILABLE, _disabled_reason, _disabled_at
     if CACHE_AVAILABLE:
         CACHE_AVAILABLE = False
-        logger.info("cache.auto_disabled", extra={"extra_data": {"reason": str(exc)}})
+        _disabled_reason = str(exc) or exc.__class__.__name__
+        _disabled_at = time.time()
+        logger.info("cache.auto_disabled", extra={"extra_data": {"reason": _disabled_reason}})
+    _start_probe()
+
+
+def _start_probe():
+    global _probe_task
+    if _probe_task is not None and not _probe_task.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _probe_task = loop.create_task(_health_probe())
+
+
+async def _health_probe():
+    """Ping Redis in the background until it answers, then re-enable the cache."""
+    global CACHE_AVAILABLE, _disabled_reason, _disabled_at
+    attempts = 0
+    while not CACHE_AVAILABLE:
+        await asyncio.sleep(CACHE_HEALTH_PROBE_SECONDS)
+        attempts += 1
+        try:
+            await asyncio.wait_for(_get_client().ping(), timeout=_OP_TIMEOUT)
+        except Exception:
+            continue
+        CACHE_AVAILABLE = True
+        counters["cache_recoveries"] += 1
+        log_perf(
+            logger,
+            "cache.recovered",
+            {"attempts": attempts, "down_seconds": round(time.time() - (_disabled_at or time.time()), 2)},
+        )
+        _disabled_reason = None
+        _disabled_at = None
+
+
+async def close_cache():
+    global _client, _client_loop, _probe_task
+    if _probe_task is not None:
+        _probe_task.cancel()
+        _probe_task = None
+    if _client is not None:
+        try:
+            await _client.aclose()
+        except Exception:
+            pass
+    _client = None
+    _client_loop = None
 
 
-def cache_stats():
-    return {**counters, "enabled": CACHE_ENABLED, "available": CACHE_AVAILABLE}
+def cache_stats() -> Dict[str, Any]:
+    with _local_lock:
+        local_size = len(_local)
+    return {
+        **counters,
+        "enabled": CACHE_ENABLED,
+        "available": CACHE_AVAILABLE,
+        "disabled_reason": _disabled_reason,
+        "probing": _probe_task is not None and not _probe_task.done(),
+        "tiers": {
+            "local": {
+                "enabled": CACHE_LOCAL_ENABLED,
+                "size": local_size,
+                "maxsize": _local.maxsize,
+                "hits": counters["local_hit"],
+                "negative_hits": counters["local_negative_hit"],
+                "misses": counters["local_miss"],
+            },
+            "redis": {
+                "enabled": CACHE_ENABLED,
+                "available": CACHE_AVAILABLE,
+                "hits": counters["redis_hit"],
+                "misses": counters["redis_miss"],
+            },
+        },
+    }
@@ -1,2 +1,56 @@
+import re
+
+
 def normalize_text(s: str) -> str:
     return s.strip().lower()
+
+
+def normalize_question(question: str) -> str:
+    """Case/whitespace/trailing-punctuation insensitive form of a user question."""
+    text = re.sub(r"\s+", " ", (question or "").strip().lower())
+    return text.rstrip("?.!; ")
+
+
+_NUMBER = re.compile(r"\d+(?:[.,:/-]\d+)*")
+_QUOTED = re.compile(r"(?<!\w)'([^']+)'(?!\w)|\"([^\"]+)\"")
+_WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+NUMBER_WORDS = {
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten",
+    "eleven", "twelve", "fifteen", "twenty", "thirty", "fifty", "hundred", "thousand", "million",
+    "first", "second", "third", "last", "half", "quarter", "dozen",
+}
+NEGATION_WORDS = {"not", "no", "never", "none", "nor", "neither", "without", "except", "excluding", "exclude", "non"}
+NEGATION_PREFIXES = ("non", "un", "in", "im", "il", "ir", "dis")
+
+
+def _literal_parts(question: str):
+    text = (question or "").lower()
+    quoted = frozenset(a or b for a, b in _QUOTED.findall(text))
+    numbers = frozenset(n.replace(",", "") for n in _NUMBER.findall(text))
+    words = set(_WORD.findall(text))
+    negations = frozenset(
+        "not" if w.endswith("n't") else w for w in words if w in NEGATION_WORDS or w.endswith("n't")
+    )
+    return quoted, numbers | (words & NUMBER_WORDS), negations, words
+
+
+def _negated_form(words: set, others: set) -> bool:
+    """True when a word is a prefix-negated form of a word in the other question ("inactive"/"active")."""
+    return any(
+        word.startswith(prefix) and word[len(prefix) :] in others
+        for word in words - others
+        for prefix in NEGATION_PREFIXES
+    )
+
+
+def same_literals(a: str, b: str) -> bool:
+    """
+    Whether two similar questions ask for the same values: numbers, quoted literals and
+    negations must match exactly. Fuzzy similarity scores cannot tell "top 5" from
+    "top 10", or "inactive users" from "active users".
+    """
+    quoted_a, numbers_a, negations_a, words_a = _literal_parts(a)
+    quoted_b, numbers_b, negations_b, words_b = _literal_parts(b)
+    if (quoted_a, numbers_a, negations_a) != (quoted_b, numbers_b, negations_b):
+        return False
+    return not (_negated_form(words_a, words_b) or _negated_form(words_b, words_a))
@@ -0,0 +1,79 @@
+"""
+Process-wide HTTP transport.
+Every LLM-facing client shares one tuned httpx pool, so connections (and TLS
+sessions) to a provider are reused across requests instead of each client
+opening its own. The async client is bound to the loop that created it; the
+sync client backs the legacy, synchronous Vanna code paths.
+"""
+
+import asyncio
+from typing import Optional
+
+import httpx
+
+from app.config import (
+    HTTP2_ENABLED,
+    HTTP_CONNECT_TIMEOUT_MS,
+    HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    HTTP_MAX_CONNECTIONS,
+    HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_TIMEOUT_MS,
+)
+from app.utils.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+_async_client: Optional[httpx.AsyncClient] = None
+_async_client_loop: Optional[asyncio.AbstractEventLoop] = None
+_sync_client: Optional[httpx.Client] = None
+
+
+def _http2() -> bool:
+    if not HTTP2_ENABLED:
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        logger.warning("HTTP2_ENABLED is set but the h2 package is missing; using HTTP/1.1")
+        return False
+    return True
+
+
+def _client_options() -> dict:
+    connect = HTTP_CONNECT_TIMEOUT_MS / 1000
+    return {
+        "http2": _http2(),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+        "timeout": httpx.Timeout(LLM_TIMEOUT_MS / 1000, connect=connect, pool=connect),
+    }
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Shared async client for the running loop; a new loop (tests, reloads) gets a fresh pool."""
+    global _async_client, _async_client_loop
+    loop = asyncio.get_running_loop()
+    if _async_client is None or _async_client.is_closed or _async_client_loop is not loop:
+        _async_client = httpx.AsyncClient(**_client_options())
+        _async_client_loop = loop
+    return _async_client
+
+
+def get_sync_http_client() -> httpx.Client:
+    global _sync_client
+    if _sync_client is None or _sync_client.is_closed:
+        _sync_client = httpx.Client(**_client_options())
+    return _sync_client
+
+
+async def close_http_clients() -> None:
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
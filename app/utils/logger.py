@@ -1,16 +1,11 @@
 import json
 import logging
-from collections import deque
 from contextvars import ContextVar
-from typing import Dict, Any, Deque
+from typing import Dict, Any
 
 from uuid import uuid4
 
 PERF_HISTORY = 50
-perf_snapshot: Dict[str, Deque[float]] = {
-    "llm_ms": deque(maxlen=PERF_HISTORY),
-    "sql_ms": deque(maxlen=PERF_HISTORY),
-}
 
 trace_id_ctx: ContextVar[str | None] = ContextVar("trace_id", default=None)
 span_id_ctx: ContextVar[str | None] = ContextVar("span_id", default=None)
@@ -56,11 +51,6 @@ def log_perf(logger: logging.Logger, event: str, data: Dict[str, Any]):
     logger.info(event, extra={"extra_data": {"event": event, **safe}})
 
 
-def record_perf_sample(kind: str, duration_ms: float):
-    if kind in perf_snapshot:
-        perf_snapshot[kind].append(duration_ms)
-
-
 def set_trace_context(trace_id: str | None = None, span_id: str | None = None):
     if trace_id is None:
         trace_id = str(uuid4())
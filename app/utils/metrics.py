@@ -1,3 +1,29 @@
+"""
+Process-wide counters and latency histograms.
+
+Latencies go into log-bucketed histograms (HDR-style): bucket bounds grow
+by a factor of 1 + METRICS_HISTOGRAM_PRECISION, so memory is fixed by the
+value range, not the sample count, and any reported percentile is within
+that relative error of the true one. Each series keeps one histogram per
+METRICS_SLOT_SECONDS slot, merged on read into sliding windows (accurate to
+one slot), plus a lifetime total. Series are keyed by stage and optional
+labels (provider, model, route); labelled series are capped so a noisy
+label cannot grow memory without bound.
+"""
+
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import (
+    METRICS_HISTOGRAM_PRECISION,
+    METRICS_MAX_SERIES,
+    METRICS_SLOT_SECONDS,
+    METRICS_WINDOWS_SECONDS,
+)
+
 _metrics = {
     "requests_total": 0,
     "errors_total": 0,
@@ -10,3 +36,195 @@ def increment_counter(name: str, amount: int = 1):
 
 def get_metrics_snapshot():
     return dict(_metrics)
+
+
+PERCENTILES = (("p50", 0.50), ("p90", 0.90), ("p99", 0.99))
+# Smallest and largest distinguishable latencies, in ms; values outside are clamped
+_LOWEST_MS = 0.01
+_HIGHEST_MS = 3_600_000.0
+
+
+class LogHistogram:
+    def __init__(self, precision: float = METRICS_HISTOGRAM_PRECISION):
+        self.precision = precision
+        self._log_growth = math.log1p(precision)
+        self._top = int(math.ceil(math.log(_HIGHEST_MS / _LOWEST_MS) / self._log_growth))
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def _bucket(self, value: float) -> int:
+        if value <= _LOWEST_MS:
+            return 0
+        return min(int(math.ceil(math.log(value / _LOWEST_MS) / self._log_growth)), self._top)
+
+    def _value(self, bucket: int) -> float:
+        # Geometric middle of the bucket: at most half the precision away from any member
+        return _LOWEST_MS * math.exp((bucket - 0.5) * self._log_growth) if bucket else _LOWEST_MS
+
+    def record(self, value: float) -> None:
+        bucket = self._bucket(value)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "LogHistogram") -> None:
+        for bucket, n in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + n
+        self.count += other.count
+        self.total += other.total
+        if other.count:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(q * self.count))
+        if rank >= self.count:
+            return self.max
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                # Never report outside what was actually observed
+                return min(max(self._value(bucket), self.min), self.max)
+        return self.max
+
+    def summary(self) -> dict:
+        out = {"count": self.count}
+        for name, q in PERCENTILES:
+            value = self.percentile(q)
+            out[name] = round(value, 2) if value is not None else None
+        out["max"] = round(self.max, 2) if self.max is not None else None
+        out["mean"] = round(self.total / self.count, 2) if self.count else None
+        return out
+
+
+class LatencySeries:
+    """One stage/label combination: per-slot histograms for the windows plus a lifetime total."""
+
+    def __init__(
+        self,
+        windows: List[int] = METRICS_WINDOWS_SECONDS,
+        slot_seconds: int = METRICS_SLOT_SECONDS,
+        precision: float = METRICS_HISTOGRAM_PRECISION,
+    ):
+        self.windows = sorted(windows)
+        self.slot_seconds = max(slot_seconds, 1)
+        self.precision = precision
+        self._keep = max(math.ceil(max(self.windows, default=0) / self.slot_seconds), 1)
+        self._slots: Deque[Tuple[int, LogHistogram]] = deque()
+        self.lifetime = LogHistogram(precision)
+
+    def _slot(self, now: float) -> int:
+        return int(now // self.slot_seconds)
+
+    def observe(self, value: float, now: float) -> None:
+        slot = self._slot(now)
+        if not self._slots or self._slots[-1][0] != slot:
+            self._slots.append((slot, LogHistogram(self.precision)))
+            while self._slots[0][0] <= slot - self._keep:
+                self._slots.popleft()
+        self._slots[-1][1].record(value)
+        self.lifetime.record(value)
+
+    def window(self, seconds: int, now: float) -> LogHistogram:
+        oldest = self._slot(now) - math.ceil(seconds / self.slot_seconds)
+        merged = LogHistogram(self.precision)
+        for slot, histogram in self._slots:
+            if slot > oldest:
+                merged.merge(histogram)
+        return merged
+
+    def summary(self, now: float) -> dict:
+        return {
+            "windows": {f"{w}s": self.window(w, now).summary() for w in self.windows},
+            "lifetime": self.lifetime.summary(),
+        }
+
+
+class LatencyRegistry:
+    def __init__(
+        self,
+        windows: List[int] = METRICS_WINDOWS_SECONDS,
+        slot_seconds: int = METRICS_SLOT_SECONDS,
+        precision: float = METRICS_HISTOGRAM_PRECISION,
+        max_series: int = METRICS_MAX_SERIES,
+        clock=time.monotonic,
+    ):
+        self.windows = sorted(windows)
+        self.slot_seconds = slot_seconds
+        self.precision = precision
+        self.max_series = max_series
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, tuple], LatencySeries] = {}
+        self._labelled = 0
+        self.dropped_series = 0
+
+    def _new_series(self) -> LatencySeries:
+        return LatencySeries(self.windows, self.slot_seconds, self.precision)
+
+    def observe(self, stage: str, duration_ms: float, **labels) -> None:
+        """Records into the stage's overall series and, with labels, into the labelled one."""
+        key = tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+        now = self._clock()
+        with self._lock:
+            overall = self._series.get((stage, ()))
+            if overall is None:
+                overall = self._series[(stage, ())] = self._new_series()
+            overall.observe(duration_ms, now)
+            if not key:
+                return
+            series = self._series.get((stage, key))
+            if series is None:
+                if self._labelled >= self.max_series:
+                    self.dropped_series += 1
+                    return
+                series = self._series[(stage, key)] = self._new_series()
+                self._labelled += 1
+            series.observe(duration_ms, now)
+
+    def stage_summary(self, stage: str, window: Optional[int] = None) -> dict:
+        """Percentiles of one stage over all labels, for the given window (default: the shortest)."""
+        window = window or (self.windows[0] if self.windows else None)
+        with self._lock:
+            series = self._series.get((stage, ()))
+            if series is None:
+                return LogHistogram(self.precision).summary()
+            histogram = series.window(window, self._clock()) if window else series.lifetime
+            return histogram.summary()
+
+    def snapshot(self) -> dict:
+        now = self._clock()
+        stages: Dict[str, dict] = {}
+        with self._lock:
+            for (stage, labels), series in sorted(self._series.items()):
+                entry = stages.setdefault(stage, {"series": []})
+                if labels:
+                    entry["series"].append({"labels": dict(labels), **series.summary(now)})
+                else:
+                    entry.update(series.summary(now))
+        return {"stages": stages, "dropped_series": self.dropped_series, "precision": self.precision}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+            self._labelled = 0
+            self.dropped_series = 0
+
+
+latency_metrics = LatencyRegistry()
+
+
+def observe_latency(stage: str, duration_ms: float, **labels) -> None:
+    latency_metrics.observe(stage, duration_ms, **labels)
+
+
+def get_latency_snapshot() -> dict:
+    return latency_metrics.snapshot()
@@ -0,0 +1,77 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls that share a key into one upstream call.
+    The upstream call runs in its own task, so a cancelled caller never
+    cancels it for the others; it is only cancelled once every caller waiting
+    on it has gone away.
+
+    Streams cannot be shared through do(): the leader has to yield its chunks
+    as they arrive. publisher() hands out one future per key instead; the
+    leader streams and publish()es the finished result (or None if it did
+    not complete), and followers await the future and replay it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._published: Dict[Hashable, asyncio.Future] = {}
+        self.counters = {"leaders": 0, "coalesced": 0, "abandoned": 0, "errors": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, shared); shared is True when another caller's upstream call was joined."""
+        call = self._calls.get(key)
+        shared = call is not None
+        if call is None:
+            call = _Call(asyncio.get_running_loop().create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task, key=key, call=call: self._finish(key, call))
+            self.counters["leaders"] += 1
+        else:
+            self.counters["coalesced"] += 1
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task), shared
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Every caller gave up; stop the upstream call
+                call.task.cancel()
+                self.counters["abandoned"] += 1
+
+    def publisher(self, key: Hashable) -> Tuple[asyncio.Future, bool]:
+        """Returns (future, leader); only the leader must publish() to the future."""
+        future = self._published.get(key)
+        if future is not None:
+            self.counters["coalesced"] += 1
+            return future, False
+        future = asyncio.get_running_loop().create_future()
+        self._published[key] = future
+        self.counters["leaders"] += 1
+        return future, True
+
+    def publish(self, key: Hashable, future: asyncio.Future, result: Any) -> None:
+        if self._published.get(key) is future:
+            del self._published[key]
+        if not future.done():
+            future.set_result(result)
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled() and call.task.exception() is not None:
+            self.counters["errors"] += 1
+
+    def stats(self) -> dict:
+        return {**self.counters, "in_flight": len(self._calls) + len(self._published)}
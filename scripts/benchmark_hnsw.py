@@ -0,0 +1,171 @@
+"""
+HNSW recall/latency benchmark for the Chroma training collections.
+
+Builds synthetic collections (clustered, L2-normalized vectors in cosine
+space, like sentence embeddings), measures recall@k of Chroma's HNSW search
+against exact NumPy brute force, plus per-query latency percentiles, over a
+grid of M / construction ef / search ef. It then recommends the fastest
+setting that reaches the target recall, as VECTOR_HNSW_* env values.
+
+    python scripts/benchmark_hnsw.py --sizes 10000,100000 --k 10
+    python scripts/benchmark_hnsw.py --sizes 1000000 --m 16,32 --ef-search 50,100,200 --json out.json
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import chromadb
+from chromadb.config import Settings
+
+from app.agent.implementation import hnsw_configuration
+
+
+def _ints(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def synthetic_vectors(n: int, dim: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Clustered unit vectors; real embeddings are far from uniformly spread."""
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    out = np.empty((n, dim), dtype=np.float32)
+    for start in range(0, n, 100_000):
+        size = min(100_000, n - start)
+        chunk = centers[rng.integers(0, clusters, size)] + 0.35 * rng.standard_normal((size, dim)).astype(np.float32)
+        out[start : start + size] = chunk / np.linalg.norm(chunk, axis=1, keepdims=True)
+    return out
+
+
+def brute_force_top_k(data: np.ndarray, queries: np.ndarray, k: int, chunk: int = 100_000) -> np.ndarray:
+    """Exact top-k ids by cosine similarity (dot product of unit vectors), scanning data in chunks."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, len(data), chunk):
+        scores = queries @ data[start : start + chunk].T
+        ids = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_ids = np.concatenate([best_ids, ids], axis=1)
+        top = np.argpartition(-merged_scores, k - 1, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, top, axis=1)
+        best_ids = np.take_along_axis(merged_ids, top, axis=1)
+    return best_ids
+
+
+def recall_at_k(found: List[List[int]], truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t.tolist())) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def build_collection(client, name: str, data: np.ndarray, m: int, ef_construction: int, ef_search: int):
+    client.get_or_create_collection(name=name)  # ensure a clean slate on reruns
+    client.delete_collection(name)
+    configuration = hnsw_configuration(m, ef_construction, ef_search)
+    configuration["hnsw"]["space"] = "cosine"
+    collection = client.create_collection(name=name, configuration=configuration, embedding_function=None)
+    batch = client.get_max_batch_size()
+    for start in range(0, len(data), batch):
+        end = min(start + batch, len(data))
+        collection.add(ids=[str(i) for i in range(start, end)], embeddings=data[start:end])
+    return collection
+
+
+def measure(collection, queries: np.ndarray, k: int, warmup: int = 10):
+    for q in queries[:warmup]:
+        collection.query(query_embeddings=[q], n_results=k, include=[])
+    found, latencies = [], []
+    for q in queries:
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[q], n_results=k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append([int(i) for i in result["ids"][0]])
+    return found, np.array(latencies)
+
+
+def recommend(rows: List[Dict], target_recall: float) -> Optional[Dict]:
+    """Lowest p99 among settings meeting the target; otherwise the most accurate one."""
+    meeting = [r for r in rows if r["recall"] >= target_recall]
+    if meeting:
+        return min(meeting, key=lambda r: (r["p99_ms"], r["M"], r["ef_construction"]))
+    return max(rows, key=lambda r: (r["recall"], -r["p99_ms"])) if rows else None
+
+
+def run(args) -> List[Dict]:
+    rng = np.random.default_rng(args.seed)
+    path = args.path or tempfile.mkdtemp(prefix="hnsw-bench-")
+    client = chromadb.PersistentClient(path=path, settings=Settings(anonymized_telemetry=False))
+    rows: List[Dict] = []
+    for size in _ints(args.sizes):
+        print(f"\n== {size:,} items, dim {args.dim}, {args.queries} queries, k={args.k}")
+        data = synthetic_vectors(size, args.dim, args.clusters, rng)
+        queries = synthetic_vectors(args.queries, args.dim, args.clusters, rng)
+        truth = brute_force_top_k(data, queries, args.k)
+        size_rows = []
+        for m in _ints(args.m):
+            for ef_construction in _ints(args.ef_construction):
+                start = time.perf_counter()
+                collection = build_collection(client, f"bench-{size}-{m}-{ef_construction}", data, m, ef_construction, 100)
+                build_s = time.perf_counter() - start
+                for ef_search in _ints(args.ef_search):
+                    collection.modify(configuration={"hnsw": {"ef_search": ef_search}})
+                    found, latencies = measure(collection, queries, args.k)
+                    row = {
+                        "size": size,
+                        "M": m,
+                        "ef_construction": ef_construction,
+                        "ef_search": ef_search,
+                        "recall": round(recall_at_k(found, truth), 4),
+                        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+                        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+                        "build_s": round(build_s, 1),
+                    }
+                    size_rows.append(row)
+                    print(
+                        f"M={m:<3} efC={ef_construction:<4} efS={ef_search:<4} "
+                        f"recall@{args.k}={row['recall']:.4f}  p50={row['p50_ms']:.2f}ms  "
+                        f"p95={row['p95_ms']:.2f}ms  p99={row['p99_ms']:.2f}ms  build={row['build_s']}s"
+                    )
+                client.delete_collection(collection.name)
+        best = recommend(size_rows, args.target_recall)
+        if best:
+            verdict = "meets" if best["recall"] >= args.target_recall else "does NOT meet"
+            print(
+                f"Recommended for {size:,} items ({verdict} recall {args.target_recall}): "
+                f"VECTOR_HNSW_M={best['M']} VECTOR_HNSW_CONSTRUCTION_EF={best['ef_construction']} "
+                f"VECTOR_HNSW_SEARCH_EF={best['ef_search']}"
+            )
+        rows.extend(size_rows)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="HNSW recall/latency benchmark against NumPy brute force")
+    parser.add_argument("--sizes", default="10000,100000", help="Comma-separated collection sizes")
+    parser.add_argument("--dim", type=int, default=384, help="Vector dimension (all-MiniLM-L6-v2: 384)")
+    parser.add_argument("--clusters", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--m", default="16,32", help="HNSW M values")
+    parser.add_argument("--ef-construction", default="100,200")
+    parser.add_argument("--ef-search", default="10,20,50,100,200")
+    parser.add_argument("--target-recall", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--path", help="Chroma directory for the benchmark collections (default: a temp dir)")
+    parser.add_argument("--json", help="Write all result rows to this file")
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"Results written to {args.json}")
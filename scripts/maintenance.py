@@ -1,4 +1,5 @@
 import shutil
+import sys
 import zipfile
 from pathlib import Path
 
@@ -29,6 +30,16 @@ def refresh_chroma():
     purge_chroma()
 
 
+def sync_schema(prune: bool = False):
+    """Incremental alternative to refresh: re-embed only objects whose DDL changed."""
+    scripts_dir = str(Path(__file__).resolve().parent)
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+    from train_local import main as train_main
+
+    train_main(sync=True, prune=prune)
+
+
 if __name__ == "__main__":
     import argparse
 
@@ -36,9 +47,13 @@ if __name__ == "__main__":
     parser.add_argument("--backup", action="store_true", help="Create a zip backup of chroma_db")
     parser.add_argument("--purge", action="store_true", help="Delete and recreate chroma_db")
     parser.add_argument("--refresh", action="store_true", help="Backup then purge chroma_db")
+    parser.add_argument("--sync", action="store_true", help="Incrementally sync schema DDL into chroma_db")
+    parser.add_argument("--prune", action="store_true", help="With --sync, delete DDL not matching any object")
     args = parser.parse_args()
 
-    if args.refresh:
+    if args.sync:
+        sync_schema(prune=args.prune)
+    elif args.refresh:
         p = backup_chroma()
         purge_chroma()
         print(f"Refreshed. Backup: {p}")
@@ -10,6 +10,13 @@ import sys
 from pathlib import Path
 from typing import List
 
+# Ensure project root on sys.path
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from app.agent.oracle_ddl import extract_oracle_ddl
+
 DB_PROVIDER = os.getenv("DB_PROVIDER", "sqlite").lower()
 DB_SQLITE = os.getenv("SQLITE_DB", str(Path(__file__).resolve().parent.parent / "app" / "data" / "mydb.db"))
 DB_ORACLE_DSN = os.getenv("DB_ORACLE_DSN", "")
@@ -38,28 +45,12 @@ def fetch_oracle_ddl(dsn: str, user: str, password: str) -> List[str]:
         print("oracledb not installed, skipping Oracle DDL fetch:", e, file=sys.stderr)
         return []
 
-    ddl = []
     try:
-        conn = oracledb.connect(user=user, password=password, dsn=dsn)
-    except Exception as e:
-        print("Oracle connection failed; cannot fetch DDL:", e, file=sys.stderr)
-        return []
-
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT DBMS_METADATA.GET_DDL('TABLE', table_name) FROM user_tables")
-        for row in cur:
-            if row and row[0]:
-                ddl.append(str(row[0]))
+        ddl = extract_oracle_ddl(lambda: oracledb.connect(user=user, password=password, dsn=dsn), user, ["TABLE"])
     except Exception as e:
         print("Oracle DDL fetch error:", e, file=sys.stderr)
-    finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
-        conn.close()
-    return ddl
+        return []
+    return list(ddl.values())
 
 
 def load_vanna():
@@ -9,6 +9,7 @@ import sys
 from pathlib import Path
 from typing import List
 
+from app.agent.oracle_ddl import extract_oracle_ddl
 from app.config import (
     DB_PROVIDER,
     DB_SQLITE,
@@ -39,28 +40,12 @@ def fetch_oracle_ddl(dsn: str, user: str, password: str) -> List[str]:
         print("oracledb not installed, skipping Oracle DDL fetch:", e, file=sys.stderr)
         return []
 
-    ddl = []
-    try:
-        conn = oracledb.connect(user=user, password=password, dsn=dsn)
-    except Exception as e:
-        print("Oracle connection failed; cannot fetch DDL:", e, file=sys.stderr)
-        return []
-
     try:
-        cur = conn.cursor()
-        cur.execute("SELECT DBMS_METADATA.GET_DDL('TABLE', table_name) FROM user_tables")
-        for row in cur:
-            if row and row[0]:
-                ddl.append(str(row[0]))
+        ddl = extract_oracle_ddl(lambda: oracledb.connect(user=user, password=password, dsn=dsn), user, ["TABLE"])
     except Exception as e:
         print("Oracle DDL fetch error:", e, file=sys.stderr)
-    finally:
-        try:
-            cur.close()
-        except Exception:
-            pass
-        conn.close()
-    return ddl
+        return []
+    return list(ddl.values())
 
 
 def load_vanna():
@@ -1,3 +1,4 @@
+import argparse
 import sys
 from pathlib import Path
 
@@ -6,7 +7,9 @@ ROOT = Path(__file__).resolve().parents[1]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from app.agent.catalog import normalize_object_types
 from app.agent.implementation import LocalVanna
+from app.agent.oracle_ddl import extract_oracle_ddl
 from app.config import (
     DB_PROVIDER,
     DB_SQLITE,
@@ -32,17 +35,43 @@ def _build_vanna():
     return LocalVanna(config=cfg)
 
 
-def _train_sqlite(vn: LocalVanna):
+def _print_progress(done: int, total: int) -> None:
+    print(f"  trained {done}/{total}", flush=True)
+
+
+def _train_ddl(vn: LocalVanna, objects: dict, sync: bool, prune: bool) -> None:
+    if not sync:
+        stats = vn.train_bulk(ddl=list(objects.values()), progress=_print_progress)
+        print(f"Added {stats['added']}, already present {stats['skipped']} (of {stats['total']}).")
+        return
+    diff = vn.sync_ddl(objects, prune_untracked=prune, progress=_print_progress)
+    print(format_sync_summary(diff))
+
+
+def format_sync_summary(diff: dict) -> str:
+    lines = [
+        f"Schema sync: {len(diff['added'])} added, {len(diff['updated'])} updated, "
+        f"{len(diff['deleted'])} deleted, {diff['unchanged']} unchanged"
+        + (f", {diff['pruned']} untracked pruned" if diff.get("pruned") else "")
+    ]
+    for mark, key in (("+", "added"), ("~", "updated"), ("-", "deleted")):
+        lines.extend(f"  {mark} {name}" for name in diff[key])
+    return "\n".join(lines)
+
+
+def _sqlite_ddl(vn: LocalVanna) -> dict:
     vn.connect_to_sqlite(DB_SQLITE)
+    df_ddl = vn.run_sql("SELECT type, name, sql FROM sqlite_master WHERE sql IS NOT NULL")
+    return {f"{row.type.upper()} {row.name}": row.sql for row in df_ddl.itertuples()}
+
+
+def _train_sqlite(vn: LocalVanna, sync: bool = False, prune: bool = False):
     print("Starting SQLite training...")
-    df_ddl = vn.run_sql("SELECT type, sql FROM sqlite_master WHERE sql IS NOT NULL")
-    for ddl in df_ddl["sql"].to_list():
-        print(f"Training on: {ddl[:50]}...")
-        vn.train(ddl=ddl)
+    _train_ddl(vn, _sqlite_ddl(vn), sync, prune)
     print("Training Complete. Vector Store path: ./chroma_db")
 
 
-def _train_oracle(vn: LocalVanna):
+def _oracle_ddl() -> dict:
     try:
         import oracledb
     except Exception as exc:
@@ -50,57 +79,48 @@ def _train_oracle(vn: LocalVanna):
         sys.exit(1)
     dsn = DB_ORACLE_DSN
     schema = (ORACLE_SCHEMA or ORACLE_USER).upper()
-    train_objects = []
-    for o in ORACLE_TRAIN_OBJECTS:
-        if o in {"TABLES", "TABLE"}:
-            train_objects.append("TABLE")
-        elif o in {"VIEWS", "VIEW"}:
-            train_objects.append("VIEW")
-        elif o:
-            train_objects.append(o)
-    if not train_objects:
-        train_objects = ["TABLE", "VIEW"]
-
+    train_objects = normalize_object_types(ORACLE_TRAIN_OBJECTS)
     train_tables = ORACLE_TRAIN_TABLES
 
     if not (ORACLE_USER and ORACLE_PASSWORD and dsn):
         print("[ERROR] Oracle credentials are incomplete. Check .env values.")
         sys.exit(1)
 
-    print(f"Connecting to Oracle schema {schema} at {dsn} ...")
-    conn = oracledb.connect(user=ORACLE_USER, password=ORACLE_PASSWORD, dsn=dsn)
-    cur = conn.cursor()
-
-    obj_filter = ", ".join(f"'{obj}'" for obj in train_objects or ["TABLE", "VIEW"])
-    base_sql = (
-        "SELECT object_name, object_type FROM all_objects "
-        f"WHERE owner = :owner AND object_type IN ({obj_filter})"
+    print(f"Extracting DDL from Oracle schema {schema} at {dsn} ...")
+    ddls = extract_oracle_ddl(
+        lambda: oracledb.connect(user=ORACLE_USER, password=ORACLE_PASSWORD, dsn=dsn),
+        schema,
+        train_objects,
+        train_tables if train_tables and train_tables != ["ALL"] else None,
     )
-    if train_tables and train_tables != ["ALL"]:
-        tables_filter = ", ".join(f"'{t}'" for t in train_tables)
-        base_sql += f" AND object_name IN ({tables_filter})"
-
-    cur.execute(base_sql, owner=schema)
-    rows = cur.fetchall()
-    print(f"Discovered {len(rows)} objects for training.")
-
-    for object_name, object_type in rows:
-        ddl_sql = "SELECT DBMS_METADATA.GET_DDL(:obj_type, :obj_name, :owner) FROM DUAL"
-        cur.execute(ddl_sql, obj_type=object_type, obj_name=object_name, owner=schema)
-        ddl_row = cur.fetchone()
-        ddl = ddl_row[0]
-        ddl_text = ddl.read() if hasattr(ddl, "read") else str(ddl)
-        print(f"Training on {object_type} {object_name}...")
-        vn.train(ddl=ddl_text)
-
-    cur.close()
-    conn.close()
+    print(f"Extracted DDL for {len(ddls)} objects.")
+    return ddls
+
+
+def _train_oracle(vn: LocalVanna, sync: bool = False, prune: bool = False):
+    _train_ddl(vn, _oracle_ddl(), sync, prune)
     print("Oracle training complete. Vector Store path: ./chroma_db")
 
 
-if __name__ == "__main__":
+def main(sync: bool = False, prune: bool = False) -> None:
     vn = _build_vanna()
     if DB_PROVIDER == "oracle":
-        _train_oracle(vn)
+        _train_oracle(vn, sync, prune)
     else:
-        _train_sqlite(vn)
+        _train_sqlite(vn, sync, prune)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the vector store on the database schema")
+    parser.add_argument(
+        "--sync",
+        action="store_true",
+        help="Incremental: embed only added/changed objects and delete dropped ones",
+    )
+    parser.add_argument(
+        "--prune",
+        action="store_true",
+        help="With --sync, also delete DDL entries not matching any current object",
+    )
+    args = parser.parse_args()
+    main(sync=args.sync, prune=args.prune)
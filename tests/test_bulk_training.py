@@ -0,0 +1,121 @@
+import numpy as np
+
+from app.agent.implementation import LocalVanna
+
+
+class _CountingEmbedder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, docs):
+        self.batches.append(len(docs))
+        return [np.full(4, float(len(d)), dtype=np.float32) for d in docs]
+
+
+def _vanna(tmp_path):
+    vn = LocalVanna(config={"path": str(tmp_path), "api_key": "x", "api_base": "http://localhost:1", "model": "m"})
+    vn.embedding_function = _CountingEmbedder()
+    return vn
+
+
+def test_train_bulk_batches_and_reports_progress(tmp_path):
+    vn = _vanna(tmp_path)
+    ddl = [f"CREATE TABLE t{i} (id INT)" for i in range(5)]
+    seen = []
+
+    stats = vn.train_bulk(
+        ddl=ddl + [ddl[0]],
+        documentation=["orders are monthly"],
+        question_sql=[("how many?", "SELECT COUNT(*) FROM t0")],
+        batch_size=2,
+        progress=lambda done, total: seen.append((done, total)),
+    )
+
+    assert stats == {"total": 8, "added": 7, "skipped": 1}
+    assert vn.embedding_function.batches == [2, 2, 1, 1, 1]
+    assert seen[-1] == (8, 8)
+    assert vn.ddl_collection.count() == 5
+    assert vn.training_revision == 5
+    # Same ids as the one-at-a-time API, so train() and train_bulk() never duplicate
+    assert vn.add_ddl(ddl[0]) in vn.ddl_collection.get(include=[])["ids"]
+    assert vn.ddl_collection.count() == 5
+
+
+def test_train_bulk_rerun_only_embeds_missing_items(tmp_path):
+    vn = _vanna(tmp_path)
+    vn.train_bulk(ddl=["CREATE TABLE a (id INT)"])
+    vn.embedding_function.batches.clear()
+
+    stats = vn.train_bulk(ddl=["CREATE TABLE a (id INT)", "CREATE TABLE b (id INT)"])
+
+    assert stats == {"total": 2, "added": 1, "skipped": 1}
+    assert vn.embedding_function.batches == [1]
+    assert vn.ddl_collection.count() == 2
+
+
+def test_sync_ddl_touches_only_changed_objects(tmp_path):
+    vn = _vanna(tmp_path)
+    # Trained before sync existed: adopted, not re-embedded
+    vn.train_bulk(ddl=["CREATE TABLE a (id INT)"])
+    vn.embedding_function.batches.clear()
+
+    first = vn.sync_ddl({"a": "CREATE TABLE a (id INT)", "b": "CREATE TABLE b (id INT)", "c": "CREATE TABLE c (x INT)"})
+    assert first == {"added": ["b", "c"], "updated": [], "deleted": [], "unchanged": 1, "pruned": 0}
+    assert vn.embedding_function.batches == [2]
+
+    second = vn.sync_ddl({"a": "CREATE TABLE a (id INT);\n", "b": "CREATE TABLE b (id INT, name TEXT)"})
+    assert second == {"added": [], "updated": ["b"], "deleted": ["c"], "unchanged": 1, "pruned": 0}
+    assert vn.embedding_function.batches == [2, 1]
+    stored = vn.ddl_collection.get(include=["documents", "metadatas"])
+    assert sorted(stored["documents"]) == ["CREATE TABLE a (id INT)", "CREATE TABLE b (id INT, name TEXT)"]
+    assert {m["object"] for m in stored["metadatas"]} == {"a", "b"}
+
+    revision = vn.training_revision
+    assert vn.sync_ddl({"a": "CREATE TABLE a (id INT)", "b": "CREATE TABLE b (id INT, name TEXT)"})["unchanged"] == 2
+    assert vn.training_revision == revision
+
+
+def test_sync_ddl_prunes_untracked_entries_on_request(tmp_path):
+    vn = _vanna(tmp_path)
+    vn.train_bulk(ddl=["CREATE TABLE old (id INT)"])
+
+    assert vn.sync_ddl({"a": "CREATE TABLE a (id INT)"})["pruned"] == 0
+    assert vn.ddl_collection.count() == 2
+    assert vn.sync_ddl({"a": "CREATE TABLE a (id INT)"}, prune_untracked=True)["pruned"] == 1
+    assert vn.ddl_collection.count() == 1
+
+
+def test_vector_stats_are_recomputed_only_after_a_write(tmp_path, monkeypatch):
+    vn = _vanna(tmp_path)
+    vn.train_bulk(ddl=["CREATE TABLE a (id INT)"], question_sql=[("q?", "SELECT 1")])
+    counts = []
+    original = type(vn.ddl_collection).count
+    monkeypatch.setattr(type(vn.ddl_collection), "count", lambda self: counts.append(1) or original(self))
+
+    first = vn.vector_stats()
+    assert first["collections"] == {"ddl": 1, "documentation": 0, "sql": 1}
+    assert first["total"] == 2
+    assert vn.vector_stats() == first
+    assert vn.ddl_documents() == ("CREATE TABLE a (id INT)",)
+    assert len(counts) == 3
+
+    vn.train_bulk(ddl=["CREATE TABLE b (id INT)"])
+    assert vn.vector_stats()["collections"]["ddl"] == 2
+    assert vn.vector_stats()["revision"] == vn.training_revision
+    assert sorted(vn.ddl_documents()) == ["CREATE TABLE a (id INT)", "CREATE TABLE b (id INT)"]
+    assert len(counts) == 6
+
+
+def test_hnsw_settings_apply_to_new_collections_and_search_ef_to_existing(tmp_path, monkeypatch):
+    from app.agent import implementation
+
+    monkeypatch.setattr(implementation, "VECTOR_HNSW_M", 24)
+    monkeypatch.setattr(implementation, "VECTOR_HNSW_CONSTRUCTION_EF", 150)
+    monkeypatch.setattr(implementation, "VECTOR_HNSW_SEARCH_EF", 60)
+    hnsw = _vanna(tmp_path).ddl_collection.configuration["hnsw"]
+    assert (hnsw["max_neighbors"], hnsw["ef_construction"], hnsw["ef_search"]) == (24, 150, 60)
+
+    monkeypatch.setattr(implementation, "VECTOR_HNSW_SEARCH_EF", 200)
+    reopened = _vanna(tmp_path)
+    assert reopened.ddl_collection.configuration["hnsw"]["ef_search"] == 200
+    assert reopened.ddl_collection.configuration["hnsw"]["max_neighbors"] == 24
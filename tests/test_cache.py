@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+
+from app.utils import cache
+
+
+class _SlowClient:
+    def __init__(self):
+        self.healthy = False
+        self.store = {}
+
+    async def get(self, key):
+        if not self.healthy:
+            await asyncio.sleep(1)
+        return self.store.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.store[key] = value
+
+    async def ping(self):
+        if not self.healthy:
+            raise ConnectionError("down")
+        return True
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    client = _SlowClient()
+    monkeypatch.setattr(cache, "CACHE_ENABLED", True)
+    monkeypatch.setattr(cache, "CACHE_AVAILABLE", True)
+    monkeypatch.setattr(cache, "CACHE_HEALTH_PROBE_SECONDS", 0.01)
+    monkeypatch.setattr(cache, "_OP_TIMEOUT", 0.05)
+    monkeypatch.setattr(cache, "_get_client", lambda: client)
+    cache.clear_local_cache()
+    yield client
+    cache.clear_local_cache()
+    if cache._probe_task is not None:
+        cache._probe_task.cancel()
+        cache._probe_task = None
+
+
+@pytest.mark.asyncio
+async def test_hung_redis_times_out_and_probe_recovers(fake_redis):
+    assert await cache.get_cached_response("k") is None
+    stats = cache.cache_stats()
+    assert stats["available"] is False
+    assert stats["cache_timeouts"] >= 1
+
+    fake_redis.healthy = True
+    await asyncio.wait_for(cache._probe_task, timeout=1)
+    assert cache.cache_stats()["available"] is True
+
+    await cache.set_cached_response("k", {"answer": 1})
+    assert await cache.get_cached_response("k") == {"answer": 1}
+
+
+@pytest.mark.asyncio
+async def test_local_tier_serves_without_redis(monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(cache, "CACHE_LOCAL_ENABLED", True)
+    cache.clear_local_cache()
+    before = cache.cache_stats()["tiers"]["local"]["hits"]
+
+    await cache.set_cached_response("local-key", {"sql": "SELECT 1"}, ttl=60)
+    assert await cache.get_cached_response("local-key") == {"sql": "SELECT 1"}
+    assert cache.cache_stats()["tiers"]["local"]["hits"] == before + 1
+    cache.clear_local_cache()
+
+
+@pytest.mark.asyncio
+async def test_negative_entry_skips_redis_until_set(fake_redis):
+    fake_redis.healthy = True
+    calls = []
+    original_get = fake_redis.get
+
+    async def counting_get(key):
+        calls.append(key)
+        return await original_get(key)
+
+    fake_redis.get = counting_get
+    assert await cache.get_cached_response("absent") is None
+    assert await cache.get_cached_response("absent") is None
+    assert calls == ["absent"]
+    assert cache.cache_stats()["local_negative_hit"] >= 1
+
+    await cache.set_cached_response("absent", {"answer": 2})
+    assert await cache.get_cached_response("absent") == {"answer": 2}
+
+
+def test_cache_key_ignores_phrasing_noise_but_not_version_or_scope():
+    scope = cache.access_scope(["user"])
+    base = cache.make_cache_key("Total amount per account?", "ctx1", "gemma", scope)
+    assert base == cache.make_cache_key("  total   amount per ACCOUNT ", "ctx1", "gemma", scope)
+    assert base != cache.make_cache_key("total amount per account", "ctx2", "gemma", scope)
+    assert base != cache.make_cache_key("total amount per account", "ctx1", "other-model", scope)
+    assert base != cache.make_cache_key("total amount per account", "ctx1", "gemma", cache.access_scope(["admin"]))
+    assert cache.access_scope(["b", "a"]) == cache.access_scope(["a", "b", "a"])
+
+
+def test_tool_loop_iterations_get_distinct_keys():
+    from vanna.core.llm import LlmMessage
+    from vanna.core.tool import ToolCall
+
+    from app.agent.llm import _split_turn
+
+    question = LlmMessage(role="user", content="total amount per account")
+    first = _split_turn([question])
+    call = ToolCall(id="call_1", name="run_sql", arguments={"sql": "SELECT 1"})
+    same_call_other_id = ToolCall(id="call_2", name="run_sql", arguments={"sql": "SELECT 1"})
+    second = _split_turn([question, LlmMessage(role="assistant", content="", tool_calls=[call])])
+    again = _split_turn([question, LlmMessage(role="assistant", content="", tool_calls=[same_call_other_id])])
+
+    assert first == ("total amount per account", "")
+    assert second[1] and second[1] == again[1]
+
+
+@pytest.mark.asyncio
+async def test_stream_is_teed_into_cache_and_replayed(monkeypatch):
+    from vanna.core.llm import LlmMessage, LlmRequest, LlmStreamChunk
+    from vanna.core.user import User
+
+    from app.agent.llm import CachedOpenAILlmService, stream_stats
+    from app.agent.openai_async import AsyncOpenAILlmService
+
+    upstream_calls = []
+
+    async def fake_stream(self, request):
+        upstream_calls.append(request)
+        for piece in ["Total ", "is ", "42"]:
+            yield LlmStreamChunk(content=piece)
+
+    monkeypatch.setattr(AsyncOpenAILlmService, "stream_request", fake_stream)
+    monkeypatch.setattr(cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(cache, "CACHE_LOCAL_ENABLED", True)
+    cache.clear_local_cache()
+
+    service = CachedOpenAILlmService(model="stub-model", api_key="x", base_url="http://localhost:1")
+    request = LlmRequest(
+        messages=[LlmMessage(role="user", content="what is the total amount")],
+        user=User(id="u1", group_memberships=["user"]),
+        metadata={"context_version": "ctx"},
+    )
+    first = [chunk.content async for chunk in service.stream_request(request)]
+    replayed = [chunk.content async for chunk in service.stream_request(request)]
+
+    assert "".join(first) == "".join(replayed) == "Total is 42"
+    assert len(upstream_calls) == 1
+    assert stream_stats()["stub-model"]["samples"] == 1
+    cache.clear_local_cache()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_streams_share_one_upstream_call(monkeypatch):
+    from vanna.core.llm import LlmMessage, LlmRequest, LlmStreamChunk
+    from vanna.core.user import User
+
+    from app.agent.llm import CachedOpenAILlmService, llm_inflight
+    from app.agent.openai_async import AsyncOpenAILlmService
+
+    upstream_calls = []
+
+    async def fake_stream(self, request):
+        upstream_calls.append(request)
+        for piece in ["Total ", "is ", "42"]:
+            await asyncio.sleep(0.01)
+            yield LlmStreamChunk(content=piece)
+
+    monkeypatch.setattr(AsyncOpenAILlmService, "stream_request", fake_stream)
+    monkeypatch.setattr(cache, "CACHE_ENABLED", False)
+    monkeypatch.setattr(cache, "CACHE_LOCAL_ENABLED", False)
+
+    service = CachedOpenAILlmService(model="stub-model", api_key="x", base_url="http://localhost:1")
+
+    async def consume():
+        request = LlmRequest(
+            messages=[LlmMessage(role="user", content="what is the total amount")],
+            user=User(id="u1", group_memberships=["user"]),
+            metadata={"context_version": "ctx"},
+        )
+        return "".join([chunk.content or "" async for chunk in service.stream_request(request)])
+
+    outputs = await asyncio.gather(*(consume() for _ in range(3)))
+
+    assert outputs == ["Total is 42"] * 3
+    assert len(upstream_calls) == 1
+    assert llm_inflight.stats()["in_flight"] == 0
@@ -0,0 +1,110 @@
+import asyncio
+import sqlite3
+import threading
+
+from app.agent.catalog import SchemaCatalog, load_oracle_catalog, load_sqlite_catalog
+
+
+def _make_db(path, ddl):
+    conn = sqlite3.connect(path)
+    try:
+        for stmt in ddl:
+            conn.execute(stmt)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def test_sqlite_catalog_indexes_tables_views_and_columns(tmp_path):
+    db = str(tmp_path / "cat.db")
+    _make_db(db, ["CREATE TABLE accounts (id INTEGER, Balance REAL)", "CREATE VIEW v_acc AS SELECT id FROM accounts"])
+    catalog = SchemaCatalog(lambda: load_sqlite_catalog(db), ttl_seconds=0, default_schema="main")
+
+    accounts = catalog.lookup("ACCOUNTS")
+    assert accounts.kind == "table"
+    assert accounts.columns == ("id", "balance")
+    assert catalog.lookup("v_acc", "main").kind == "view"
+    assert catalog.lookup("missing") is None
+    assert catalog.version == 1
+
+
+def test_catalog_version_bumps_only_on_change(tmp_path):
+    db = str(tmp_path / "cat.db")
+    _make_db(db, ["CREATE TABLE a (id INTEGER)"])
+    catalog = SchemaCatalog(lambda: load_sqlite_catalog(db), ttl_seconds=0)
+    catalog.refresh()
+    catalog.refresh()
+    assert catalog.version == 1
+
+    _make_db(db, ["CREATE TABLE b (id INTEGER)"])
+    catalog.refresh()
+    assert catalog.version == 2
+    assert catalog.lookup("b") is not None
+
+
+def test_failed_load_is_not_cached_as_empty():
+    calls = {"n": 0}
+
+    def flaky_loader():
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError("db down")
+        return load_sqlite_catalog(":memory:")
+
+    catalog = SchemaCatalog(flaky_loader, ttl_seconds=0, retry_seconds=0)
+    assert catalog.get() is None
+    assert catalog.last_error == "db down"
+    assert catalog.get() is not None
+    assert catalog.last_error is None
+
+
+def test_loads_never_block_the_event_loop():
+    release = threading.Event()
+
+    def slow_loader():
+        release.wait(5)
+        return load_sqlite_catalog(":memory:")
+
+    catalog = SchemaCatalog(slow_loader, ttl_seconds=0)
+
+    async def scenario():
+        # Served as "no catalog yet" while the load runs in the background
+        assert catalog.get() is None
+        waiter = asyncio.ensure_future(catalog.aget())
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+        release.set()
+        return await waiter
+
+    assert asyncio.run(scenario()) is not None
+    assert catalog.version == 1
+
+
+def test_oracle_loader_uses_bind_variables_in_one_round_trip():
+    executed = []
+
+    class FakeCursor:
+        arraysize = 100
+
+        def execute(self, query, binds):
+            executed.append((query, binds))
+
+        def fetchall(self):
+            return [("HR", "EMPLOYEES", "TABLE", "EMP_ID"), ("HR", "EMPLOYEES", "TABLE", "NAME")]
+
+        def close(self):
+            pass
+
+    class FakeConn:
+        def cursor(self):
+            return FakeCursor()
+
+        def close(self):
+            pass
+
+    objects = load_oracle_catalog(lambda: FakeConn(), "hr", ["TABLE", "VIEW"], ["EMPLOYEES"])
+    assert len(executed) == 1
+    query, binds = executed[0]
+    assert "'HR'" not in query and ":owner" in query
+    assert binds == {"owner": "HR", "type0": "TABLE", "type1": "VIEW", "name0": "EMPLOYEES"}
+    assert objects[0].columns == ("emp_id", "name")
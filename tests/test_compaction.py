@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from vanna.core.storage.models import Message
+from vanna.core.tool import ToolCall
+
+from app.agent.compaction import SUMMARY_HEADER, ConversationCompactor
+
+
+def _turn(i):
+    sql = f"SELECT region, SUM(amount) FROM sales_{i} GROUP BY region"
+    return [
+        Message(role="user", content=f"question {i} about sales " + "x" * 200),
+        Message(role="assistant", content="", tool_calls=[ToolCall(id=f"t{i}", name="run_sql", arguments={"sql": sql})]),
+        Message(role="tool", content="region,total\nnorth,1\nsouth,2", tool_call_id=f"t{i}"),
+        Message(role="assistant", content=f"Answer {i}"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_older_turns_become_a_summary_that_keeps_sql():
+    history = [m for i in range(5) for m in _turn(i)]
+    compactor = ConversationCompactor(trigger_chars=500, keep_turns=2, summarizer=None)
+    compacted = await compactor.filter_messages(history)
+
+    assert compacted[0].role == "system" and compacted[0].content.startswith(SUMMARY_HEADER)
+    assert compacted[1:] == history[-8:]
+    summary = compacted[0].content
+    assert "Ran SQL: SELECT region, SUM(amount) FROM sales_0 GROUP BY region" in summary
+    assert "Result (3 lines): region,total" in summary
+    assert "User asked: question 2 about sales" in summary
+
+    again = await compactor.filter_messages(history)
+    assert again[0].content == summary
+    assert compactor.stats()["cached_summaries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_short_history_is_untouched_and_llm_summary_runs_in_background():
+    history = [m for i in range(4) for m in _turn(i)]
+    assert await ConversationCompactor(trigger_chars=10**6).filter_messages(history) is history
+
+    started = asyncio.Event()
+    release = asyncio.Event()
+
+    async def summarize(transcript):
+        started.set()
+        await release.wait()
+        return "- LLM summary"
+
+    compactor = ConversationCompactor(trigger_chars=500, keep_turns=1, summarizer=summarize)
+    first = await compactor.filter_messages(history)
+    # The request path did not wait for the LLM
+    assert "Ran SQL" in first[0].content
+    await started.wait()
+    release.set()
+    while compactor.stats()["pending"]:
+        await asyncio.sleep(0)
+
+    second = await compactor.filter_messages(history)
+    assert second[0].content == f"{SUMMARY_HEADER}\n- LLM summary"
+    assert compactor.stats()["llm_summaries"] == 1
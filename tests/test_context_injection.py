@@ -24,27 +24,7 @@ def make_request(message, role="user"):
 def test_injection_appends_schema(monkeypatch, patch_perf_logger):
     # Mock schema DDL
     ddl = "CREATE TABLE sales_data(id INT, product TEXT);"
-    class FakeDF:
-        empty = False
-        columns = ["type", "text"]
-
-        def __getitem__(self, key):
-            return self
-
-        def __eq__(self, other):
-            return self
-
-        def dropna(self):
-            return self
-
-        def tolist(self):
-            return [ddl]
-
-        def __iter__(self):
-            return iter([ddl])
-
-    fake_df = FakeDF()
-    monkeypatch.setattr(builder, "knowledge_base", SimpleNamespace(get_training_data=lambda: fake_df))
+    monkeypatch.setattr(builder, "knowledge_base", SimpleNamespace(ddl_documents=lambda: (ddl,)))
 
     req = make_request("What are the top 5 records?")
     mw = builder.LLMLog()
@@ -62,24 +42,7 @@ def test_injection_appends_schema(monkeypatch, patch_perf_logger):
 def test_truncation_preserves_system(monkeypatch, patch_perf_logger):
     # Huge history + system prompt; ensure system survives
     ddl = "CREATE TABLE sales_data(id INT, product TEXT);" * 500  # very long
-    class FakeDF:
-        empty = False
-        columns = ["type", "text"]
-
-        def __getitem__(self, key):
-            return self
-
-        def dropna(self):
-            return self
-
-        def to_list(self):
-            return [ddl]
-
-        def __iter__(self):
-            return iter([ddl])
-
-    fake_df = FakeDF()
-    monkeypatch.setattr(builder, "knowledge_base", SimpleNamespace(get_training_data=lambda: fake_df))
+    monkeypatch.setattr(builder, "knowledge_base", SimpleNamespace(ddl_documents=lambda: (ddl,)))
 
     system_msg = SimpleNamespace(role="system", content="SYSTEM")
     long_history = SimpleNamespace(role="user", content="x" * 20000)
@@ -98,15 +61,7 @@ def test_truncation_preserves_system(monkeypatch, patch_perf_logger):
 
 def test_logging_structure(monkeypatch, patch_perf_logger):
     ddl = "CREATE TABLE t(id INT);"
-    fake_df = SimpleNamespace(
-        empty=False,
-        columns=["type", "text"],
-        __getitem__=lambda self, key: self,
-        dropna=lambda self: self,
-        to_list=lambda self: [ddl],
-        __iter__=lambda self: iter([ddl]),
-    )
-    monkeypatch.setattr(builder, "knowledge_base", SimpleNamespace(get_training_data=lambda: fake_df))
+    monkeypatch.setattr(builder, "knowledge_base", SimpleNamespace(ddl_documents=lambda: (ddl,)))
 
     req = make_request("hi")
     mw = builder.LLMLog()
@@ -116,3 +71,22 @@ def test_logging_structure(monkeypatch, patch_perf_logger):
     assert logged, "No prompt size log recorded"
     entry = logged[-1]
     assert "total_chars" in entry and "system_chars" in entry and "truncated" in entry
+
+
+def test_oversized_tool_result_is_trimmed_not_the_question(monkeypatch, patch_perf_logger):
+    ddl = "CREATE TABLE sales_data(id INT, region TEXT, amount NUMBER);"
+    monkeypatch.setattr(builder, "knowledge_base", SimpleNamespace(ddl_documents=lambda: (ddl,)))
+
+    question = SimpleNamespace(role="user", content="total sales by region?")
+    call = SimpleNamespace(role="assistant", content="", tool_calls=[{"id": "1", "name": "run_sql"}])
+    rows = "".join(f"region_{i},{i * 10}\n" for i in range(5000))[:50000]
+    result = SimpleNamespace(role="tool", content=rows)
+    req = SimpleNamespace(messages=[SimpleNamespace(role="system", content="SYSTEM"), question, call, result], metadata={})
+
+    asyncio.run(builder.LLMLog().before_llm_request(req))
+
+    assert req.messages[1].content.endswith("Question: total sales by region?")
+    assert ddl in req.messages[1].content
+    assert req.messages[3].content.startswith("region_0,0\n")
+    assert "truncated" in req.messages[3].content
+    assert sum(len(m.content) for m in req.messages) <= builder.LLM_MAX_PROMPT_CHARS
@@ -0,0 +1,54 @@
+import numpy as np
+
+from app.agent.embedding_cache import EmbeddingCache
+from app.agent.embeddings import LazyEmbeddingFunction
+
+
+class _Encoder:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(list(texts))
+        return np.array([[len(t), 1.0 / 3, -2.0] for t in texts], dtype=np.float32)
+
+
+def test_only_unseen_text_reaches_the_model(tmp_path):
+    encoder = _Encoder()
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite3"), max_entries=100)
+    ef = LazyEmbeddingFunction(loader=lambda: encoder, cache=cache)
+
+    first = ef(["a", "bb", "a"])
+    second = ef(["bb", "ccc"])
+
+    assert encoder.calls == [["a", "bb"], ["ccc"]]
+    assert np.array_equal(first[1], second[0])
+    assert first[0].dtype == np.float32
+    assert np.allclose(first[0], [1.0, 1.0 / 3, -2.0], atol=1e-3)
+    assert cache.stats()["hits"] == 1
+
+    # Survives a restart; another model's vectors are kept apart
+    reopened = EmbeddingCache(path=str(tmp_path / "emb.sqlite3"), max_entries=100)
+    assert set(reopened.get_many(ef.model_id, ["a", "bb", "zz"])) == {"a", "bb"}
+    assert reopened.get_many("other-model|torch|norm=0", ["a"]) == {}
+
+
+def test_full_hit_does_not_load_the_model(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite3"))
+    LazyEmbeddingFunction(loader=_Encoder, cache=cache)(["x"])
+
+    ef = LazyEmbeddingFunction(loader=_Encoder, cache=cache)
+    ef(["x"])
+    assert not ef.loaded
+
+
+def test_least_recently_used_rows_are_pruned(tmp_path):
+    cache = EmbeddingCache(path=str(tmp_path / "emb.sqlite3"), max_entries=3)
+    vec = np.ones(2)
+    for text in ["a", "b", "c"]:
+        cache.put_many("m", [text], [vec])
+    cache.get_many("m", ["a"])
+    cache.put_many("m", ["d"], [vec])
+
+    assert cache.size() == 3
+    assert set(cache.get_many("m", ["a", "b", "c", "d"])) == {"a", "c", "d"}
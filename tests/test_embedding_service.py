@@ -0,0 +1,122 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.agent.embedding_service import MicroBatcher, PoolEncoder, create_app, decode_vectors
+from app.agent.embeddings import LazyEmbeddingFunction
+
+
+class _LengthEncoder:
+    """Top-level so spawned worker processes can build it."""
+
+    def encode(self, texts):
+        return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+def _length_encoder():
+    return _LengthEncoder()
+
+
+def test_concurrent_submits_share_one_batch():
+    batches = []
+    executor = ThreadPoolExecutor(max_workers=1)
+
+    def dispatch(texts):
+        batches.append(list(texts))
+        return executor.submit(_LengthEncoder().encode, texts)
+
+    batcher = MicroBatcher(dispatch, window_ms=100, max_batch=64)
+    barrier = threading.Barrier(3)
+    results = {}
+
+    def call(key, texts):
+        barrier.wait()
+        results[key] = batcher.submit(texts).result(timeout=5)
+
+    threads = [threading.Thread(target=call, args=(k, t)) for k, t in [("a", ["x"]), ("b", ["yy", "zzz"]), ("c", ["w"])]]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    batcher.close()
+
+    assert len(batches) == 1 and sorted(batches[0]) == ["w", "x", "yy", "zzz"]
+    assert results["b"][:, 0].tolist() == [2.0, 3.0]
+    assert results["a"][:, 0].tolist() == [1.0]
+    assert batcher.stats()["avg_batch"] == 4.0
+
+
+def test_dispatch_failure_reaches_every_caller():
+    def dispatch(texts):
+        raise RuntimeError("worker died")
+
+    batcher = MicroBatcher(dispatch, window_ms=0)
+    with pytest.raises(RuntimeError, match="worker died"):
+        batcher.submit(["a"]).result(timeout=5)
+    batcher.close()
+
+
+def test_pool_encoder_runs_the_model_in_a_worker_process():
+    encoder = PoolEncoder(_length_encoder, (), workers=1)
+    try:
+        assert encoder.encode(["ab"])[:, 0].tolist() == [2.0]
+        assert asyncio.run(encoder.aencode(["abc", "d"]))[:, 0].tolist() == [3.0, 1.0]
+        assert encoder.stats()["requests"] == 2
+    finally:
+        encoder.close()
+
+
+def test_service_returns_float32_vectors():
+    class _AsyncEncoder(_LengthEncoder):
+        async def aencode(self, texts):
+            return self.encode(texts)
+
+        def stats(self):
+            return {"mode": "test"}
+
+    client = TestClient(create_app(_AsyncEncoder()))
+    vectors = decode_vectors(client.post("/embed", json={"texts": ["a", "bcd"]}).json())
+    assert vectors.dtype == np.float32
+    assert vectors[:, 0].tolist() == [1.0, 3.0]
+    assert client.get("/health").json()["mode"] == "test"
+
+
+def test_aembed_matches_the_sync_path():
+    ef = LazyEmbeddingFunction(loader=_LengthEncoder)
+    vectors = asyncio.run(ef.aembed(["ab", "c"]))
+    assert [v.tolist() for v in vectors] == [v.tolist() for v in ef(["ab", "c"])]
+
+
+@pytest.mark.parametrize("async_encoder", [False, True])
+def test_aembed_keeps_the_cache_off_the_event_loop(tmp_path, async_encoder):
+    from app.agent.embedding_cache import EmbeddingCache
+
+    class _RecordingCache(EmbeddingCache):
+        threads = set()
+
+        def get_many(self, model, texts):
+            self.threads.add(threading.get_ident())
+            return super().get_many(model, texts)
+
+        def put_many(self, model, texts, vectors):
+            self.threads.add(threading.get_ident())
+            return super().put_many(model, texts, vectors)
+
+    class _AsyncEncoder(_LengthEncoder):
+        async def aencode(self, texts):
+            return self.encode(texts)
+
+    cache = _RecordingCache(path=str(tmp_path / "embeddings.db"))
+    ef = LazyEmbeddingFunction(loader=_AsyncEncoder if async_encoder else _LengthEncoder, cache=cache)
+
+    async def embed_twice():
+        first = await ef.aembed(["ab", "c"])
+        return threading.get_ident(), first, await ef.aembed(["ab", "c"])
+
+    loop_thread, first, second = asyncio.run(embed_twice())
+    assert [v.tolist() for v in first] == [v.tolist() for v in second] == [[2.0, 1.0], [1.0, 1.0]]
+    assert cache.threads and loop_thread not in cache.threads
@@ -0,0 +1,57 @@
+import threading
+from types import SimpleNamespace
+
+import numpy as np
+
+from app.agent.embeddings import LazyEmbeddingFunction, OnnxEncoder
+
+
+class _Encoder:
+    def encode(self, texts):
+        return np.ones((len(texts), 3))
+
+
+def test_model_loads_once_on_first_use():
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return _Encoder()
+
+    ef = LazyEmbeddingFunction(loader=loader)
+    assert not ef.loaded
+    assert ef.name() == "sentence_transformer"
+    assert isinstance(LazyEmbeddingFunction.build_from_config(ef.get_config()), LazyEmbeddingFunction)
+
+    threads = [threading.Thread(target=ef, args=(["a", "b"],)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    ef.warm_up()
+    assert loads == [1]
+    assert ef(["x"])[0].dtype == np.float32
+
+
+def test_onnx_encoder_mean_pools_over_the_attention_mask():
+    class Tokenizer:
+        def encode_batch(self, texts):
+            # Second text is one token shorter and padded
+            return [
+                SimpleNamespace(ids=[1, 2], attention_mask=[1, 1], type_ids=[0, 0]),
+                SimpleNamespace(ids=[3, 0], attention_mask=[1, 0], type_ids=[0, 0]),
+            ][: len(texts)]
+
+    class Session:
+        def get_inputs(self):
+            return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+        def run(self, _outputs, feeds):
+            assert set(feeds) == {"input_ids", "attention_mask"}
+            hidden = np.array([[[1.0, 0.0], [3.0, 0.0]], [[0.0, 2.0], [9.0, 9.0]]], dtype=np.float32)
+            return [hidden[: len(feeds["input_ids"])]]
+
+    raw = OnnxEncoder(Tokenizer(), Session(), normalize=False).encode(["a", "b"])
+    np.testing.assert_allclose(raw, [[2.0, 0.0], [0.0, 2.0]])
+    unit = OnnxEncoder(Tokenizer(), Session(), normalize=True).encode(["a", "b"])
+    np.testing.assert_allclose(np.linalg.norm(unit, axis=1), [1.0, 1.0])
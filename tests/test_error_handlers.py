@@ -2,6 +2,7 @@ import pytest
 from fastapi import FastAPI, HTTPException
 from fastapi.testclient import TestClient
 
+from app.agent.llm_scheduler import LlmOverloadedError
 from app.api.error_handlers import register_exception_handlers
 
 
@@ -17,6 +18,10 @@ def create_app():
     async def bad():
         raise HTTPException(status_code=400, detail="bad")
 
+    @app.get("/busy")
+    async def busy():
+        raise LlmOverloadedError("queue is full", retry_after=3)
+
     return app
 
 
@@ -34,3 +39,11 @@ def test_error_handler_400_passthrough():
     res = client.get("/bad")
     assert res.status_code == 400
     assert res.json()["detail"] == "bad"
+
+
+def test_error_handler_llm_overload_is_503_with_retry_after():
+    app = create_app()
+    client = TestClient(app)
+    res = client.get("/busy")
+    assert res.status_code == 503
+    assert res.headers["retry-after"] == "3"
@@ -0,0 +1,76 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from vanna.core.llm import LlmMessage, LlmRequest
+from vanna.core.user import User
+
+from app.agent.openai_async import AsyncOpenAILlmService
+from app.utils import http_client
+from app.utils.http_client import close_http_clients, get_async_http_client, get_sync_http_client
+
+
+@pytest.mark.asyncio
+async def test_llm_services_share_one_async_pool():
+    a = AsyncOpenAILlmService(model="a", api_key="x", base_url="http://127.0.0.1:1/v1")
+    b = AsyncOpenAILlmService(model="b", api_key="x", base_url="http://127.0.0.1:2/v1")
+    shared = get_async_http_client()
+    assert a._async_client()._client is shared
+    assert b._async_client()._client is shared
+    assert a._client._client is get_sync_http_client()
+
+    await close_http_clients()
+    assert get_async_http_client() is not shared
+
+
+def test_new_event_loop_gets_fresh_async_client():
+    async def grab():
+        return get_async_http_client()
+
+    first = asyncio.run(grab())
+    second = asyncio.run(grab())
+    assert first is not second
+    assert http_client._async_client is second
+
+
+class _StreamingCompletions(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        events = [
+            {"choices": [{"index": 0, "delta": {"content": "po"}}]},
+            {"choices": [{"index": 0, "delta": {"content": "ng"}}]},
+            {"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+        ]
+        body = "".join(
+            f"data: {json.dumps({'id': 'c', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'stub', **e})}\n\n"
+            for e in events
+        ) + "data: [DONE]\n\n"
+        payload = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_async_service_parses_streamed_completion():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StreamingCompletions)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        service = AsyncOpenAILlmService(
+            model="stub", api_key="x", base_url=f"http://127.0.0.1:{server.server_port}/v1", max_retries=0
+        )
+        request = LlmRequest(messages=[LlmMessage(role="user", content="ping")], user=User(id="t"))
+        chunks = [chunk async for chunk in service.stream_request(request)]
+        assert "".join(c.content or "" for c in chunks) == "pong"
+        assert chunks[-1].finish_reason == "stop"
+    finally:
+        server.shutdown()
@@ -47,3 +47,27 @@ async def test_middleware_blocks_invalid_body():
     resp = await middleware.dispatch(req, lambda r: Response("ok"))
     assert isinstance(resp, Response)
     assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_handle_stream_forwards_llm_deltas_before_final_component():
+    from vanna.components import RichTextComponent
+    from vanna.servers.base.models import ChatRequest
+
+    from app.agent.input_validation import SafeChatHandler
+    from app.agent.streaming import emit_delta, emit_stream_end
+
+    class StreamingAgent:
+        async def send_message(self, request_context, message, conversation_id):
+            emit_delta("Total ")
+            emit_delta("is 42")
+            emit_stream_end()
+            yield RichTextComponent(content="Total is 42")
+
+    handler = SafeChatHandler(StreamingAgent())
+    chunks = [c async for c in handler.handle_stream(ChatRequest(message="total please"))]
+
+    previews = [c.rich for c in chunks[:-1]]
+    assert previews[0]["data"]["content"] == "Total is 42"
+    assert previews[-1]["visible"] is False
+    assert chunks[-1].rich["data"]["content"] == "Total is 42"
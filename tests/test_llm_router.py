@@ -0,0 +1,112 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from vanna.core.llm import LlmMessage, LlmRequest, LlmResponse
+from vanna.core.user import User
+
+from app.agent.llm_router import Backend, LlmRouter, NoHealthyBackendError
+from app.agent.openai_async import AsyncOpenAILlmService
+
+
+def _request():
+    return LlmRequest(messages=[LlmMessage(role="user", content="ping")], user=User(id="t"))
+
+
+class FakeService:
+    def __init__(self, model, delay=0.0, fail=False):
+        self.model = model
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.cancelled = 0
+
+    async def send_request(self, request):
+        self.calls += 1
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.fail:
+            raise ConnectionError(f"{self.model} down")
+        return LlmResponse(content=self.model)
+
+
+@pytest.mark.asyncio
+async def test_routes_to_fastest_backend_after_measuring():
+    slow, fast = FakeService("slow", delay=0.03), FakeService("fast", delay=0.0)
+    router = LlmRouter([Backend("slow", slow), Backend("fast", fast)])
+    for _ in range(2):
+        await router.send_request(_request())
+    responses = [(await router.send_request(_request())).content for _ in range(3)]
+    assert responses == ["fast", "fast", "fast"]
+
+
+@pytest.mark.asyncio
+async def test_dead_backend_fails_over_and_cools_down():
+    dead, alive = FakeService("dead", fail=True), FakeService("alive")
+    router = LlmRouter([Backend("dead", dead), Backend("alive", alive)], failure_threshold=1, cooldown_seconds=60)
+    assert (await router.send_request(_request())).content == "alive"
+    assert (await router.send_request(_request())).content == "alive"
+    assert dead.calls == 1
+    assert router.status()["backends"][0]["healthy"] is False
+
+    alive.fail = True
+    with pytest.raises(NoHealthyBackendError):
+        await router.send_request(_request())
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_cancels_the_loser():
+    stuck, quick = FakeService("stuck", delay=5), FakeService("quick", delay=0.01)
+    router = LlmRouter([Backend("stuck", stuck), Backend("quick", quick)], hedge_enabled=True, hedge_min_delay_ms=10)
+    router.backends[1].latency_ewma_ms = 1000.0  # rank "stuck" first
+    response = await router.send_request(_request())
+    await asyncio.sleep(0)
+    assert response.content == "quick"
+    assert router.status()["hedge_wins"] == 1
+    assert stuck.cancelled == 1
+
+
+class _StubCompletions(BaseHTTPRequestHandler):
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        model = json.loads(self.rfile.read(length))["model"]
+        body = json.dumps(
+            {
+                "id": "stub",
+                "object": "chat.completion",
+                "created": 0,
+                "model": model,
+                "choices": [
+                    {"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": "pong"}}
+                ],
+            }
+        ).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_router_against_local_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubCompletions)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        stub_url = f"http://127.0.0.1:{server.server_port}/v1"
+        dead = AsyncOpenAILlmService(model="dead", api_key="x", base_url="http://127.0.0.1:9/v1", max_retries=0)
+        stub = AsyncOpenAILlmService(model="stub", api_key="x", base_url=stub_url, max_retries=0)
+        router = LlmRouter([Backend("dead", dead), Backend("stub", stub)])
+        response = await router.send_request(_request())
+        assert response.content == "pong"
+        assert router.counters["failovers"] == 1
+    finally:
+        server.shutdown()
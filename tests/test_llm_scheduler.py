@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+from app.agent import llm_scheduler as scheduler_module
+from app.agent.llm_router import Backend, LlmRouter
+from app.agent.llm_scheduler import (
+    ConcurrencyGate,
+    LlmOverloadedError,
+    LlmScheduler,
+    Priority,
+    llm_priority,
+)
+
+
+@pytest.mark.asyncio
+async def test_waiters_are_admitted_by_priority_then_arrival():
+    gate = ConcurrencyGate("local", limit=1, max_queue=10)
+    await gate.acquire(Priority.INTERACTIVE, 1)
+    order = []
+
+    async def wait(label, priority):
+        await gate.acquire(priority, 1)
+        order.append(label)
+        gate.release()
+
+    tasks = [
+        asyncio.create_task(wait("background", Priority.BACKGROUND)),
+        asyncio.create_task(wait("probe", Priority.PROBE)),
+        asyncio.create_task(wait("chat-1", Priority.INTERACTIVE)),
+        asyncio.create_task(wait("chat-2", Priority.INTERACTIVE)),
+    ]
+    await asyncio.sleep(0)
+    gate.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["chat-1", "chat-2", "probe", "background"]
+    assert gate.active == 0 and gate.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_queue_deadline_and_full_queue_fail_fast():
+    gate = ConcurrencyGate("local", limit=1, max_queue=1)
+    await gate.acquire(Priority.INTERACTIVE, 1)
+
+    waiter = asyncio.create_task(gate.acquire(Priority.INTERACTIVE, 0.05))
+    await asyncio.sleep(0)
+    with pytest.raises(LlmOverloadedError, match="queue is full"):
+        await gate.acquire(Priority.INTERACTIVE, 1)
+    with pytest.raises(LlmOverloadedError, match="busy"):
+        await waiter
+
+    stats = gate.stats()
+    assert stats["timed_out"] == 1 and stats["rejected_full"] == 1
+    assert stats["waiting"] == 0 and stats["active"] == 1
+
+    gate.release()
+    assert gate.active == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    gate = ConcurrencyGate("local", limit=1, max_queue=10)
+    await gate.acquire(Priority.INTERACTIVE, 1)
+    waiter = asyncio.create_task(gate.acquire(Priority.INTERACTIVE, 5))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    gate.release()
+    assert gate.active == 0 and gate.waiting == 0
+    await asyncio.wait_for(gate.acquire(Priority.INTERACTIVE, 1), 0.1)
+
+
+@pytest.mark.asyncio
+async def test_waiter_cancelled_after_handoff_passes_the_slot_on():
+    gate = ConcurrencyGate("local", limit=1, max_queue=10)
+    await gate.acquire(Priority.INTERACTIVE, 1)
+    first = asyncio.create_task(gate.acquire(Priority.INTERACTIVE, 5))
+    second = asyncio.create_task(gate.acquire(Priority.INTERACTIVE, 5))
+    await asyncio.sleep(0)
+
+    # The slot is handed to the first waiter, which is cancelled before it resumes
+    gate.release()
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    await asyncio.wait_for(second, 0.1)
+    assert gate.active == 1 and gate.waiting == 0
+
+    gate.release()
+    assert gate.active == 0 and gate.waiting == 0
+
+
+class SlowService:
+    def __init__(self, model, delay):
+        self.model = model
+        self.delay = delay
+        self.max_concurrency = 1
+        self.calls = 0
+
+    async def send_request(self, request):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        return self.model
+
+
+@pytest.mark.asyncio
+async def test_router_treats_saturation_as_load_not_failure(monkeypatch):
+    scheduler = LlmScheduler(max_queue=0)
+    monkeypatch.setattr("app.agent.llm_router.llm_scheduler", scheduler)
+    busy, spare = SlowService("busy", 0.05), SlowService("spare", 0.0)
+    router = LlmRouter([Backend("busy", busy), Backend("spare", spare)], failure_threshold=1)
+
+    first = asyncio.create_task(router.send_request(None))
+    await asyncio.sleep(0)
+    assert await router.send_request(None) == "spare"
+    assert await first == "busy"
+    assert router.status()["backends"][0]["failures"] == 0
+
+    # With every backend saturated the caller gets the overload error (HTTP 503)
+    spare.delay = 0.05
+    pending = [asyncio.create_task(router.send_request(None)) for _ in range(2)]
+    await asyncio.sleep(0)
+    with pytest.raises(LlmOverloadedError):
+        await router.send_request(None)
+    await asyncio.gather(*pending)
+
+
+@pytest.mark.asyncio
+async def test_slot_uses_the_priority_deadline(monkeypatch):
+    monkeypatch.setitem(scheduler_module.DEADLINES_MS, Priority.PROBE, 10)
+    scheduler = LlmScheduler(default_limit=1)
+    async with scheduler.slot("local"):
+        with llm_priority(Priority.PROBE):
+            with pytest.raises(LlmOverloadedError):
+                await scheduler.slot("local").__aenter__()
+    assert scheduler.stats()["local"]["by_priority"]["probe"] == 1
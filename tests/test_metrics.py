@@ -0,0 +1,63 @@
+import random
+
+from app.utils.metrics import LatencyRegistry, LogHistogram
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_histogram_percentiles_stay_within_precision():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(4, 1.2) for _ in range(20000)]
+    histogram = LogHistogram(precision=0.02)
+    for value in values:
+        histogram.record(value)
+
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        exact = ordered[int(q * len(ordered)) - 1]
+        assert abs(histogram.percentile(q) - exact) / exact < 0.02
+    assert histogram.percentile(1.0) == max(values)
+    # Fixed memory: bounded by the bucket range, not by the sample count
+    assert len(histogram.counts) < 1000
+
+
+def test_sliding_windows_drop_old_samples():
+    clock = _Clock()
+    registry = LatencyRegistry(windows=[60, 300], slot_seconds=10, precision=0.02, clock=clock)
+    for _ in range(99):
+        registry.observe("sql", 10.0)
+    registry.observe("sql", 5000.0)
+
+    summary = registry.stage_summary("sql", 60)
+    assert summary["count"] == 100
+    assert summary["p50"] == 10.0
+    assert summary["max"] == 5000.0
+
+    clock.now += 120
+    registry.observe("sql", 20.0)
+    assert registry.stage_summary("sql", 60)["count"] == 1
+    assert registry.stage_summary("sql", 300)["count"] == 101
+    clock.now += 400
+    assert registry.stage_summary("sql", 300)["count"] == 0
+    assert registry.snapshot()["stages"]["sql"]["lifetime"]["count"] == 101
+
+
+def test_labelled_series_roll_up_and_are_capped():
+    registry = LatencyRegistry(windows=[60], slot_seconds=10, max_series=2, clock=_Clock())
+    registry.observe("llm", 100.0, provider="openai", model="gpt")
+    registry.observe("llm", 300.0, provider="lmstudio", model="gemma")
+    registry.observe("llm", 500.0, provider="ollama", model="llama")
+
+    llm = registry.snapshot()["stages"]["llm"]
+    assert llm["windows"]["60s"]["count"] == 3
+    assert [s["labels"] for s in llm["series"]] == [
+        {"model": "gemma", "provider": "lmstudio"},
+        {"model": "gpt", "provider": "openai"},
+    ]
+    assert registry.snapshot()["dropped_series"] == 1
@@ -0,0 +1,118 @@
+import threading
+
+from app.agent.oracle_ddl import extract_oracle_ddl, format_type
+
+
+class _Lob:
+    def __init__(self, text):
+        self.text = text
+
+    def read(self):
+        return self.text
+
+
+class _FakeDictionary:
+    """Answers the extractor's dictionary queries by the view they read."""
+
+    def __init__(self):
+        self.queries = []
+        self.connections = 0
+        self.lock = threading.Lock()
+
+    def rows(self, query, binds):
+        if "DBMS_METADATA" in query:
+            return [(_Lob(f"CREATE OR REPLACE VIEW {binds['owner']}.{binds['obj_name']} AS SELECT 1 FROM DUAL"),)]
+        if "FROM all_objects" in query:
+            return [("CUSTOMERS", "TABLE"), ("ORDERS", "TABLE"), ("V_OPEN", "VIEW"), ("V_SALES", "VIEW")]
+        if "FROM all_tab_columns" in query:
+            return [
+                ("CUSTOMERS", "ID", "NUMBER", 22, 0, None, None, 0, "N", None),
+                ("CUSTOMERS", "NAME", "VARCHAR2", 400, 100, "C", None, None, "Y", None),
+                ("ORDERS", "ID", "NUMBER", 22, 0, None, 10, 0, "N", None),
+                ("ORDERS", "CUSTOMER_ID", "NUMBER", 22, 0, None, None, 0, "N", None),
+                ("ORDERS", "AMOUNT", "NUMBER", 22, 0, None, 12, 2, "Y", None),
+                ("ORDERS", "CREATED", "DATE", 7, 0, None, None, None, "N", "SYSDATE  "),
+            ]
+        if "FROM all_tab_comments" in query:
+            return [("ORDERS", "Customer orders")]
+        if "FROM all_col_comments" in query:
+            return [("ORDERS", "AMOUNT", "Gross amount\nin SAR")]
+        if "FROM all_cons_columns" in query:
+            return [
+                ("APP", "CUSTOMERS_PK", "ID"),
+                ("APP", "ORDERS_CUSTOMER_FK", "CUSTOMER_ID"),
+                ("APP", "ORDERS_PK", "ID"),
+            ]
+        if "FROM all_constraints" in query:
+            return [
+                ("CUSTOMERS", "CUSTOMERS_PK", "P", None, None, None),
+                ("ORDERS", "ORDERS_PK", "P", None, None, None),
+                ("ORDERS", "ORDERS_CUSTOMER_FK", "R", "APP", "CUSTOMERS", "CUSTOMERS_PK"),
+            ]
+        raise AssertionError(f"unexpected query: {query}")
+
+    def connect(self):
+        with self.lock:
+            self.connections += 1
+        return _FakeConnection(self)
+
+
+class _FakeConnection:
+    def __init__(self, db):
+        self.db = db
+
+    def cursor(self):
+        return _FakeCursor(self.db)
+
+    def close(self):
+        pass
+
+
+class _FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, query, binds):
+        with self.db.lock:
+            self.db.queries.append(query)
+        self.result = self.db.rows(query, binds)
+
+    def fetchall(self):
+        return self.result
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def close(self):
+        pass
+
+
+def test_tables_come_from_bulk_dictionary_queries():
+    db = _FakeDictionary()
+    ddl = extract_oracle_ddl(db.connect, "app", view_workers=2)
+
+    assert list(ddl) == ["TABLE APP.CUSTOMERS", "TABLE APP.ORDERS", "VIEW APP.V_OPEN", "VIEW APP.V_SALES"]
+    assert ddl["TABLE APP.ORDERS"] == (
+        "-- Customer orders\n"
+        "CREATE TABLE APP.ORDERS (\n"
+        "  ID NUMBER(10) NOT NULL,\n"
+        "  CUSTOMER_ID INTEGER NOT NULL,\n"
+        "  AMOUNT NUMBER(12,2), -- Gross amount in SAR\n"
+        "  CREATED DATE DEFAULT SYSDATE NOT NULL,\n"
+        "  CONSTRAINT ORDERS_PK PRIMARY KEY (ID),\n"
+        "  CONSTRAINT ORDERS_CUSTOMER_FK FOREIGN KEY (CUSTOMER_ID) REFERENCES APP.CUSTOMERS (ID)\n"
+        ");"
+    )
+    assert "NAME VARCHAR2(100 CHAR)" in ddl["TABLE APP.CUSTOMERS"]
+    # One query per dictionary view, however many tables; DBMS_METADATA only for the views
+    assert sum("DBMS_METADATA" in q for q in db.queries) == 2
+    assert len(db.queries) == 6 + 2
+    assert db.connections == 1 + 2
+
+
+def test_format_type_variants():
+    assert format_type("VARCHAR2", 50, 50, "B", None, None) == "VARCHAR2(50)"
+    assert format_type("NVARCHAR2", 200, 100, "C", None, None) == "NVARCHAR2(100)"
+    assert format_type("NUMBER", 22, 0, None, None, None) == "NUMBER"
+    assert format_type("TIMESTAMP(6)", 11, 0, None, None, 6) == "TIMESTAMP(6)"
@@ -0,0 +1,171 @@
+import chromadb
+import numpy as np
+import pytest
+from chromadb.api.types import EmbeddingFunction
+
+from app.agent.semantic_cache import SemanticCache, make_scope, normalize_question
+
+
+class _TopicEmbedding(EmbeddingFunction):
+    """Maps paraphrases onto the same axis so similarity is deterministic."""
+
+    TOPICS = {"amount": 0, "amounts": 0, "balance": 1, "customers": 2}
+
+    def __init__(self):
+        pass
+
+    def __call__(self, input):
+        vectors = []
+        for text in input:
+            vec = np.full(4, 0.01, dtype=np.float32)
+            for word in text.split():
+                if word in self.TOPICS:
+                    vec[self.TOPICS[word]] += 1.0
+            vectors.append(vec / np.linalg.norm(vec))
+        return vectors
+
+    @staticmethod
+    def name():
+        return "topic-test"
+
+
+@pytest.fixture
+def cache():
+    client = chromadb.EphemeralClient()
+    for collection in client.list_collections():
+        client.delete_collection(getattr(collection, "name", collection))
+    sc = SemanticCache(threshold=0.9, enabled=True)
+    sc.bind(client, _TopicEmbedding())
+    return sc
+
+
+def test_normalize_question():
+    assert normalize_question("  Total   Amount per account? ") == "total amount per account"
+
+
+@pytest.mark.asyncio
+async def test_paraphrase_hits_within_scope_only(cache):
+    scope = make_scope("v1", ["user"])
+    await cache.remember("total amount per account", "SELECT account_id, SUM(amount) FROM t GROUP BY account_id", scope)
+
+    hit = await cache.lookup("sum of amounts by account", scope)
+    assert hit is not None
+    assert hit.sql.startswith("SELECT account_id")
+    assert hit.similarity >= 0.9
+
+    assert await cache.lookup("sum of amounts by account", make_scope("v2", ["user"])) is None
+    assert await cache.lookup("sum of amounts by account", make_scope("v1", ["admin"])) is None
+    assert await cache.lookup("list all the customers please", scope) is None
+    assert cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_commit_stores_the_sql_the_final_answer_used(cache):
+    scope = make_scope("v1", ["user"])
+    cache.begin("what is the balance now", scope)
+    cache.record_success("SELECT * FROM accounts WHERE ROWNUM <= 5")
+    cache.record_success("SELECT balance FROM accounts FETCH FIRST 1 ROWS ONLY")
+    assert await cache.lookup("show the balance", scope) is None
+
+    await cache.commit()
+    hit = await cache.lookup("show the balance", scope)
+    assert hit is not None and hit.sql == "SELECT balance FROM accounts FETCH FIRST 1 ROWS ONLY"
+
+
+@pytest.mark.asyncio
+async def test_answer_after_a_failed_query_is_not_stored(cache):
+    scope = make_scope("v1", ["user"])
+    cache.begin("what is the balance now", scope)
+    cache.record_success("SELECT balance FROM accounts")
+    cache.record_failure()
+    await cache.commit()
+    assert cache.stats()["stores"] == 0
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "stored,asked",
+    [
+        ("total amount for 2023", "total amount for 2024"),
+        ("top 5 customers by amount", "top 10 customers by amount"),
+        ("amount of inactive customers", "amount of active customers"),
+        ("amount for region 'north'", "amount for region 'south'"),
+        ("customers with amount", "customers without amount"),
+    ],
+)
+async def test_near_misses_with_different_literals_do_not_hit(cache, stored, asked):
+    scope = make_scope("v1", ["user"])
+    await cache.remember(stored, "SELECT 1", scope)
+    assert await cache.lookup(asked, scope) is None
+    assert cache.stats()["literal_mismatches"] == 1
+
+
+@pytest.mark.asyncio
+async def test_middleware_commits_only_on_the_final_response(cache, monkeypatch):
+    from vanna.core.llm import LlmResponse
+    from vanna.core.tool import ToolCall
+
+    from app.agent import semantic_cache as module
+
+    monkeypatch.setattr(module, "semantic_cache", cache)
+    scope = make_scope("v1", ["user"])
+    cache.begin("what is the balance now", scope)
+    cache.record_success("SELECT balance FROM accounts")
+    middleware = module.SemanticCacheMiddleware()
+
+    await middleware.after_llm_response(None, LlmResponse(tool_calls=[ToolCall(id="1", name="run_sql", arguments={})]))
+    assert cache.stats()["stores"] == 0
+    await middleware.after_llm_response(None, LlmResponse(content="The balance is 10."))
+    assert cache.stats()["stores"] == 1
+
+
+@pytest.mark.asyncio
+async def test_follow_ups_are_neither_stored_nor_replayed(cache, monkeypatch):
+    from types import SimpleNamespace
+
+    from vanna.core.storage import Message
+    from vanna.core.tool import ToolResult
+    from vanna.core.user import User
+    from vanna.integrations.local.agent_memory import DemoAgentMemory
+
+    from app.agent import workflow
+
+    class _Registry:
+        def __init__(self):
+            self.calls = []
+
+        async def execute(self, tool_call, context):
+            self.calls.append(tool_call)
+            return ToolResult(success=True, result_for_llm="3 rows")
+
+    monkeypatch.setattr(workflow, "semantic_cache", cache)
+    handler = workflow.CommandWorkflowHandler()
+    agent = SimpleNamespace(agent_memory=DemoAgentMemory(), tool_registry=_Registry(), observability_provider=None)
+    user = User(id="u1", group_memberships=["user"])
+
+    def conversation(cid, earlier):
+        messages = [Message(role="user", content=earlier), Message(role="assistant", content="Done.")]
+        return SimpleNamespace(id=cid, messages=messages)
+
+    # Conversation A: the LLM answers the follow-up with SQL that depends on the earlier turn
+    conversation_a = conversation("a", "total amount per account")
+    result = await handler.try_handle(agent, user, conversation_a, "show the same by region")
+    assert result.should_skip_llm is False
+    cache.record_success("SELECT region, SUM(amount) FROM accounts GROUP BY region")
+    await cache.commit()
+    assert cache.stats()["stores"] == 0
+
+    # Even with an entry for that text, a follow-up in conversation B is left to the LLM
+    scope = make_scope(workflow.context_version(), ["user"])
+    await cache.remember("show the same by region", "SELECT region, SUM(amount) FROM accounts GROUP BY region", scope)
+    result = await handler.try_handle(agent, user, conversation("b", "list all the customers"), "show the same by region")
+    assert result.should_skip_llm is False
+    assert agent.tool_registry.calls == []
+
+    # A first-turn question is still cached and replayed
+    await handler.try_handle(agent, user, SimpleNamespace(id="c", messages=[]), "total amount per account")
+    cache.record_success("SELECT account_id, SUM(amount) FROM accounts GROUP BY account_id")
+    await cache.commit()
+    result = await handler.try_handle(agent, user, SimpleNamespace(id="d", messages=[]), "sum of amounts by account")
+    assert result.should_skip_llm is True
+    assert agent.tool_registry.calls[0].arguments["sql"].startswith("SELECT account_id")
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_concurrent_callers_share_one_upstream_call():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def upstream():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    results = await asyncio.gather(*(flight.do("k", upstream) for _ in range(5)))
+    assert calls == 1
+    assert [value for value, _ in results] == ["answer"] * 5
+    assert sum(shared for _, shared in results) == 4
+    assert flight.stats() == {"leaders": 1, "coalesced": 4, "abandoned": 0, "errors": 0, "in_flight": 0}
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_does_not_cancel_followers():
+    flight = SingleFlight("test")
+    started = asyncio.Event()
+
+    async def upstream():
+        started.set()
+        await asyncio.sleep(0.05)
+        return 42
+
+    leader = asyncio.create_task(flight.do("k", upstream))
+    await started.wait()
+    follower = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0)
+    leader.cancel()
+    assert await follower == (42, True)
+    with pytest.raises(asyncio.CancelledError):
+        await leader
+
+
+@pytest.mark.asyncio
+async def test_upstream_cancelled_when_every_caller_leaves():
+    flight = SingleFlight("test")
+    cancelled = asyncio.Event()
+
+    async def upstream():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    caller = asyncio.create_task(flight.do("k", upstream))
+    await asyncio.sleep(0.01)
+    caller.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    await asyncio.sleep(0)
+    assert flight.stats()["abandoned"] == 1
+    assert flight.stats()["in_flight"] == 0
@@ -0,0 +1,35 @@
+from app.agent.sql_analysis import (
+    ColumnRef,
+    analyze_sql,
+    analysis_cache_stats,
+    clear_analysis_cache,
+)
+
+
+def test_tables_include_comma_joins_subqueries_and_skip_ctes():
+    sql = (
+        "WITH recent AS (SELECT id FROM orders) "
+        "SELECT a.id FROM accounts a, recent r "
+        "JOIN (SELECT id FROM customers) c ON c.id = r.id "
+        "WHERE a.id IN (SELECT account_id FROM payments) AND a.note = 'from ledger'"
+    )
+    analysis = analyze_sql(sql)
+    assert analysis.tables == {"orders", "accounts", "customers", "payments"}
+    assert analysis.cte_names == {"recent"}
+    assert "ledger" not in analysis.tables
+
+
+def test_columns_keep_qualifiers_and_skip_aliases():
+    analysis = analyze_sql("SELECT a.balance AS bal, count(*) n FROM s.accounts a GROUP BY a.balance")
+    assert ColumnRef("a", "balance") in analysis.columns
+    assert all(col.name not in {"bal", "n", "count"} for col in analysis.columns)
+    assert analysis.table_refs[0].schema == "s"
+
+
+def test_analysis_is_cached_by_sql_hash():
+    clear_analysis_cache()
+    first = analyze_sql("SELECT 1")
+    second = analyze_sql("SELECT 1")
+    assert first is second
+    assert analysis_cache_stats()["hits"] == 1
+
@@ -0,0 +1,61 @@
+import pytest
+
+from app.agent.sql_transpile import clear_transpile_cache, rewrite_pagination, transpile, transpile_cache_stats
+
+
+@pytest.mark.parametrize(
+    "dialect,sql,expected",
+    [
+        ("oracle", "SELECT a FROM t LIMIT 5", "SELECT a FROM t FETCH FIRST 5 ROWS ONLY"),
+        ("oracle", "SELECT a FROM t LIMIT 5 OFFSET 10", "SELECT a FROM t OFFSET 10 ROWS FETCH NEXT 5 ROWS ONLY"),
+        ("mssql", "SELECT a FROM t LIMIT 5", "SELECT TOP 5 a FROM t"),
+        ("sqlite", "SELECT a FROM t FETCH FIRST 3 ROWS ONLY", "SELECT a FROM t LIMIT 3"),
+        ("oracle", "SELECT a FROM t WHERE name ILIKE '%x%'", "SELECT a FROM t WHERE UPPER(name) LIKE UPPER('%x%')"),
+        ("oracle", "SELECT a FROM t WHERE active = TRUE", "SELECT a FROM t WHERE active = 1"),
+        ("oracle", "SELECT a FROM t WHERE TRUE", "SELECT a FROM t WHERE 1=1"),
+        ("mssql", "SELECT a FROM t WHERE b = 1 AND FALSE", "SELECT a FROM t WHERE b = 1 AND 1=0"),
+        ("oracle", "SELECT a FROM t WHERE flag IS NOT TRUE", "SELECT a FROM t WHERE flag IS NOT TRUE"),
+        (
+            "oracle",
+            "SELECT * FROM (SELECT * FROM t LIMIT 5) x",
+            "SELECT * FROM (SELECT * FROM t FETCH FIRST 5 ROWS ONLY) x",
+        ),
+        (
+            "mssql",
+            "SELECT a FROM t WHERE id IN (SELECT id FROM u LIMIT 2) LIMIT 3",
+            "SELECT TOP 3 a FROM t WHERE id IN (SELECT TOP 2 id FROM u)",
+        ),
+        ("mssql", "SELECT first || ' ' || last FROM t", "SELECT first + ' ' + last FROM t"),
+        ("oracle", "SELECT first_name + ' ' + last_name FROM t", "SELECT first_name || ' ' || last_name FROM t"),
+        ("oracle", "SELECT a + b + 'x', c + 1 FROM t", "SELECT a || b || 'x', c + 1 FROM t"),
+        ("oracle", "SELECT strftime('%Y-%m', created) FROM t", "SELECT TO_CHAR(created, 'YYYY-MM') FROM t"),
+        ("oracle", "SELECT `Amount` FROM t WHERE d > now()", "SELECT Amount FROM t WHERE d > CURRENT_TIMESTAMP"),
+    ],
+)
+def test_transpile_rewrites(dialect, sql, expected):
+    assert transpile(sql, dialect).sql == expected
+
+
+def test_transpile_leaves_native_sql_and_literals_alone():
+    sql = "SELECT 'LIMIT 5 || now()' FROM dual FETCH FIRST 1 ROWS ONLY"
+    result = transpile(sql, "oracle")
+    assert result.sql == sql
+    assert not result.changed
+
+
+def test_transpile_is_memoized():
+    clear_transpile_cache()
+    transpile("SELECT a FROM t LIMIT 1", "oracle")
+    transpile("SELECT a FROM t LIMIT 1", "oracle")
+    assert transpile_cache_stats()["hits"] == 1
+
+
+def test_rewrite_pagination_touches_only_the_limit_clause():
+    sql = "SELECT a FROM t WHERE flag = TRUE LIMIT 5;"
+    assert rewrite_pagination(sql, "oracle") == "SELECT a FROM t WHERE flag = TRUE FETCH FIRST 5 ROWS ONLY"
+    assert rewrite_pagination("SELECT a FROM t FETCH FIRST 5 ROWS ONLY", "oracle") == (
+        "SELECT a FROM t FETCH FIRST 5 ROWS ONLY"
+    )
+    assert rewrite_pagination("SELECT * FROM (SELECT a FROM t LIMIT 5) x WHERE TRUE", "oracle") == (
+        "SELECT * FROM (SELECT a FROM t FETCH FIRST 5 ROWS ONLY) x WHERE TRUE"
+    )
@@ -1,6 +1,11 @@
 import pytest
 
-from app.agent.sql_validation import validate_sql, SQLValidationError
+from app.agent.sql_validation import (
+    ColumnValidationError,
+    SQLValidationError,
+    validate_columns,
+    validate_sql,
+)
 
 
 def test_sql_validation_allows_select():
@@ -15,8 +20,48 @@ def test_sql_validation_allows_select():
         "SELECT 1; SELECT 2",
         "SELECT 1; DROP TABLE x",
         "SELECT * FROM t -- comment",
+        "SELECT * FROM t /* hidden */",
+        "SELECT * FROM t WHERE a = 2 OR 1 = 1",
     ],
 )
 def test_sql_validation_blocks(sql):
     with pytest.raises(SQLValidationError):
         validate_sql(sql)
+
+
+def test_sql_validation_ignores_literals():
+    sql = "SELECT 'a;b -- not a comment' AS note, 'drop' FROM t;"
+    assert validate_sql(sql) == "SELECT 'a;b -- not a comment' AS note, 'drop' FROM t"
+
+
+def _snapshot():
+    from app.agent.catalog import CatalogObject, CatalogSnapshot
+
+    def table(name, cols):
+        return CatalogObject("main", name, "table", tuple(cols), frozenset(cols))
+
+    return CatalogSnapshot(
+        1,
+        "test",
+        [table("tblaccounts", ["acc_id", "acc_balance", "owner_id"]), table("owners", ["id", "name"])],
+        "main",
+    )
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT a.acc_balance, o.name FROM tblAccounts a JOIN owners o ON o.id = a.owner_id",
+        "WITH x AS (SELECT * FROM owners) SELECT x.name FROM x",
+        "SELECT s.total FROM (SELECT owner_id, sum(acc_balance) AS total FROM tblaccounts GROUP BY owner_id) s",
+        "SELECT count(*) AS n FROM owners ORDER BY n",
+    ],
+)
+def test_validate_columns_resolves_aliases_ctes_and_stars(sql):
+    validate_columns(sql, _snapshot(), "sqlite")
+
+
+def test_validate_columns_rejects_invented_column_with_suggestions():
+    with pytest.raises(ColumnValidationError) as info:
+        validate_columns("SELECT tblAccounts.Balance FROM tblAccounts", _snapshot(), "sqlite")
+    assert info.value.suggestions == {"tblaccounts.balance": ["acc_balance"]}
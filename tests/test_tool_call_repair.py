@@ -0,0 +1,69 @@
+import pytest
+from vanna.core.llm import LlmResponse
+from vanna.core.tool import ToolCall, ToolSchema
+
+from app.agent import tool_call_repair
+from app.agent.tool_call_repair import extract_json_object, repair_response
+
+RUN_SQL = ToolSchema(
+    name="run_sql",
+    description="Run SQL",
+    parameters={
+        "type": "object",
+        "properties": {"sql": {"type": "string"}},
+        "required": ["sql"],
+        "additionalProperties": False,
+    },
+)
+VISUALIZE = ToolSchema(
+    name="visualize_data",
+    description="Chart a file",
+    parameters={"type": "object", "properties": {"filename": {"type": "string"}}, "required": ["filename"]},
+)
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        '{"sql": "SELECT 1",}',
+        'Sure! Here is the call: {"sql": "SELECT 1"} hope that helps',
+        '```json\n{"sql": "SELECT 1"}\n```',
+        '{"sql": "SELECT 1"',
+        '{"sql": "SELECT 1"}{"sql": "SELECT 2"}',
+    ],
+)
+def test_extract_json_object_tolerates_common_damage(text):
+    assert extract_json_object(text) == {"sql": "SELECT 1"}
+
+
+@pytest.fixture(autouse=True)
+def reset_counters(monkeypatch):
+    monkeypatch.setattr(tool_call_repair, "counters", {"clean": 0, "repaired": 0, "failed": 0})
+
+
+def test_broken_arguments_are_repaired_and_validated():
+    response = LlmResponse(
+        tool_calls=[
+            ToolCall(id="a", name="run_sql", arguments={"_raw": '{"sql": "SELECT 1",'}),
+            ToolCall(id="b", name="run_sql", arguments={"_raw": '{"query": "SELECT 1"}'}),
+            ToolCall(id="c", name="run_sql", arguments={"sql": "SELECT 2"}),
+        ]
+    )
+    fixed = repair_response(response, [RUN_SQL, VISUALIZE])
+    assert fixed.tool_calls[0].arguments == {"sql": "SELECT 1"}
+    assert fixed.tool_calls[1].arguments == {"_raw": '{"query": "SELECT 1"}'}
+    assert tool_call_repair.repair_stats() == {"clean": 1, "repaired": 1, "failed": 1}
+
+
+def test_tool_call_written_as_text_becomes_a_tool_call():
+    named = repair_response(
+        LlmResponse(content='I will run: {"name": "run_sql", "arguments": {"sql": "SELECT 1"}}'), [RUN_SQL, VISUALIZE]
+    )
+    assert named.tool_calls[0].name == "run_sql" and named.content is None
+
+    bare = repair_response(LlmResponse(content='{"sql": "SELECT 1"}'), [RUN_SQL, VISUALIZE])
+    assert bare.tool_calls[0].arguments == {"sql": "SELECT 1"}
+
+    prose = repair_response(LlmResponse(content='The payload looked like {"sql": "SELECT 1"}.'), [RUN_SQL])
+    assert prose.tool_calls is None
+    assert tool_call_repair.repair_stats()["repaired"] == 2
@@ -0,0 +1,82 @@
+from types import SimpleNamespace
+
+import pytest
+from vanna.core.tool import ToolContext, ToolResult
+from vanna.core.user import User
+from vanna.integrations.local.agent_memory import DemoAgentMemory
+
+from app.agent.workflow import CommandWorkflowHandler
+
+
+class _Registry:
+    def __init__(self, success=True):
+        self.success = success
+        self.calls = []
+
+    async def execute(self, tool_call, context):
+        self.calls.append(tool_call)
+        if not self.success:
+            return ToolResult(success=False, result_for_llm="", error="no such table")
+        return ToolResult(success=True, result_for_llm="3 rows")
+
+
+async def _agent(saved, success=True):
+    memory = DemoAgentMemory()
+    context = ToolContext(user=User(id="admin"), conversation_id="c0", request_id="r0", agent_memory=memory)
+    for question, sql in saved:
+        await memory.save_tool_usage(question, "run_sql", {"sql": sql}, context)
+    return SimpleNamespace(agent_memory=memory, tool_registry=_Registry(success), observability_provider=None)
+
+
+@pytest.mark.asyncio
+async def test_saved_tool_use_answers_without_llm():
+    agent = await _agent([("monthly revenue by region", "SELECT region, SUM(amount) FROM sales GROUP BY region")])
+    handler = CommandWorkflowHandler()
+    result = await handler.try_handle(agent, User(id="u1"), SimpleNamespace(id="c1"), "Monthly revenue by region")
+
+    assert result.should_skip_llm is True
+    assert agent.tool_registry.calls[0].arguments["sql"].startswith("SELECT region")
+    assert handler.stats()["memory_hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_ambiguous_or_failing_saved_tool_use_falls_back_to_llm():
+    agent = await _agent(
+        [
+            ("revenue by region", "SELECT region, SUM(amount) FROM sales GROUP BY region"),
+            ("revenue by regions", "SELECT region, SUM(net) FROM sales GROUP BY region"),
+        ]
+    )
+    handler = CommandWorkflowHandler()
+    result = await handler.try_handle(agent, User(id="u1"), SimpleNamespace(id="c1"), "revenue by region")
+    assert result.should_skip_llm is False
+    assert agent.tool_registry.calls == []
+    assert handler.stats()["memory_ambiguous"] == 1
+
+    agent = await _agent([("revenue by region", "SELECT * FROM gone")], success=False)
+    result = await handler.try_handle(agent, User(id="u1"), SimpleNamespace(id="c1"), "revenue by region")
+    assert result.should_skip_llm is False
+    assert handler.stats()["memory_replay_failed"] == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "saved, asked",
+    [
+        ("total sales for 2023 by region", "total sales for 2024 by region"),
+        ("top 5 customers by revenue", "top 10 customers by revenue"),
+        ("list inactive users", "list active users"),
+    ],
+)
+async def test_saved_tool_use_with_different_literals_falls_back_to_llm(saved, asked):
+    agent = await _agent([(saved, "SELECT 1")])
+    handler = CommandWorkflowHandler()
+
+    result = await handler.try_handle(agent, User(id="u1"), SimpleNamespace(id="c1"), saved.capitalize())
+    assert result.should_skip_llm is True
+
+    agent.tool_registry.calls.clear()
+    result = await handler.try_handle(agent, User(id="u1"), SimpleNamespace(id="c1"), asked)
+    assert result.should_skip_llm is False
+    assert agent.tool_registry.calls == []
+    assert handler.stats()["memory_literal_mismatches"] == 1